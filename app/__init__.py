@@ -7,41 +7,72 @@ from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 
 # local imports
+from .config import app_config
+from .util.cache_util import DataVersions, FragmentCache, RedisStore, TTLCache
+from .util.db_util import configure_engine
+from .util.metrics_util import init_metrics
+from .util.query_util import init_query_guard
+from .util.secret_util import load_secret_key
+from .util.static_util import init_static_fingerprints
+from .util.status_util import Status
 
 db = SQLAlchemy()
 login_manager = LoginManager()
-
-
-# def create_app(config_name):
-def create_app():
-    basedir = os.path.abspath(os.path.dirname(__file__))
+# logged in employees, so load_user does not query on every request
+user_cache = TTLCache()
+# bumped by the code that writes a table, see util/fragment_util.py
+data_versions = DataVersions()
+# department and role choices for select fields
+lookup_cache = TTLCache(maxsize=64)
+# rendered admin tables, see util/fragment_util.py
+fragment_cache = FragmentCache()
+# admin dashboard reports, see util/analytics_util.py
+analytics_cache = TTLCache(maxsize=64)
+
+
+def create_app(config_name=None):
     app = Flask(__name__)
     Bootstrap(app)
-    # Build the Sqlite ULR for SqlAlchemy
-    sqlite_url = "sqlite:///" + os.path.join(basedir, "admin.db")
-
-    # Configure the SqlAlchemy part of the app instance
-    app.config["SQLALCHEMY_ECHO"] = False
-    app.config["SQLALCHEMY_DATABASE_URI"] = sqlite_url
-    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-    app.config['JSON_SORT_KEYS'] = False  # to get the order as we prescribed
-    SECRET_KEY = os.urandom(32)
-    app.config['SECRET_KEY'] = SECRET_KEY
-    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
+    app.config.from_object(app_config[config_name or os.environ.get('FLASK_CONFIG', 'default')])
+    if not app.config['SECRET_KEY']:
+        if not app.config['SECRET_KEY_FILE']:
+            # a random key would log everyone out, and void their API
+            # tokens, on every restart and on every other worker or host
+            raise RuntimeError('SECRET_KEY is not set; it must be the same for every worker and deploy')
+        app.config['SECRET_KEY'] = load_secret_key(app.config['SECRET_KEY_FILE'])
 
     # Create the SqlAlchemy db instance
 
     db.init_app(app)
-
-    app.config['JWT_BLACKLIST_ENABLED'] = True
-    app.config['JWT_BLACKLIST_TOKEN_CHECKS'] = ['access', 'refresh']
+    configure_engine(app, db)
+
+    user_cache.maxsize = app.config['USER_CACHE_SIZE']
+    user_cache.ttl = app.config['USER_CACHE_TTL']
+    lookup_cache.ttl = app.config['LOOKUP_CACHE_TTL']
+    fragment_cache.local.maxsize = app.config['FRAGMENT_CACHE_SIZE']
+    fragment_cache.local.ttl = app.config['FRAGMENT_CACHE_TTL']
+    analytics_cache.maxsize = app.config['ANALYTICS_CACHE_SIZE']
+    analytics_cache.ttl = app.config['ANALYTICS_CACHE_TTL']
+    if app.config['CACHE_REDIS_URL']:
+        # share rendered fragments between workers and hosts
+        fragment_cache.shared = RedisStore(app.config['CACHE_REDIS_URL'])
 
     login_manager.init_app(app)
     login_manager.login_message = "You must be logged in to access this page."
     login_manager.login_view = "auth.login"
-    migrate = Migrate(app, db)
+    # batch mode lets Alembic alter SQLite tables by copying them
+    migrate = Migrate(app, db, render_as_batch=True)
 
     from app import models
+    data_versions.engine, data_versions.table = db.get_engine(app), models.TableVersion.__table__
+    data_versions.interval = app.config['DATA_VERSIONS_INTERVAL']
+    data_versions.clear()
+    # keep the rollup of each timesheet and the weekly hours summary
+    # current on every flush
+    from .util import rollup_util, summary_util
+    # API clients sign in with a bearer token instead of a session
+    from .util.token_util import init_tokens
+    init_tokens(app)
 
     from .admin import admin as admin_blueprint
     app.register_blueprint(admin_blueprint, url_prefix='/admin')
@@ -55,13 +86,20 @@ def create_app():
     from .home import home as home_blueprint
     app.register_blueprint(home_blueprint)
 
-    with app.app_context():
-        # Extensions like Flask-SQLAlchemy now know what the "current" app
-        # is while within this block. Therefore, you can now run........
-        db.create_all()
-        admin = models.Employee(email="admin@admin.com", username="admin", password="admin2020", is_admin=True)
-        db.session.add(admin)
-        db.session.commit()
+    from .api import api as api_blueprint
+    app.register_blueprint(api_blueprint, url_prefix='/api/v1')
+
+    # registers the handlers of background jobs, see util/job_util.py
+    from app import jobs
+
+    from .commands import register_commands
+    register_commands(app)
+
+    # templates compare statuses with Status.SUBMITTED and the like
+    app.jinja_env.globals['Status'] = Status
+    init_static_fingerprints(app)
+    init_metrics(app, db)
+    init_query_guard(app, db)
 
     @app.errorhandler(403)
     def forbidden(error):
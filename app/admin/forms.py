@@ -1,8 +1,11 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, SubmitField, PasswordField, ValidationError
-from wtforms.ext.sqlalchemy.fields import QuerySelectField
-from wtforms.validators import DataRequired, EqualTo, Email
-from ..models import Department, Role, Employee
+from flask_wtf.file import FileAllowed, FileField, FileRequired
+from wtforms import Form, IntegerField, SelectField, StringField, SubmitField, PasswordField, ValidationError
+from wtforms.fields.html5 import DateField
+from wtforms.validators import DataRequired, EqualTo, Email, Optional
+from ..models import Employee
+from ..util.lookup_util import department_choices, role_choices
+from ..util.status_util import Status
 
 
 def validate_username(field):
@@ -31,6 +34,17 @@ class RegistrationForm(FlaskForm):
     submit = SubmitField('Register')
 
 
+class BulkRegistrationForm(FlaskForm):
+    """
+    Form for admin to register many employees from a CSV or JSON file
+    """
+    employees = FileField('Employees File', validators=[
+        FileRequired(),
+        FileAllowed(['csv', 'json'], 'Upload a .csv or .json file')
+    ])
+    submit = SubmitField('Import')
+
+
 class DepartmentForm(FlaskForm):
     """
     Form for admin to add or edit a department
@@ -53,8 +67,73 @@ class EmployeeAssignForm(FlaskForm):
     """
     Form for admin to assign departments and roles to employee
     """
-    department = QuerySelectField(query_factory=lambda: Department.query.all(),
-                                  get_label="name")
-    role = QuerySelectField(query_factory=lambda: Role.query.all(),
-                            get_label="name")
+    department_id = SelectField('Department', coerce=int)
+    role_id = SelectField('Role', coerce=int)
     submit = SubmitField('Submit')
+
+    def __init__(self, *args, **kwargs):
+        super(EmployeeAssignForm, self).__init__(*args, **kwargs)
+        self.department_id.choices = department_choices()
+        self.role_id.choices = role_choices()
+
+
+class TimesheetFilterForm(Form):
+    """
+    Form for admin to filter the timesheet approval queue, which shows
+    the submitted timesheets unless another status is picked.
+    Bound to the query string, so it carries no CSRF token.
+    """
+    status = SelectField('Status', choices=[(str(int(status)), status.label)
+                                            for status in (Status.SUBMITTED, Status.APPROVED,
+                                                           Status.REJECTED)] + [('all', 'All')],
+                         default=str(int(Status.SUBMITTED)))
+    week_from = DateField('Week From', validators=[Optional()])
+    week_to = DateField('Week To', validators=[Optional()])
+    employee_id = IntegerField('Employee Id', validators=[Optional()])
+    submit = SubmitField('Filter')
+
+
+class SearchForm(Form):
+    """
+    Form for admin to search days, employees, departments and roles.
+    Bound to the query string, so it carries no CSRF token.
+    """
+    q = StringField('Search', validators=[DataRequired()])
+    submit = SubmitField('Search')
+
+
+class BulkApprovalForm(FlaskForm):
+    """
+    Form for admin to approve or reject many timesheets at once, picked
+    by the ids checked in the queue or by department and week
+    """
+    department = SelectField('Department', coerce=int)
+    week = DateField('Week', validators=[Optional()])
+    approve = SubmitField('Approve')
+    reject = SubmitField('Reject')
+
+    def __init__(self, *args, **kwargs):
+        super(BulkApprovalForm, self).__init__(*args, **kwargs)
+        self.department.choices = [(0, 'Any Department')] + department_choices()
+
+
+class ExportForm(Form):
+    """
+    Form for admin to download approved hours for payroll.
+    Bound to the query string, so it carries no CSRF token.
+    """
+    start = DateField('From', validators=[DataRequired()])
+    end = DateField('To', validators=[DataRequired()])
+    format = SelectField('Format', choices=[('csv', 'CSV'), ('ndjson', 'NDJSON')], default='csv')
+    submit = SubmitField('Export')
+
+
+class ExportJobForm(FlaskForm):
+    """
+    Form for admin to export approved hours to a file in the background.
+    Posted, so unlike ExportForm it carries a CSRF token.
+    """
+    start = ExportForm.start
+    end = ExportForm.end
+    format = ExportForm.format
+    submit = SubmitField('Export in Background')
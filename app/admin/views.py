@@ -1,9 +1,30 @@
-from flask import abort, flash, redirect, render_template, url_for
+import json
+
+from flask import abort, current_app, flash, jsonify, redirect, render_template, request, url_for, \
+    Response, send_from_directory, stream_with_context
 from flask_login import current_user, login_required
+from sqlalchemy import func
+from sqlalchemy.orm import subqueryload
 from . import admin
-from .forms import DepartmentForm, EmployeeAssignForm, RoleForm, RegistrationForm
-from .. import db
-from ..models import Department, Employee, Role, WeekSheet, Sheet
+from .forms import BulkApprovalForm, BulkRegistrationForm, DepartmentForm, EmployeeAssignForm, ExportForm, \
+    ExportJobForm, RoleForm, RegistrationForm, SearchForm, TimesheetFilterForm
+from .. import db, fragment_cache, lookup_cache, user_cache
+from ..models import ArchivedWeekSheet, Department, Employee, Job, Role, WeekSheet, Sheet
+from ..util.approval_util import DECISIONS, decide_timesheets, timesheet_criteria
+from ..util.errors_util import flash_errors
+from ..util.export_util import EXPORT_FORMATS, export_approved_hours
+from ..util.fragment_util import cached_fragment, invalidate_tables
+from ..util.import_util import import_employees, read_rows
+from ..util.job_util import PENDING, enqueue
+from ..util.query_util import query_budget
+from ..util.rollup_util import decide_day_rollup
+from ..util.summary_util import refresh_weekly_hours
+from ..util.search_util import search, search_sheets, search_terms
+from ..util.status_util import Status
+from ..util.week_util import week_bounds
+
+# employees, departments and roles shown above the matching days
+SEARCH_PREVIEW = 10
 
 
 def check_admin():
@@ -12,6 +33,41 @@ def check_admin():
         abort(403)
 
 
+def job_accepted(queued, message):
+    """
+    202 with the job's status URL for JSON clients; a flash and the job's
+    page for browsers
+    """
+    if request.accept_mimetypes.best == 'application/json':
+        location = url_for('api.get_job', id=queued.id)
+        return jsonify(id=queued.id, kind=queued.kind, status=queued.status, url=location), \
+            202, {'Location': location}
+    flash(message)
+    return redirect(url_for('admin.view_job', id=queued.id))
+
+
+def with_employee_counts(model):
+    """
+    (row, number of employees) for every department or role, counted in
+    one grouped query instead of one count per row
+    """
+    foreign_key = Employee.department_id if model is Department else Employee.role_id
+    return db.session.query(model, func.count(Employee.id)) \
+        .outerjoin(Employee, foreign_key == model.id) \
+        .group_by(model.id).order_by(model.id).all()
+
+
+@admin.route('/cache', methods=['GET'])
+@login_required
+def cache_stats():
+    """
+    Hit and miss counters of this worker's caches
+    """
+    check_admin()
+    return jsonify(users=user_cache.stats(), lookups=lookup_cache.stats(),
+                   fragments=fragment_cache.stats())
+
+
 # Department Views
 @admin.route('/register', methods=['GET', 'POST'])
 @login_required
@@ -37,6 +93,7 @@ def register():
             # add employee to the database
             db.session.add(employee)
             db.session.commit()
+            invalidate_tables(Employee)
             flash(f"Employee userId: {employee.username} registered")
             # redirect to the login page
             return redirect(url_for('admin.list_employees'))
@@ -46,65 +103,207 @@ def register():
     return render_template('admin/register.html', form=form, title='Register')
 
 
+@admin.route('/register/bulk', methods=['GET', 'POST'])
+@login_required
+def bulk_register():
+    """
+    Register Users from an uploaded CSV or JSON file
+    """
+    check_admin()
+    form = BulkRegistrationForm()
+    report = None
+    if form.validate_on_submit():
+        upload = form.employees.data
+        try:
+            rows = read_rows(upload.stream, upload.filename)
+        except ValueError as error:
+            flash(f'Unable to read {upload.filename}: {error}')
+        else:
+            report = import_employees(rows, workers=current_app.config['IMPORT_HASH_WORKERS'])
+            flash(f'{report.created} employees registered, {len(report.errors)} rows rejected.')
+    else:
+        flash_errors(form)
+
+    return render_template('admin/register_bulk.html', form=form, report=report,
+                           title='Bulk Register')
+
+
 @admin.route('/timesheets', methods=['GET'])
 @login_required
+@query_budget(5)
 def list_timesheets():
     """
-    List all departments
+    List submitted timesheets one page at a time
     """
     check_admin()
-    timesheets = WeekSheet.query.filter(WeekSheet.status != "Not Submitted").all()
-    return render_template('admin/timesheets/timesheets.html',
-                           timesheets=timesheets, title="Timesheets")
+    form = TimesheetFilterForm(request.args)
+    query = WeekSheet.query
+    status = form.status.default
+    if form.validate():
+        status = form.status.data
+        if form.employee_id.data is not None:
+            query = query.filter(WeekSheet.employee_id == form.employee_id.data)
+        if form.week_from.data:
+            query = query.filter(WeekSheet.week_start >= week_bounds(form.week_from.data)[0])
+        if form.week_to.data:
+            query = query.filter(WeekSheet.week_start <= form.week_to.data)
+    else:
+        flash_errors(form)
+    if status == 'all':
+        query = query.filter(WeekSheet.status != Status.NOT_SUBMITTED)
+    else:
+        # the submitted ones are read from the small ix_weeksheet_pending
+        query = query.filter(WeekSheet.status == Status(int(status)))
+
+    page = request.args.get('page', 1, type=int)
+    filter_args = {key: value for key, value in request.args.items()
+                   if value and key not in ('page', 'submit')}
+    bulk_form = BulkApprovalForm()
+
+    def load():
+        # the sheets of the whole page come back in one extra query instead
+        # of one lazy load per row when the template expands each week
+        pagination = query.options(subqueryload(WeekSheet.sheets)) \
+            .order_by(WeekSheet.week_start.desc(), WeekSheet.id.desc()) \
+            .paginate(page=page, per_page=current_app.config['TIMESHEETS_PER_PAGE'],
+                      error_out=False)
+        return dict(timesheets=pagination.items, pagination=pagination,
+                    bulk_form=bulk_form, filter_args=filter_args)
+
+    # the department choices of the bulk form are part of the table too
+    table = cached_fragment('admin/timesheets/table.html', (WeekSheet, Sheet, Department), load,
+                            sorted(filter_args.items()), page)
+    return render_template('admin/timesheets/timesheets.html', table=table,
+                           form=form, bulk_form=bulk_form, title="Timesheets")
 
 
 @admin.route('/timesheets/view/<int:id>', methods=['GET'])
 @login_required
+@query_budget(3)
 def view_timesheet(id):
     """
-    View a Timesheet
+    View a Timesheet, archived or not
     """
     check_admin()
-    timesheet = WeekSheet.query.get_or_404(id)
+    timesheet = WeekSheet.query.get(id) or ArchivedWeekSheet.query.get_or_404(id)
 
     return render_template('admin/timesheets/view_timesheet.html', action="View",
                            timesheet=timesheet, title="View Timesheet")
 
 
+@admin.route('/timesheets/archive', methods=['GET'])
+@login_required
+@query_budget(2)
+def list_archived_timesheets():
+    """
+    List archived timesheets one page at a time, newest week first
+    """
+    check_admin()
+    query = ArchivedWeekSheet.query
+    employee_id = request.args.get('employee_id', type=int)
+    if employee_id is not None:
+        query = query.filter(ArchivedWeekSheet.employee_id == employee_id)
+    pagination = query.order_by(ArchivedWeekSheet.week_start.desc(), ArchivedWeekSheet.id.desc()) \
+        .paginate(page=request.args.get('page', 1, type=int),
+                  per_page=current_app.config['TIMESHEETS_PER_PAGE'], error_out=False)
+    filter_args = {'employee_id': employee_id} if employee_id is not None else {}
+    return render_template('admin/timesheets/archive.html', timesheets=pagination.items,
+                           pagination=pagination, filter_args=filter_args,
+                           title="Archived Timesheets")
+
+
 @admin.route('/timesheets/approval/<int:id>/<decision>', methods=['GET', 'PUT'])
 @login_required
 def approve_timesheet(id, decision):
     """
-    View a Timesheet
+    Approve or reject a Timesheet
     """
     check_admin()
-    decisions = {"approve": "Approved", "reject": "Rejected"}
+    if decision not in DECISIONS:
+        abort(404)
     timesheet = WeekSheet.query.get_or_404(id)
-    for sheet in timesheet.sheets:
-        sheet.status = decisions[decision]
-    timesheet.status = decisions[decision]
+    timesheets_changed, _ = decide_timesheets(DECISIONS[decision], WeekSheet.id == timesheet.id)
+    if not timesheets_changed:
+        # only a submitted timesheet is decided on
+        db.session.rollback()
+        flash(f'This timesheet is {timesheet.status} and cannot be decided on.')
+        return redirect(url_for('admin.list_timesheets'))
     db.session.commit()
+    invalidate_tables(WeekSheet, Sheet)
     flash("Your approval is Successful")
 
     return redirect(url_for('admin.list_timesheets'))
 
 
+@admin.route('/timesheets/approval/bulk', methods=['POST'])
+@login_required
+def bulk_approve_timesheets():
+    """
+    Approve or reject many submitted Timesheets at once, either the
+    selected ids or every timesheet of a department and/or week; the
+    latter are decided by a background job
+    """
+    check_admin()
+    form = BulkApprovalForm()
+    ids = request.form.getlist('ids', type=int)
+    decision = 'reject' if form.reject.data else 'approve'
+    if not form.validate_on_submit():
+        flash_errors(form)
+        return redirect(url_for('admin.list_timesheets'))
+
+    criteria = timesheet_criteria(ids, form.department.data, form.week.data)
+    if not criteria:
+        flash('Select timesheets, a department or a week to decide on.')
+        return redirect(url_for('admin.list_timesheets'))
+
+    if form.department.data or form.week.data:
+        # a whole department or week can be thousands of rows; decide them
+        # in the background rather than holding this worker
+        queued = enqueue('decide_timesheets',
+                         dict(decision=decision, ids=ids, department=form.department.data,
+                              week=form.week.data.isoformat() if form.week.data else None),
+                         created_by=current_user.get_id())
+        return job_accepted(queued, f'Queued: {DECISIONS[decision]} timesheets, job {queued.id}.')
+
+    timesheets_changed, sheets_changed = decide_timesheets(DECISIONS[decision], *criteria)
+    db.session.commit()
+    invalidate_tables(WeekSheet, Sheet)
+
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(status=DECISIONS[decision].label, timesheets=timesheets_changed,
+                       sheets=sheets_changed)
+    flash(f'{timesheets_changed} timesheets ({sheets_changed} days) {DECISIONS[decision]}.')
+    return redirect(url_for('admin.list_timesheets'))
+
+
 @admin.route('/timesheets/approval/sheet/<int:id>/<decision>', methods=['GET', 'PUT'])
 @login_required
+@query_budget(6)
 def approve_sheet(id, decision):
     """
-    View a Timesheet
+    Approve or reject one day of a Timesheet, and the Timesheet with its
+    last day, without loading its other days
     """
     check_admin()
-    sheet = Sheet.query.get_or_404(id)
-    decisions = {"approve": "Approved", "reject": "Rejected"}
-    sheet.status = decisions[decision]
+    if decision not in DECISIONS:
+        abort(404)
+    sheet = db.session.query(Sheet.weeksheet_id, Sheet.workhours, Sheet.date, Sheet.status) \
+        .filter(Sheet.id == id).first()
+    if sheet is None:
+        abort(404)
+    # only a day still submitted when the UPDATE runs is decided on
+    decided = Sheet.query.filter(Sheet.id == id, Sheet.status == Status.SUBMITTED) \
+        .update({Sheet.status: DECISIONS[decision], Sheet.version: Sheet.version + 1},
+                synchronize_session=False)
+    if not decided:
+        flash(f'The {sheet.date} Sheet is {sheet.status} and cannot be decided on.')
+        return redirect(url_for('admin.list_timesheets'))
+    decide_day_rollup(sheet.weeksheet_id, DECISIONS[decision], sheet.workhours)
+    refresh_weekly_hours(WeekSheet.id == sheet.weeksheet_id)
 
     flash(f'You have successfully Approve the {sheet.date} Sheet.')
-    weeksheet = WeekSheet.query.filter(WeekSheet.id == sheet.weeksheet_id).one()
-    if all(day.status == 'Approved' for day in weeksheet.sheets):
-        weeksheet.status = "Approved"
     db.session.commit()
+    invalidate_tables(WeekSheet, Sheet)
     return redirect(url_for('admin.list_timesheets'))
 
 
@@ -119,22 +318,135 @@ def delete_timesheet(id):
     timesheet = WeekSheet.query.get_or_404(id)
     db.session.delete(timesheet)
     db.session.commit()
+    invalidate_tables(WeekSheet, Sheet)
     flash('You have successfully deleted the timesheet')
 
     # redirect to the departments page
     return redirect(url_for('admin.list_timesheets'))
 
 
+@admin.route('/export', methods=['GET'])
+@login_required
+def export_hours():
+    """
+    Stream approved hours as CSV or NDJSON for payroll
+    """
+    check_admin()
+    form = ExportForm(request.args)
+    if not request.args or not form.validate():
+        if request.args:
+            flash_errors(form)
+        return render_template('admin/timesheets/export.html', form=form,
+                               job_form=ExportJobForm(prefix='job'), title="Export Hours")
+
+    start, end, export_format = form.start.data, form.end.data, form.format.data
+    filename = f'approved-hours-{start.isoformat()}-{end.isoformat()}.{export_format}'
+    rows = export_approved_hours(start, end, export_format,
+                                 batch_size=current_app.config['EXPORT_BATCH_SIZE'])
+    return Response(stream_with_context(rows), mimetype=EXPORT_FORMATS[export_format],
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
+@admin.route('/export/jobs', methods=['POST'])
+@login_required
+def export_hours_job():
+    """
+    Write approved hours to a file in the background, for ranges too
+    large to stream within a request
+    """
+    check_admin()
+    job_form = ExportJobForm(prefix='job')
+    if not job_form.validate_on_submit():
+        flash_errors(job_form)
+        return redirect(url_for('admin.export_hours'))
+    queued = enqueue('export_hours',
+                     dict(start=job_form.start.data.isoformat(), end=job_form.end.data.isoformat(),
+                          export_format=job_form.format.data),
+                     created_by=current_user.get_id())
+    return job_accepted(queued, f'Export queued as job {queued.id}.')
+
+
+@admin.route('/jobs', methods=['GET'])
+@login_required
+@query_budget(2)
+def list_jobs():
+    """
+    List background jobs, newest first
+    """
+    check_admin()
+    pagination = Job.query.order_by(Job.id.desc()) \
+        .paginate(page=request.args.get('page', 1, type=int),
+                  per_page=current_app.config['TIMESHEETS_PER_PAGE'], error_out=False)
+    return render_template('admin/jobs/jobs.html', jobs=pagination.items,
+                           pagination=pagination, title="Jobs")
+
+
+@admin.route('/jobs/<int:id>', methods=['GET'])
+@login_required
+@query_budget(1)
+def view_job(id):
+    """
+    Show a background job; the page refreshes itself until it is done
+    """
+    check_admin()
+    job = Job.query.get_or_404(id)
+    result = json.loads(job.result) if job.result else None
+    return render_template('admin/jobs/job.html', job=job, result=result,
+                           pending=job.status in PENDING, title="Job")
+
+
+@admin.route('/jobs/<int:id>/download', methods=['GET'])
+@login_required
+def download_job_result(id):
+    """
+    Download the file written by a finished export job
+    """
+    check_admin()
+    job = Job.query.get_or_404(id)
+    if job.kind != 'export_hours' or job.status != 'succeeded':
+        abort(404)
+    filename = json.loads(job.result)['filename']
+    return send_from_directory(current_app.config['EXPORT_DIR'], filename, as_attachment=True)
+
+
+@admin.route('/search', methods=['GET'])
+@login_required
+@query_budget(8)
+def search_all():
+    """
+    Search descriptions of days, employees, departments and roles, best
+    matches first, with the days one page at a time
+    """
+    check_admin()
+    form = SearchForm(request.args)
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = current_app.config['TIMESHEETS_PER_PAGE']
+    results = None
+    if request.args and form.validate():
+        terms = search_terms(form.q.data)
+        # one extra row tells whether there is a next page without counting
+        sheets = search_sheets(terms, per_page + 1, (page - 1) * per_page)
+        results = dict(sheets=sheets[:per_page], has_next=len(sheets) > per_page)
+        if page == 1:
+            results.update(employees=search(Employee, terms, SEARCH_PREVIEW),
+                           departments=search(Department, terms, SEARCH_PREVIEW),
+                           roles=search(Role, terms, SEARCH_PREVIEW))
+    return render_template('admin/search.html', form=form, results=results, page=page,
+                           title="Search")
+
+
 @admin.route('/departments', methods=['GET'])
 @login_required
+@query_budget(2)
 def list_departments():
     """
     List all departments
     """
     check_admin()
-    departments = Department.query.all()
+    table = cached_fragment('admin/departments/table.html', (Department, Employee),
+                            lambda: dict(departments=with_employee_counts(Department)))
     return render_template('admin/departments/departments.html',
-                           departments=departments, title="Departments")
+                           table=table, title="Departments")
 
 
 @admin.route('/departments/add', methods=['GET', 'POST'])
@@ -153,6 +465,7 @@ def add_department():
             # add department to the database
             db.session.add(department)
             db.session.commit()
+            invalidate_tables(Department)
             flash('You have successfully added a new department.')
         except:
             # in case department name already exists
@@ -183,6 +496,7 @@ def edit_department(id):
         department.name = form.name.data
         department.description = form.description.data
         db.session.commit()
+        invalidate_tables(Department)
         flash('You have successfully edited the department.')
 
         # redirect to the departments page
@@ -206,6 +520,7 @@ def delete_department(id):
     department = Department.query.get_or_404(id)
     db.session.delete(department)
     db.session.commit()
+    invalidate_tables(Department)
     flash('You have successfully deleted the department.')
 
     # redirect to the departments page
@@ -215,14 +530,16 @@ def delete_department(id):
 # Role Views
 @admin.route('/roles', methods=['GET'])
 @login_required
+@query_budget(2)
 def list_roles():
     check_admin()
     """
     List all roles
     """
-    roles = Role.query.all()
+    table = cached_fragment('admin/roles/table.html', (Role, Employee),
+                            lambda: dict(roles=with_employee_counts(Role)))
     return render_template('admin/roles/roles.html',
-                           roles=roles, title='Roles')
+                           table=table, title='Roles')
 
 
 @admin.route('/roles/add', methods=['GET', 'POST'])
@@ -244,6 +561,7 @@ def add_role():
             # add role to the database
             db.session.add(role)
             db.session.commit()
+            invalidate_tables(Role)
             flash('You have successfully added a new role.')
         except:
             # in case role name already exists
@@ -274,6 +592,7 @@ def edit_role(id):
         role.description = form.description.data
         db.session.add(role)
         db.session.commit()
+        invalidate_tables(Role)
         flash('You have successfully edited the role.')
 
         # redirect to the roles page
@@ -296,6 +615,7 @@ def delete_role(id):
     role = Role.query.get_or_404(id)
     db.session.delete(role)
     db.session.commit()
+    invalidate_tables(Role)
     flash('You have successfully deleted the role.')
 
     # redirect to the roles page
@@ -305,14 +625,16 @@ def delete_role(id):
 # Employee Views
 @admin.route('/employee',methods=['GET'])
 @login_required
+@query_budget(2)
 def list_employees():
     """
     List all employee
     """
     check_admin()
-    employees = Employee.query.all()
+    table = cached_fragment('admin/employees/table.html', (Employee,),
+                            lambda: dict(employees=Employee.query.all()))
     return render_template('admin/employees/employees.html',
-                           employees=employees, title='Employees')
+                           table=table, title='Employees')
 
 
 @admin.route('/employee/assign/<int:id>', methods=['GET', 'POST'])
@@ -330,10 +652,11 @@ def assign_employee(id):
         abort(403)
     form = EmployeeAssignForm(obj=employee)
     if form.validate_on_submit():
-        employee.department_id = db.session.query(Department.id).filter_by(name=form['department'].data.name).scalar()
-        employee.role_id = db.session.query(Role.id).filter_by(name=form['role'].data.name).scalar()
+        employee.department_id = form.department_id.data
+        employee.role_id = form.role_id.data
 
         db.session.commit()
+        invalidate_tables(Employee)
         flash('You have successfully assigned a department and role.')
 
         # redirect to the roles page
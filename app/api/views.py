@@ -0,0 +1,432 @@
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from flask import abort, current_app, jsonify, request
+from flask_login import current_user
+from sqlalchemy import func
+
+from . import api
+from .. import db
+from ..models import Employee, Job, Sheet, WeekSheet, WeeklyHours
+from ..util.query_util import query_budget
+from ..util.status_util import Status
+from ..util.token_util import bearer_token, issue_tokens, revoke_token, verify_token
+
+
+def _timestamp(value):
+    return value.isoformat() + 'Z' if value else None
+
+
+def _day(value):
+    return value.isoformat() if value else None
+
+
+EMPLOYEE_FIELDS = {
+    'id': lambda employee: employee.id,
+    'email': lambda employee: employee.email,
+    'username': lambda employee: employee.username,
+    'first_name': lambda employee: employee.first_name,
+    'last_name': lambda employee: employee.last_name,
+    'department_id': lambda employee: employee.department_id,
+    'role_id': lambda employee: employee.role_id,
+    'is_admin': lambda employee: bool(employee.is_admin),
+    'updated_at': lambda employee: _timestamp(employee.updated_at),
+}
+
+WEEKSHEET_FIELDS = {
+    'id': lambda weeksheet: weeksheet.id,
+    'employee_id': lambda weeksheet: weeksheet.employee_id,
+    'period': lambda weeksheet: weeksheet.period,
+    'week_start': lambda weeksheet: _day(weeksheet.week_start),
+    'week_end': lambda weeksheet: _day(weeksheet.week_end),
+    'status': lambda weeksheet: weeksheet.status.label,
+    'day_count': lambda weeksheet: weeksheet.day_count,
+    'total_hours': lambda weeksheet: weeksheet.total_hours,
+    'approved_hours': lambda weeksheet: weeksheet.approved_hours,
+    'pending_days': lambda weeksheet: weeksheet.pending_days,
+    'approved_days': lambda weeksheet: weeksheet.approved_days,
+    'rejected_days': lambda weeksheet: weeksheet.rejected_days,
+    'updated_at': lambda weeksheet: _timestamp(weeksheet.updated_at),
+}
+
+SHEET_FIELDS = {
+    'id': lambda sheet: sheet.id,
+    'weeksheet_id': lambda sheet: sheet.weeksheet_id,
+    'date': lambda sheet: _day(sheet.work_date),
+    'workhours': lambda sheet: sheet.workhours,
+    'description': lambda sheet: sheet.description,
+    'status': lambda sheet: sheet.status.label,
+    'updated_at': lambda sheet: _timestamp(sheet.updated_at),
+}
+
+JOB_FIELDS = {
+    'id': lambda job: job.id,
+    'kind': lambda job: job.kind,
+    'status': lambda job: job.status,
+    'arguments': lambda job: json.loads(job.arguments),
+    'attempts': lambda job: job.attempts,
+    'max_attempts': lambda job: job.max_attempts,
+    'result': lambda job: json.loads(job.result) if job.result else None,
+    'error': lambda job: job.error,
+    'created_by': lambda job: job.created_by,
+    'created_at': lambda job: _timestamp(job.created_at),
+    'run_after': lambda job: _timestamp(job.run_after),
+    'started_at': lambda job: _timestamp(job.started_at),
+    'finished_at': lambda job: _timestamp(job.finished_at),
+    'updated_at': lambda job: _timestamp(job.updated_at),
+}
+
+
+# what clients call to get a token in the first place
+PUBLIC_ENDPOINTS = {'api.create_tokens', 'api.refresh_tokens'}
+
+
+@api.before_request
+def require_login():
+    if request.endpoint not in PUBLIC_ENDPOINTS and not current_user.is_authenticated:
+        return jsonify(error='Authentication required'), 401
+
+
+@api.errorhandler(400)
+@api.errorhandler(401)
+@api.errorhandler(403)
+@api.errorhandler(404)
+def json_error(error):
+    return jsonify(error=error.description), error.code
+
+
+def check_owner(employee_id):
+    # employees only read their own data; admins read everyone's
+    if not current_user.is_admin and employee_id != current_user.get_id():
+        abort(403, 'Not allowed to read this resource')
+
+
+def selected_fields(available):
+    """The fields named in ?fields=a,b, or all of them"""
+    requested = [name.strip() for name in request.args.get('fields', '').split(',') if name.strip()]
+    if not requested:
+        return available
+    unknown = [name for name in requested if name not in available]
+    if unknown:
+        abort(400, 'Unknown fields: ' + ', '.join(unknown))
+    return {name: available[name] for name in requested}
+
+
+def serialize(row, fields):
+    return {name: getter(row) for name, getter in fields.items()}
+
+
+def date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        abort(400, f'{name} must be a YYYY-MM-DD date')
+
+
+def status_arg():
+    """The status named by ?status=, by its label, or None"""
+    value = request.args.get('status')
+    if not value:
+        return None
+    try:
+        return Status.from_label(value)
+    except KeyError:
+        abort(400, 'status must be one of: ' + ', '.join(status.label for status in Status))
+
+
+def encode_cursor(last_id):
+    return urlsafe_b64encode(str(last_id).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        return int(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except (TypeError, ValueError):
+        abort(400, 'Invalid cursor')
+
+
+def conditional(validator, last_modified, build):
+    """
+    Answer with 304 when the client's ETag or Last-Modified still matches
+    the validator, otherwise with the JSON document build() returns. The
+    validator is cheap to compute; build() is only called on a miss.
+    """
+    seed = repr((current_user.get_id(), request.full_path, validator)).encode()
+    etag = hashlib.sha1(seed).hexdigest()
+    last_modified = last_modified.replace(microsecond=0) if last_modified else None
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        not_modified = bool(last_modified and request.if_modified_since and
+                            last_modified <= request.if_modified_since.replace(tzinfo=None))
+    if not_modified:
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # clients may keep a copy but must revalidate it on every poll
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def paginate(query, model, fields):
+    """
+    Cursor-paginated, conditional response for a collection query. The
+    ETag comes from the ids and update times of the page's rows only.
+    """
+    limit = max(1, min(request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int),
+                       current_app.config['API_MAX_PAGE_SIZE']))
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(model.id > decode_cursor(cursor))
+    query = query.order_by(model.id)
+
+    window = query.with_entities(model.id.label('id'), model.updated_at.label('updated_at')) \
+        .limit(limit + 1).subquery()
+    count, id_sum, last_modified = db.session.query(func.count(window.c.id),
+                                                    func.sum(window.c.id),
+                                                    func.max(window.c.updated_at)).one()
+
+    def build():
+        rows = query.limit(limit + 1).all()
+        next_cursor = encode_cursor(rows[limit - 1].id) if len(rows) > limit else None
+        return {'data': [serialize(row, fields) for row in rows[:limit]],
+                'next_cursor': next_cursor}
+
+    return conditional((count, id_sum, str(last_modified)), last_modified, build)
+
+
+@api.route('/employees', methods=['GET'])
+@query_budget(2)
+def list_employees():
+    """
+    List employees, admins only
+    """
+    if not current_user.is_admin:
+        abort(403, 'Admins only')
+    query = Employee.query
+    if request.args.get('department_id'):
+        query = query.filter(Employee.department_id == request.args.get('department_id', type=int))
+    return paginate(query, Employee, selected_fields(EMPLOYEE_FIELDS))
+
+
+@api.route('/employees/<int:id>', methods=['GET'])
+@query_budget(1)
+def get_employee(id):
+    """
+    Read one employee
+    """
+    check_owner(id)
+    employee = Employee.query.get(id)
+    if employee is None:
+        abort(404, 'No such employee')
+    fields = selected_fields(EMPLOYEE_FIELDS)
+    return conditional(str(employee.updated_at), employee.updated_at,
+                       lambda: serialize(employee, fields))
+
+
+@api.route('/weeksheets', methods=['GET'])
+@query_budget(2)
+def list_weeksheets():
+    """
+    List weeksheets: an employee's own, or anyone's for admins
+    """
+    query = WeekSheet.query
+    if not current_user.is_admin:
+        query = query.filter(WeekSheet.employee_id == current_user.get_id())
+    elif request.args.get('employee_id'):
+        query = query.filter(WeekSheet.employee_id == request.args.get('employee_id', type=int))
+    status = status_arg()
+    if status is not None:
+        query = query.filter(WeekSheet.status == status)
+    week_from, week_to = date_arg('week_from'), date_arg('week_to')
+    if week_from:
+        query = query.filter(WeekSheet.week_start >= week_from)
+    if week_to:
+        query = query.filter(WeekSheet.week_start <= week_to)
+    return paginate(query, WeekSheet, selected_fields(WEEKSHEET_FIELDS))
+
+
+@api.route('/weeksheets/<int:id>', methods=['GET'])
+@query_budget(3)
+def get_weeksheet(id):
+    """
+    Read one weeksheet with its days
+    """
+    weeksheet = WeekSheet.query.get(id)
+    if weeksheet is None:
+        abort(404, 'No such weeksheet')
+    check_owner(weeksheet.employee_id)
+    fields = selected_fields(dict(WEEKSHEET_FIELDS, sheets=None))
+    sheet_count, sheet_id_sum, sheets_modified = db.session.query(
+        func.count(Sheet.id), func.sum(Sheet.id), func.max(Sheet.updated_at)) \
+        .filter(Sheet.weeksheet_id == id).one()
+    last_modified = max(filter(None, (weeksheet.updated_at, sheets_modified)), default=None)
+
+    def build():
+        document = serialize(weeksheet, {name: getter for name, getter in fields.items()
+                                         if name != 'sheets'})
+        if 'sheets' in fields:
+            document['sheets'] = [serialize(sheet, SHEET_FIELDS) for sheet in weeksheet.sheets]
+        return document
+
+    validator = (str(weeksheet.updated_at), sheet_count, sheet_id_sum, str(sheets_modified))
+    return conditional(validator, last_modified, build)
+
+
+@api.route('/sheets', methods=['GET'])
+@query_budget(2)
+def list_sheets():
+    """
+    List days: an employee's own, or anyone's for admins
+    """
+    query = Sheet.query
+    if not current_user.is_admin:
+        query = query.join(WeekSheet, Sheet.weeksheet_id == WeekSheet.id) \
+            .filter(WeekSheet.employee_id == current_user.get_id())
+    if request.args.get('weeksheet_id'):
+        query = query.filter(Sheet.weeksheet_id == request.args.get('weeksheet_id', type=int))
+    status = status_arg()
+    if status is not None:
+        query = query.filter(Sheet.status == status)
+    date_from, date_to = date_arg('from'), date_arg('to')
+    if date_from:
+        query = query.filter(Sheet.work_date >= date_from)
+    if date_to:
+        query = query.filter(Sheet.work_date <= date_to)
+    return paginate(query, Sheet, selected_fields(SHEET_FIELDS))
+
+
+@api.route('/tokens', methods=['POST'])
+def create_tokens():
+    """
+    Trade an email and password for an access and a refresh token. Send
+    the access token as "Authorization: Bearer <token>".
+    """
+    data = request.get_json(silent=True) or {}
+    email, password = data.get('email'), data.get('password')
+    if not isinstance(email, str) or not isinstance(password, str):
+        abort(400, 'email and password are required')
+    employee = Employee.query.filter_by(email=email).first()
+    if employee is None or not employee.verify_password(password):
+        abort(401, 'Invalid email or password')
+    return jsonify(issue_tokens(employee)), 201
+
+
+@api.route('/tokens/refresh', methods=['POST'])
+def refresh_tokens():
+    """
+    Trade a refresh token for a new pair. The refresh token is used up:
+    it is revoked, and the employee read again, so a deleted employee
+    gets no new tokens. Revoking is the check that it was not used
+    before, so a token replayed on a worker whose revocation list is not
+    synced yet, or sent twice at once, gets one pair only.
+    """
+    token = (request.get_json(silent=True) or {}).get('refresh_token')
+    claims = verify_token(token, 'refresh') if isinstance(token, str) else None
+    if claims is None:
+        abort(401, 'Invalid, expired or revoked refresh token')
+    employee = Employee.query.get(claims['sub'])
+    if employee is None or not revoke_token(claims):
+        abort(401, 'Invalid, expired or revoked refresh token')
+    return jsonify(issue_tokens(employee)), 201
+
+
+@api.route('/tokens/revoke', methods=['POST'])
+def revoke_tokens():
+    """
+    Sign an API client out: revoke the access token of the request and
+    the refresh token sent along, if any
+    """
+    revoked = []
+    bearer = bearer_token(request)
+    access = verify_token(bearer, 'access') if bearer else None
+    if access is not None:
+        revoked.append(access)
+    token = (request.get_json(silent=True) or {}).get('refresh_token')
+    if token is not None:
+        refresh = verify_token(token, 'refresh') if isinstance(token, str) else None
+        if refresh is None:
+            abort(400, 'Invalid, expired or revoked refresh token')
+        check_owner(refresh['sub'])
+        revoked.append(refresh)
+    for claims in revoked:
+        revoke_token(claims)
+    return jsonify(revoked=len(revoked))
+
+
+# ?group= names and what they group the weekly hours summary by
+HOURS_GROUPS = {
+    'employee': WeeklyHours.employee_id,
+    'department': WeeklyHours.department_id,
+    'role': WeeklyHours.role_id,
+    'week': WeeklyHours.week_start,
+}
+HOURS_SUMS = ('days', 'total_hours', 'not_submitted_hours', 'submitted_hours',
+              'approved_hours', 'rejected_hours')
+
+
+@api.route('/hours', methods=['GET'])
+@query_budget(2)
+def list_hours():
+    """
+    Sum hours by status, grouped by ?group=, some of employee, department,
+    role and week: an employee's own, or anyone's for admins. Reads the
+    pre-summed weekly hours, so days are never scanned. At most
+    API_MAX_PAGE_SIZE groups; truncated tells whether there were more.
+    """
+    names = [name.strip() for name in request.args.get('group', 'week').split(',') if name.strip()]
+    if not names or any(name not in HOURS_GROUPS for name in names):
+        abort(400, 'group must be some of: ' + ', '.join(HOURS_GROUPS))
+    criteria = []
+    if not current_user.is_admin:
+        criteria.append(WeeklyHours.employee_id == current_user.get_id())
+    else:
+        for name in ('employee', 'department', 'role'):
+            if request.args.get(f'{name}_id'):
+                criteria.append(HOURS_GROUPS[name] == request.args.get(f'{name}_id', type=int))
+    week_from, week_to = date_arg('week_from'), date_arg('week_to')
+    if week_from:
+        criteria.append(WeeklyHours.week_start >= week_from)
+    if week_to:
+        criteria.append(WeeklyHours.week_start <= week_to)
+    # every refresh of a row rewrites its updated_at
+    count, last_modified = db.session.query(func.count(), func.max(WeeklyHours.updated_at)) \
+        .select_from(WeeklyHours).filter(*criteria).one()
+
+    def build():
+        limit = current_app.config['API_MAX_PAGE_SIZE']
+        groups = [HOURS_GROUPS[name] for name in names]
+        rows = db.session.query(*groups, *(func.sum(getattr(WeeklyHours, column)) for column in HOURS_SUMS)) \
+            .filter(*criteria).group_by(*groups).order_by(*groups).limit(limit + 1).all()
+        data = []
+        for row in rows[:limit]:
+            document = {name: _day(value) if name == 'week' else value for name, value in zip(names, row)}
+            document.update((column, int(value or 0)) for column, value in zip(HOURS_SUMS, row[len(names):]))
+            data.append(document)
+        return {'data': data, 'truncated': len(rows) > limit}
+
+    return conditional((count, str(last_modified)), last_modified, build)
+
+
+@api.route('/jobs/<int:id>', methods=['GET'])
+@query_budget(1)
+def get_job(id):
+    """
+    Read one background job, to poll it until it is done
+    """
+    job = Job.query.get(id)
+    if job is None:
+        abort(404, 'No such job')
+    check_owner(job.created_by)
+    fields = selected_fields(JOB_FIELDS)
+    return conditional(str(job.updated_at), job.updated_at, lambda: serialize(job, fields))
@@ -0,0 +1,125 @@
+from datetime import datetime
+
+import click
+
+
+def parse_date(ctx, param, value):
+    """Click callback turning a YYYY-MM-DD option into a date"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise click.BadParameter('expected a YYYY-MM-DD date')
+
+
+def register_commands(app):
+    """
+    Register the flask CLI commands of the app
+    """
+
+    @app.cli.command('bootstrap')
+    @click.option('--admin-email', envvar='ADMIN_EMAIL', default='admin@admin.com')
+    @click.option('--admin-username', envvar='ADMIN_USERNAME', default='admin')
+    @click.option('--admin-password', envvar='ADMIN_PASSWORD', default='admin2020')
+    @click.option('--skip-migrations', is_flag=True, help='Only seed the admin account')
+    def bootstrap_command(admin_email, admin_username, admin_password, skip_migrations):
+        """Migrate the database and seed the admin account; idempotent."""
+        from .util.bootstrap_util import migrate_database, seed_admin
+
+        if not skip_migrations:
+            legacy_revision = migrate_database()
+            if legacy_revision:
+                click.echo(f'Stamped existing schema at revision {legacy_revision}.')
+        if seed_admin(admin_email, admin_username, admin_password):
+            click.echo(f'Created admin {admin_username} <{admin_email}>.')
+        else:
+            click.echo('Admin account already exists.')
+
+    @app.cli.command('export-hours')
+    @click.option('--start', required=True, callback=parse_date, help='First day, YYYY-MM-DD')
+    @click.option('--end', required=True, callback=parse_date, help='Last day, YYYY-MM-DD')
+    @click.option('--format', 'export_format', type=click.Choice(['csv', 'ndjson']), default='csv')
+    @click.option('--output', type=click.File('w'), default='-', help='Defaults to stdout')
+    def export_hours(start, end, export_format, output):
+        """Stream approved hours between two days as CSV or NDJSON."""
+        from .util.export_util import export_approved_hours
+
+        for chunk in export_approved_hours(start, end, export_format,
+                                           batch_size=app.config['EXPORT_BATCH_SIZE']):
+            output.write(chunk)
+
+    @app.cli.command('import-employees')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--workers', type=int, default=None, help='Password hashing processes')
+    def import_employees_command(path, workers):
+        """Register employees from a CSV or JSON file."""
+        from .util.import_util import import_employees, read_rows
+
+        with open(path, encoding='utf-8-sig') as stream:
+            rows = read_rows(stream, path)
+        report = import_employees(rows, workers=workers or app.config['IMPORT_HASH_WORKERS'])
+        for error in report.errors:
+            click.echo(f"row {error['row']} ({error['email']}): {error['error']}", err=True)
+        click.echo(f'{report.created} employees registered, {len(report.errors)} rows rejected.')
+
+    @app.cli.command('archive-timesheets')
+    @click.option('--months', type=int, default=None,
+                  help='Retention period; defaults to ARCHIVE_AFTER_MONTHS')
+    @click.option('--batch-size', type=int, default=None, help='Timesheets per transaction')
+    @click.option('--dry-run', is_flag=True, help='Only count the timesheets due')
+    def archive_timesheets_command(months, batch_size, dry_run):
+        """Move approved timesheets past the retention period to the archive."""
+        from . import db
+        from .models import Sheet, WeekSheet
+        from .util.archive_util import archive_timesheets, retention_cutoff
+        from .util.fragment_util import invalidate_tables
+        from .util.status_util import Status
+
+        before = retention_cutoff(app.config['ARCHIVE_AFTER_MONTHS'] if months is None else months)
+        if dry_run:
+            due = db.session.query(db.func.count(WeekSheet.id)) \
+                .filter(WeekSheet.status == Status.APPROVED, WeekSheet.week_end < before).scalar()
+            click.echo(f'{due} timesheets of weeks ending before {before} are due for archiving.')
+            return
+        timesheets, sheets = archive_timesheets(before, batch_size or app.config['ARCHIVE_BATCH_SIZE'])
+        invalidate_tables(WeekSheet, Sheet)
+        click.echo(f'Archived {timesheets} timesheets ({sheets} days) of weeks ending before {before}.')
+
+    @app.cli.command('purge-orphans')
+    @click.option('--batch-size', type=int, default=None, help='Days per transaction')
+    def purge_orphans_command(batch_size):
+        """Delete days whose timesheet no longer exists."""
+        from .util.archive_util import purge_orphans
+
+        hot, archived = purge_orphans(batch_size or app.config['ARCHIVE_BATCH_SIZE'])
+        click.echo(f'Purged {hot} orphaned days and {archived} orphaned archived days.')
+
+    @app.cli.command('purge-revoked-tokens')
+    def purge_revoked_tokens_command():
+        """Delete revoked API tokens that have expired anyway."""
+        from .util.token_util import purge_revoked_tokens
+
+        click.echo(f'Purged {purge_revoked_tokens()} expired revoked tokens.')
+
+    @app.cli.command('rebuild-weekly-hours')
+    def rebuild_weekly_hours_command():
+        """Sum the weekly hours summary anew from every hot and archived day."""
+        from .models import WeeklyHours
+        from .util.fragment_util import invalidate_tables
+        from .util.summary_util import rebuild_weekly_hours
+
+        rows = rebuild_weekly_hours()
+        invalidate_tables(WeeklyHours)
+        click.echo(f'Rebuilt {rows} weekly hours rows.')
+
+    @app.cli.command('jobs-worker')
+    @click.option('--threads', type=int, default=1, help='Jobs run at the same time')
+    @click.option('--poll-interval', type=float, default=None,
+                  help='Seconds between looks at an empty queue')
+    @click.option('--burst', is_flag=True, help='Stop once the queue is empty')
+    def jobs_worker_command(threads, poll_interval, burst):
+        """Run queued background jobs until interrupted."""
+        from .util.job_util import work
+
+        count = work(app, threads=threads, burst=burst,
+                     poll_interval=poll_interval or app.config['JOB_POLL_INTERVAL'])
+        click.echo(f'{count} jobs run.')
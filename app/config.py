@@ -0,0 +1,134 @@
+import os
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+
+def env_int(name, default=None):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def env_bool(name, default=False):
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+class Config(object):
+    """
+    Common configuration, overridable through environment variables
+    """
+    # Database; point DATABASE_URL at PostgreSQL in production
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL',
+                                             'sqlite:///' + os.path.join(basedir, 'admin.db'))
+    SQLALCHEMY_ECHO = False
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # connection pool; left unset for SQLite, which opens a connection per checkout
+    SQLALCHEMY_POOL_SIZE = env_int('DATABASE_POOL_SIZE')
+    SQLALCHEMY_MAX_OVERFLOW = env_int('DATABASE_MAX_OVERFLOW')
+    SQLALCHEMY_POOL_TIMEOUT = env_int('DATABASE_POOL_TIMEOUT')
+    SQLALCHEMY_POOL_RECYCLE = env_int('DATABASE_POOL_RECYCLE')
+    DATABASE_PRE_PING = env_bool('DATABASE_PRE_PING', True)
+    # applied to every new SQLite connection
+    SQLITE_BUSY_TIMEOUT = env_int('SQLITE_BUSY_TIMEOUT', 5000)  # milliseconds
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE = env_int('SQLITE_CACHE_SIZE', -16000)  # negative is KiB
+
+    JSON_SORT_KEYS = False  # to get the order as we prescribed
+    # signs sessions, CSRF tokens and API tokens, so every worker, host and
+    # deploy needs the same one; create_app refuses to start without it,
+    # except in development, where it reads or creates SECRET_KEY_FILE
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+    SECRET_KEY_FILE = None
+    # unfingerprinted static files; fingerprinted ones are cached for a year
+    SEND_FILE_MAX_AGE_DEFAULT = env_int('STATIC_MAX_AGE', 300)
+
+    # API tokens for non-browser clients, see util/token_util.py; access
+    # tokens are checked without a query, so a demoted admin keeps their
+    # rights for up to API_ACCESS_TOKEN_TTL seconds
+    API_ACCESS_TOKEN_TTL = env_int('API_ACCESS_TOKEN_TTL', 900)
+    API_REFRESH_TOKEN_TTL = env_int('API_REFRESH_TOKEN_TTL', 30 * 24 * 3600)
+    # other workers honour a revocation within REVOCATION_SYNC_INTERVAL seconds
+    REVOCATION_SYNC_INTERVAL = env_int('REVOCATION_SYNC_INTERVAL', 5)
+    REVOCATION_CACHE_SIZE = env_int('REVOCATION_CACHE_SIZE', 100000)
+
+    TIMESHEETS_PER_PAGE = env_int('TIMESHEETS_PER_PAGE', 25)
+    EXPORT_BATCH_SIZE = env_int('EXPORT_BATCH_SIZE', 1000)
+    API_PAGE_SIZE = env_int('API_PAGE_SIZE', 50)
+    API_MAX_PAGE_SIZE = env_int('API_MAX_PAGE_SIZE', 500)
+    # None hashes imported passwords on every CPU
+    IMPORT_HASH_WORKERS = env_int('IMPORT_HASH_WORKERS')
+    USER_CACHE_SIZE = env_int('USER_CACHE_SIZE', 4096)
+    USER_CACHE_TTL = env_int('USER_CACHE_TTL', 300)
+    LOOKUP_CACHE_TTL = env_int('LOOKUP_CACHE_TTL', 60)
+    # each worker reads the table data versions, which key the caches
+    # below and the user cache, at most every DATA_VERSIONS_INTERVAL
+    # seconds, so it sees a change another process made within that time
+    DATA_VERSIONS_INTERVAL = env_int('DATA_VERSIONS_INTERVAL', 2)
+    # rendered admin tables, per worker unless CACHE_REDIS_URL is set
+    FRAGMENT_CACHE_SIZE = env_int('FRAGMENT_CACHE_SIZE', 256)
+    FRAGMENT_CACHE_TTL = env_int('FRAGMENT_CACHE_TTL', 300)
+    # admin dashboard reports, see util/analytics_util.py; rebuilt in the
+    # background when the tables they read change, dropped after
+    # ANALYTICS_CACHE_TTL seconds
+    ANALYTICS_CACHE_SIZE = env_int('ANALYTICS_CACHE_SIZE', 64)
+    ANALYTICS_CACHE_TTL = env_int('ANALYTICS_CACHE_TTL', 600)
+    ANALYTICS_BASELINE_HOURS = env_int('ANALYTICS_BASELINE_HOURS', 40)  # a full week
+    ANALYTICS_DEFAULT_WEEKS = env_int('ANALYTICS_DEFAULT_WEEKS', 12)
+    # shares rendered fragments between workers, e.g.
+    # redis://localhost:6379/0; needs the redis package
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+
+    # a directory shared by the gunicorn workers, so /metrics covers all of
+    # them; unset, each worker reports only its own requests
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = env_int('METRICS_FLUSH_INTERVAL', 5)  # seconds
+    # lets a scraper read /metrics with "Authorization: Bearer <token>"
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # retention: `flask archive-timesheets` moves approved timesheets whose
+    # week ended before the month this many months ago to the archive tables
+    ARCHIVE_AFTER_MONTHS = env_int('ARCHIVE_AFTER_MONTHS', 24)
+    ARCHIVE_BATCH_SIZE = env_int('ARCHIVE_BATCH_SIZE', 1000)
+
+    # background jobs, run by `flask jobs-worker`
+    JOB_MAX_ATTEMPTS = env_int('JOB_MAX_ATTEMPTS', 3)
+    JOB_RETRY_DELAY = env_int('JOB_RETRY_DELAY', 30)  # seconds, doubled on each retry
+    # a worker marks the jobs it runs as alive every JOB_HEARTBEAT_INTERVAL
+    # seconds; a running job not marked for JOB_TIMEOUT seconds, whose
+    # worker is most likely gone, is given to another worker
+    JOB_HEARTBEAT_INTERVAL = env_int('JOB_HEARTBEAT_INTERVAL', 30)
+    JOB_TIMEOUT = env_int('JOB_TIMEOUT', 120)
+    JOB_POLL_INTERVAL = env_int('JOB_POLL_INTERVAL', 1)  # seconds
+    # where export jobs write their files; shared by the web and worker processes
+    EXPORT_DIR = os.environ.get('EXPORT_DIR', os.path.join(os.path.dirname(basedir), 'exports'))
+
+    # "warn" or "raise" when a request lazy loads a relationship row by row
+    LAZY_LOAD_GUARD = os.environ.get('LAZY_LOAD_GUARD')
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    SECRET_KEY_FILE = os.environ.get('SECRET_KEY_FILE', os.path.join(os.path.dirname(basedir), 'secret_key'))
+    LAZY_LOAD_GUARD = os.environ.get('LAZY_LOAD_GUARD', 'warn')
+
+
+class ProductionConfig(Config):
+    DEBUG = False
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'testing')
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+    LAZY_LOAD_GUARD = os.environ.get('LAZY_LOAD_GUARD', 'raise')
+
+
+app_config = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+    'default': ProductionConfig,
+}
@@ -1,6 +1,10 @@
 from flask_wtf import FlaskForm
 from wtforms import IntegerField, StringField, SubmitField, FieldList, FormField, Form
-from wtforms.validators import DataRequired
+from wtforms.fields.html5 import DateField
+from wtforms.validators import DataRequired, Length, NumberRange
+
+# most weeks WeeksFillForm creates at once
+MAX_WEEKS = 12
 
 
 
@@ -36,3 +40,17 @@ class WeekSheetFormdb(FlaskForm):
     period = StringField('From-to', validators=[DataRequired()])
     sheets = FieldList(FormField(SheetFormdb))
     submit = SubmitField('Submit')
+
+
+class WeeksFillForm(FlaskForm):
+    """
+    Form to create several weeks of timesheets at once, e.g. after holidays
+    """
+    first_week = DateField('First week', validators=[DataRequired()])
+    weeks = IntegerField('Number of weeks', default=1,
+                         validators=[DataRequired(), NumberRange(min=1, max=MAX_WEEKS)])
+    workhours = IntegerField('Workhours per day', default=8,
+                             validators=[DataRequired(), NumberRange(min=1, max=24)])
+    description = StringField('Description', validators=[DataRequired(), Length(max=200)])
+    save = SubmitField('Save')
+    submit = SubmitField('Submit')
@@ -1,41 +1,29 @@
-from flask import abort, flash, redirect, render_template, url_for, request
+from datetime import timedelta
+
+from flask import abort, current_app, flash, jsonify, redirect, render_template, url_for, request
 from flask_login import current_user, login_required
+from flask_wtf.csrf import validate_csrf
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 from . import employee
-from .forms import WeekSheetFormdb, SheetFormdb, WeekSheetFillForm
+from .forms import WeekSheetFormdb, SheetFormdb, WeekSheetFillForm, WeeksFillForm
 from .. import db
-from ..models import Sheet, WeekSheet
+from ..models import ArchivedWeekSheet, Sheet, WeekSheet
 from ..util.errors_util import flash_errors
+from ..util.fragment_util import invalidate_tables
+from ..util.query_util import query_budget
+from ..util.rollup_util import refresh_rollups
+from ..util.summary_util import refresh_weekly_hours
+from ..util.status_util import EDITABLE, InvalidTransition, Status
+from ..util.week_util import current_week, week_bounds, week_calendar
 
 
-def getdates():
-    from datetime import date, timedelta
-    # dd/mm/YY
-    testdate = date.today()
-    # testdate = datetime.date(2014, 12, 31)
-    testdateweekday = testdate.weekday()
-    # lower bound
-    sw = testdate - timedelta(days=testdateweekday)
-    # upper bound
-    ew = testdate + timedelta(days=(6 - testdateweekday))
-    weekstring = str(sw.strftime("%d/%m/%Y") + '-' + ew.strftime("%d/%m/%Y"))
-    week_dates = []
-    for i in range(0, 5):
-        week_dates.append((sw + timedelta(days=i)).strftime("%d/%m/%Y"))
-    week_data = {"week": weekstring, "dates": week_dates, }
-    return week_data
-
-
-data = getdates()
-dates = data["dates"]
-period = data["week"]
-
-
-def populate_form_fields(timesheet_db=None):
+def populate_form_fields(timesheet_db=None, week=None):
     if timesheet_db is None:
         form = WeekSheetFillForm()
-        for i in range(0, 5):
+        for date_string in week.dates:
             sheetformdb = SheetFormdb()
-            sheetformdb.date = dates[i]
+            sheetformdb.date = date_string
             sheetformdb.workhours = None
             sheetformdb.description = None
             form.sheets.append_entry(sheetformdb)
@@ -56,11 +44,13 @@ def populate_form_fields(timesheet_db=None):
 
 @employee.route('/timesheets', methods=['GET', 'POST'])
 @login_required
+@query_budget(1)
 def list_timesheets():
     """
     List all Timesheets
     """
-    timesheets = WeekSheet.query.filter(WeekSheet.employee_id == current_user.get_id()).limit(52).all()
+    timesheets = WeekSheet.query.filter(WeekSheet.employee_id == current_user.get_id()) \
+        .order_by(WeekSheet.week_start.desc()).limit(52).all()
     return render_template('employee/timesheets.html',
                            timesheets=timesheets, title="Timesheets")
 
@@ -71,9 +61,13 @@ def add_timesheet():
     """
     Add a timesheet to the database
     """
-    exists = db.session.query(WeekSheet).filter_by(period=period, employee_id=current_user.get_id()).scalar()
+    week = current_week()
+    exists = db.session.query(WeekSheet).filter_by(employee_id=current_user.get_id(), week_start=week.start).scalar()
     if exists:
-        if exists.status == "Submitted":
+        if exists.status == Status.REJECTED:
+            flash('Your timesheet was rejected. Please correct it and Submit again')
+            return redirect(url_for('employee.edit_timesheet', id=exists.id))
+        elif not exists.status.editable:
             flash("You have already filled and submitted current weeek timesheet")
             return redirect(url_for('employee.view_timesheet', id=exists.id))
 
@@ -84,27 +78,30 @@ def add_timesheet():
     else:
         form = WeekSheetFillForm()
         if request.method == "GET":
-            form = populate_form_fields()
+            form = populate_form_fields(week=week)
 
         if form.validate_on_submit():
             weeksheet_db = WeekSheet()
-            weeksheet_db.period = period
+            weeksheet_db.period = week.period
+            weeksheet_db.week_start = week.start
+            weeksheet_db.week_end = week.end
             weeksheet_db.employee_id = current_user.get_id()
-            for entry in form.sheets.entries:
-            # for i in range(0, 5):
+            for day, date_string, entry in zip(week.days, week.dates, form.sheets.entries):
                 sheetdb = Sheet()
-                sheetdb.date = entry.data['date']
+                sheetdb.date = date_string
+                sheetdb.work_date = day
                 sheetdb.workhours = entry.data['workhours']
                 sheetdb.description = entry.data['description']
                 weeksheet_db.sheets.append(sheetdb)
 
             if "submit" in request.form:
                 for entry in weeksheet_db.sheets:
-                    entry.status = "Submitted"
-                weeksheet_db.status = "Submitted"
+                    entry.status = Status.SUBMITTED
+                weeksheet_db.status = Status.SUBMITTED
             try:
                 db.session.add(weeksheet_db)
                 db.session.commit()
+                invalidate_tables(WeekSheet, Sheet)
                 flash('You have successfully added a new timesheet.')
             except:
                 # in case department name already exists
@@ -116,12 +113,67 @@ def add_timesheet():
             flash_errors(form)
 
         # load department template
-        return render_template('employee/timesheet.html', action="Add", dates=dates,
-                               form=form, title="Add Timesheet", period=period)
+        return render_template('employee/timesheet.html', action="Add", dates=week.dates,
+                               form=form, title="Add Timesheet", period=week.period)
+
+
+@employee.route('/timesheets/add/weeks', methods=['GET', 'POST'])
+@login_required
+def add_weeks():
+    """
+    Create timesheets for several consecutive weeks at once, every day
+    pre-filled with the same hours and description, in one transaction.
+    Weeks that already have a timesheet, archived ones included, are left
+    as they are.
+    """
+    form = WeeksFillForm()
+    if request.method == "GET":
+        form.first_week.data = current_week().start
+    if form.validate_on_submit():
+        first = week_bounds(form.first_week.data)[0]
+        weeks = [week_calendar(first + timedelta(weeks=i)) for i in range(form.weeks.data)]
+        employee_id = current_user.get_id()
+        starts = [week.start for week in weeks]
+        # an archived week is still the employee's one timesheet of that
+        # week, and its row of the weekly hours summary
+        existing = {start for start, in db.session.query(WeekSheet.week_start)
+                    .filter(WeekSheet.employee_id == employee_id, WeekSheet.week_start.in_(starts))
+                    .union(db.session.query(ArchivedWeekSheet.week_start)
+                           .filter(ArchivedWeekSheet.employee_id == employee_id,
+                                   ArchivedWeekSheet.week_start.in_(starts)))}
+        status = Status.SUBMITTED if form.submit.data else Status.NOT_SUBMITTED
+        created = []
+        for week in weeks:
+            if week.start in existing:
+                continue
+            weeksheet = WeekSheet(employee_id=employee_id, period=week.period, status=status,
+                                  week_start=week.start, week_end=week.end)
+            weeksheet.sheets = [Sheet(date=date_string, work_date=day, status=status,
+                                      workhours=form.workhours.data,
+                                      description=form.description.data)
+                                for day, date_string in zip(week.days, week.dates)]
+            created.append(weeksheet)
+        try:
+            db.session.add_all(created)
+            db.session.commit()
+        except IntegrityError:
+            # one of the weeks was added in another tab meanwhile
+            db.session.rollback()
+            flash('Unable to save the timesheets, some of these weeks were just added. Please try again.')
+            return redirect(url_for('employee.add_weeks'))
+        if created:
+            invalidate_tables(WeekSheet, Sheet)
+        flash(f'{len(created)} timesheets added, {len(existing)} weeks already had one.')
+        return redirect(url_for('employee.list_timesheets'))
+    else:
+        flash_errors(form)
+
+    return render_template('employee/timesheet_weeks.html', form=form, title="Add Several Weeks")
 
 
 @employee.route('/timesheets/view/<int:id>', methods=['GET'])
 @login_required
+@query_budget(2)
 def view_timesheet(id):
     """
     View a Timesheet
@@ -143,11 +195,18 @@ def submit_timesheet(id):
     timesheet = WeekSheet.query.get_or_404(id)
     if current_user.get_id() != timesheet.employee_id:
         return abort(403)
-    timesheet.status = "Submitted"
-    for item in timesheet.sheets:
-        item.status = "Submitted"
+    try:
+        timesheet.status = Status.SUBMITTED
+        for item in timesheet.sheets:
+            if item.status.editable:
+                item.status = Status.SUBMITTED
+    except InvalidTransition:
+        db.session.rollback()
+        flash(f'This timesheet is {timesheet.status} and cannot be submitted again')
+        return redirect(url_for('employee.view_timesheet', id=id))
 
     db.session.commit()
+    invalidate_tables(WeekSheet, Sheet)
     flash('Timesheet is Submitted from View')
     return redirect(url_for('employee.list_timesheets'))
 
@@ -156,13 +215,15 @@ def submit_timesheet(id):
 @login_required
 def edit_timesheet(id):
     """
-    Edit a Timesheet if saved
+    Edit a Timesheet if saved, or rejected to be corrected
     """
-    print("edit called")
     timesheet_db = WeekSheet.query.get_or_404(id)
 
     if current_user.get_id() != timesheet_db.employee_id:
         return abort(403)
+    if not timesheet_db.status.editable:
+        flash(f'This timesheet is {timesheet_db.status} and can no longer be edited')
+        return redirect(url_for('employee.view_timesheet', id=id))
 
     form = WeekSheetFormdb()
     if request.method == "GET":
@@ -171,34 +232,98 @@ def edit_timesheet(id):
     else:
         form.period.data = timesheet_db.period
         if form.validate_on_submit():
-            print(len(form.data))
-            print(form.sheets)
-
-            for i in range(0, len(timesheet_db.sheets)):
-                print(i)
-
-                if form.sheets.data[i]['workhours'] == timesheet_db.sheets[i].workhours:
-                    pass
-                else:
-                    timesheet_db.sheets[i].workhours = form.sheets.data[i]['workhours']
-
-                if form.sheets.data[i]['description'] == timesheet_db.sheets[i].description:
-                    pass
-                else:
-                    timesheet_db.sheets[i].description = form.sheets.data[i]['description']
+            submit = 'submit' in request.form
+            # unchanged values are not written, the session tracks changes
+            for sheet, entry in zip(timesheet_db.sheets, form.sheets.data):
+                if not sheet.status.editable:
+                    continue
+                sheet.workhours = entry['workhours']
+                sheet.description = entry['description']
+                if submit:
+                    sheet.status = Status.SUBMITTED
+            if submit:
+                timesheet_db.status = Status.SUBMITTED
 
-                if 'submit' in request.form:
-                    timesheet_db.status = "Submitted"
-                    timesheet_db.sheets[i].status = "Submitted"
-
-            db.session.commit()
+            try:
+                db.session.commit()
+            except StaleDataError:
+                db.session.rollback()
+                flash('This timesheet was changed while you were editing it. Please review it and save again.')
+                return redirect(url_for('employee.edit_timesheet', id=id))
+            invalidate_tables(WeekSheet, Sheet)
             flash('You have successfully edited the timesheet.')
 
             # redirect to the departments page
             return redirect(url_for('employee.list_timesheets'))
 
     return render_template('employee/edit_timesheet.html', action="Edit",
-                           form=form, title="Edit Timesheet")
+                           form=form, timesheet=timesheet_db, title="Edit Timesheet")
+
+
+@employee.route('/timesheets/sheet/<int:id>', methods=['PATCH'])
+@login_required
+@query_budget(5)
+def autosave_sheet(id):
+    """
+    Save the hours and/or description of one day of a saved or rejected
+    Timesheet, unless the day itself was approved.
+    The client sends the version of the day it last saw; if the day has
+    changed since, nothing is written and 409 returns the current values.
+    """
+    if current_app.config['WTF_CSRF_ENABLED'] and \
+            not validate_csrf(request.headers.get('X-CSRFToken')):
+        return jsonify(error='Missing or invalid CSRF token'), 400
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+    if not isinstance(version, int):
+        return jsonify(error='version is required'), 400
+    values = {}
+    if 'workhours' in data:
+        if not isinstance(data['workhours'], int) or isinstance(data['workhours'], bool) \
+                or data['workhours'] <= 0:
+            return jsonify(error='workhours must be a positive whole number'), 400
+        values[Sheet.workhours] = data['workhours']
+    if 'description' in data:
+        if not isinstance(data['description'], str) or not data['description'].strip():
+            return jsonify(error='description is required'), 400
+        values[Sheet.description] = data['description'][:200]
+    if not values:
+        return jsonify(error='Nothing to save'), 400
+
+    # one UPDATE that only matches the version the client saw, of an
+    # editable day of one of this employee's editable timesheets
+    employee_id = current_user.get_id()
+    editable = db.session.query(WeekSheet.id) \
+        .filter(WeekSheet.employee_id == employee_id, WeekSheet.status.in_(EDITABLE))
+    values[Sheet.version] = Sheet.version + 1
+    changed = Sheet.query \
+        .filter(Sheet.id == id, Sheet.version == version, Sheet.status.in_(EDITABLE),
+                Sheet.weeksheet_id.in_(editable.subquery())) \
+        .update(values, synchronize_session=False)
+    if changed and Sheet.workhours in values:
+        # a bulk UPDATE skips the flush hooks, so recount its timesheet here
+        timesheet = WeekSheet.id == db.session.query(Sheet.weeksheet_id) \
+            .filter(Sheet.id == id).as_scalar()
+        refresh_rollups(timesheet)
+        refresh_weekly_hours(timesheet)
+    db.session.commit()
+    if changed:
+        invalidate_tables(WeekSheet, Sheet)
+        return jsonify(id=id, version=version + 1)
+
+    sheet = Sheet.query.get(id)
+    if sheet is None:
+        return jsonify(error='No such day'), 404
+    weeksheet = WeekSheet.query.get(sheet.weeksheet_id)
+    if weeksheet.employee_id != employee_id:
+        return jsonify(error='Not allowed to edit this day'), 403
+    if not weeksheet.status.editable:
+        return jsonify(error=f'This timesheet is {weeksheet.status.label.lower()} and can no longer be edited'), 409
+    if not sheet.status.editable:
+        return jsonify(error=f'This day is {sheet.status.label.lower()} and can no longer be edited'), 409
+    return jsonify(error='This day was changed elsewhere',
+                   current={'version': sheet.version, 'workhours': sheet.workhours,
+                            'description': sheet.description}), 409
 
 
 @employee.route('/timesheets/delete/<int:id>', methods=['GET', 'DELETE'])
@@ -208,9 +333,10 @@ def delete_timesheet(id):
     Delete a timesheet from the database if not submitted
     """
     timesheet = WeekSheet.query.get_or_404(id)
-    if timesheet.status == "Not Submitted":
+    if timesheet.status == Status.NOT_SUBMITTED:
         db.session.delete(timesheet)
         db.session.commit()
+        invalidate_tables(WeekSheet, Sheet)
         flash('You have successfully deleted the department.')
     else:
         flash('Submitted timesheet cannot be deleted')
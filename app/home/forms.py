@@ -0,0 +1,33 @@
+from wtforms import Form, SubmitField
+from wtforms.fields.html5 import DateField
+from wtforms.validators import Optional
+
+# longest range the dashboard reports on, in days
+MAX_RANGE_DAYS = 3 * 366
+
+
+class AnalyticsForm(Form):
+    """
+    Form for admin to pick the weeks the dashboard reports on. Bound to
+    the query string, so it carries no CSRF token; empty dates fall back
+    to the latest weeks.
+    """
+    start = DateField('From', validators=[Optional()])
+    end = DateField('To', validators=[Optional()])
+    submit = SubmitField('Show')
+
+    def validate_range(self, start, end):
+        """
+        Validate the dates, then the range they pick with start and end
+        standing in for the empty ones, so a lone date cannot reach past
+        MAX_RANGE_DAYS either.
+        """
+        if not self.validate():
+            return False
+        field = self.end if self.end.data else self.start
+        start, end = self.start.data or start, self.end.data or end
+        if end < start:
+            field.errors.append('The end must not be before the start.')
+        elif (end - start).days > MAX_RANGE_DAYS:
+            field.errors.append('Pick at most three years.')
+        return not field.errors
@@ -1,6 +1,17 @@
-from flask import abort, render_template
+from datetime import timedelta
+
+from flask import abort, current_app, render_template, request
 from flask_login import current_user, login_required
+from sqlalchemy import func
 from . import home
+from .forms import AnalyticsForm
+from .. import db
+from ..models import WeekSheet
+from ..util.analytics_util import REPORTS, build_reports
+from ..util.errors_util import flash_errors
+from ..util.query_util import query_budget
+from ..util.status_util import Status
+from ..util.week_util import current_week
 
 
 @home.route('/', methods=['GET'])
@@ -22,9 +33,28 @@ def dashboard():
 
 @home.route('/admin/dashboard', methods=['GET'])
 @login_required
+@query_budget(7)
 def admin_dashboard():
+    """
+    Render the admin dashboard: the approval queue, and hours by
+    department, role, employee and week over a range of weeks
+    """
     # prevent non-admins from accessing the page
     if not current_user.is_admin:
         abort(403)
 
-    return render_template('home/admin_dashboard.html', title="Dashboard")
+    # counted from the partial ix_weeksheet_pending index alone
+    pending = db.session.query(func.count(WeekSheet.id)) \
+        .filter(WeekSheet.status == Status.SUBMITTED).scalar()
+
+    form = AnalyticsForm(request.args)
+    end = current_week().start
+    start = end - timedelta(weeks=current_app.config['ANALYTICS_DEFAULT_WEEKS'] - 1)
+    if form.validate_range(start, end):
+        start, end = form.start.data or start, form.end.data or end
+    else:
+        flash_errors(form)
+    form.start.data, form.end.data = start, end
+    reports = build_reports(REPORTS, start, end)
+    return render_template('home/admin_dashboard.html', pending=pending, form=form, reports=reports,
+                           baseline=current_app.config['ANALYTICS_BASELINE_HOURS'], title="Dashboard")
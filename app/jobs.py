@@ -0,0 +1,46 @@
+"""
+Handlers of the background jobs run by `flask jobs-worker`, see
+util/job_util.py. Arguments and results are plain JSON values.
+"""
+import os
+import uuid
+from datetime import datetime
+
+from flask import current_app
+
+from . import db
+from .models import Sheet, WeekSheet
+from .util.approval_util import DECISIONS, decide_timesheets, timesheet_criteria
+from .util.export_util import export_approved_hours
+from .util.fragment_util import invalidate_tables
+from .util.job_util import job
+
+
+@job('decide_timesheets')
+def decide_timesheets_job(decision, ids=(), department=None, week=None):
+    """Approve or reject the submitted timesheets matching the bulk form's criteria"""
+    week = datetime.strptime(week, '%Y-%m-%d').date() if week else None
+    timesheets_changed, sheets_changed = decide_timesheets(
+        DECISIONS[decision], *timesheet_criteria(ids, department, week))
+    db.session.commit()
+    invalidate_tables(WeekSheet, Sheet)
+    return {'status': DECISIONS[decision].label, 'timesheets': timesheets_changed,
+            'sheets': sheets_changed}
+
+
+@job('export_hours')
+def export_hours_job(start, end, export_format='csv'):
+    """Write the approved hours between two days to a file in EXPORT_DIR"""
+    directory = current_app.config['EXPORT_DIR']
+    os.makedirs(directory, exist_ok=True)
+    # the random part keeps two exports of the same range apart
+    filename = f'approved-hours-{start}-{end}-{uuid.uuid4().hex[:8]}.{export_format}'
+    start, end = (datetime.strptime(day, '%Y-%m-%d').date() for day in (start, end))
+    path = os.path.join(directory, filename)
+    with open(path + '.tmp', 'w', encoding='utf-8') as output:
+        for chunk in export_approved_hours(start, end, export_format,
+                                           batch_size=current_app.config['EXPORT_BATCH_SIZE']):
+            output.write(chunk)
+    # a download never sees a half-written file
+    os.replace(path + '.tmp', path)
+    return {'filename': filename, 'bytes': os.path.getsize(path)}
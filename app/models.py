@@ -1,7 +1,15 @@
+from datetime import datetime
+from itertools import chain
+
 from flask_login import UserMixin
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import make_transient_to_detached, validates
+from sqlalchemy.orm.attributes import set_committed_value
 from werkzeug.security import generate_password_hash, check_password_hash
 
-from app import db, login_manager
+from app import data_versions, db, login_manager, user_cache
+from app.util.status_util import Status, StatusType, check_transition
 
 
 class Employee(UserMixin, db.Model):
@@ -22,6 +30,7 @@ class Employee(UserMixin, db.Model):
     department_id = db.Column(db.Integer, db.ForeignKey('departments.id'))
     role_id = db.Column(db.Integer, db.ForeignKey('roles.id'))
     is_admin = db.Column(db.Boolean, default=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     @property
     def password(self):
@@ -50,10 +59,56 @@ class Employee(UserMixin, db.Model):
         return '<Employee: {}>'.format(self.username)
 
 
+def _snapshot(employee):
+    return {attr.key: getattr(employee, attr.key)
+            for attr in inspect(Employee).column_attrs}
+
+
+def _from_snapshot(snapshot):
+    """
+    Rebuild a cached Employee and attach it to the current session without
+    a SELECT, so it behaves like one loaded by the query
+    """
+    employee = Employee()
+    for key, value in snapshot.items():
+        set_committed_value(employee, key, value)
+    make_transient_to_detached(employee)
+    return db.session.merge(employee, load=False)
+
+
 # Set up user_loader
 @login_manager.user_loader
 def load_user(user_id):
-    return Employee.query.get(int(user_id))
+    user_id = int(user_id)
+    # a cached row is only used while the employee table's version is the
+    # one it was cached at, so an admin demoted or deleted loses their
+    # rights on the next request of this worker, and within
+    # DATA_VERSIONS_INTERVAL seconds on the others
+    version = data_versions.get(Employee.__tablename__)
+    cached = user_cache.get(user_id)
+    if cached is not None and cached[0] == version:
+        return _from_snapshot(cached[1])
+    employee = Employee.query.get(user_id)
+    if employee is not None:
+        user_cache.set(user_id, (version, _snapshot(employee)))
+    return employee
+
+
+@event.listens_for(SignallingSession, 'after_flush')
+def _bump_changed_employees(session, flush_context):
+    """
+    Bump the employee table's version in the transaction that changes or
+    deletes employees, so load_user drops their cached rows once it commits
+    """
+    if any(isinstance(instance, Employee) for instance in chain(session.dirty, session.deleted)):
+        data_versions.bump(Employee.__tablename__, session=session)
+
+
+@event.listens_for(SignallingSession, 'after_bulk_update')
+@event.listens_for(SignallingSession, 'after_bulk_delete')
+def _bump_bulk_changed_employees(context):
+    if context.mapper.class_ is Employee:
+        data_versions.bump(Employee.__tablename__, session=context.session)
 
 
 class Department(db.Model):
@@ -96,12 +151,37 @@ class WeekSheet(db.Model):
     """
 
     __tablename__ = 'weeksheet'
+    __table_args__ = (
+        # one timesheet per employee and week; also serves per-employee lookups
+        db.Index('ix_weeksheet_employee_week', 'employee_id', 'week_start', unique=True),
+        # the approval queue: only the submitted rows, in the queue's order
+        db.Index('ix_weeksheet_pending', 'week_start', 'id',
+                 postgresql_where=text('status = 1'), sqlite_where=text('status = 1')),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     period = db.Column(db.String(20))
-    status = db.Column(db.String(60), unique=False, default='Not Submitted')
+    week_start = db.Column(db.Date, index=True)
+    week_end = db.Column(db.Date)
+    status = db.Column(StatusType, nullable=False, default=Status.NOT_SUBMITTED, server_default='0')
     employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'))
-
-    sheets = db.relationship('Sheet', backref='Weeksheet')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # rollup of the days, kept current in the transaction that changes
+    # them, see util/rollup_util.py; pending days are the submitted ones
+    day_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_hours = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    approved_hours = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    pending_days = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    approved_days = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rejected_days = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # deleting a timesheet deletes its days instead of orphaning them
+    sheets = db.relationship('Sheet', backref='Weeksheet', order_by='Sheet.work_date',
+                             cascade='all, delete-orphan')
+
+    @validates('status')
+    def validate_status(self, key, status):
+        return check_transition(self.status, status)
 
     def __repr__(self):
         return '<WeekSheet: {}>'.format(self.id)
@@ -113,13 +193,191 @@ class Sheet(db.Model):
     """
 
     __tablename__ = 'sheets'
+    __table_args__ = (
+        db.Index('ix_sheets_status_work_date', 'status', 'work_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    weeksheet_id = db.Column(db.Integer, db.ForeignKey("weeksheet.id"))
+    weeksheet_id = db.Column(db.Integer, db.ForeignKey("weeksheet.id"), index=True)
     date = db.Column(db.String(20))
+    work_date = db.Column(db.Date, index=True)
     workhours = db.Column(db.Integer)
     description = db.Column(db.String(200))
-    status = db.Column(db.String, unique=False, default='Not Submitted')
+    status = db.Column(StatusType, nullable=False, default=Status.NOT_SUBMITTED, server_default='0')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # bumped on every write, so concurrent edits of a day conflict instead
+    # of overwriting each other
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
+
+    @validates('status')
+    def validate_status(self, key, status):
+        return check_transition(self.status, status)
 
     def __repr__(self):
         return '<Sheet: {}>'.format(self.id)
+
+
+class ArchivedWeekSheet(db.Model):
+    """
+    Create a WeekSheet archive table, for approved timesheets past the
+    retention period, see util/archive_util.py. Rows keep their ids.
+    """
+
+    __tablename__ = 'weeksheet_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    period = db.Column(db.String(20))
+    week_start = db.Column(db.Date, index=True)
+    week_end = db.Column(db.Date)
+    status = db.Column(StatusType)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), index=True)
+    updated_at = db.Column(db.DateTime)
+    # the rollup of WeekSheet, as it was when archived
+    day_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_hours = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    approved_hours = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    pending_days = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    approved_days = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rejected_days = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    sheets = db.relationship('ArchivedSheet', backref='weeksheet', order_by='ArchivedSheet.work_date',
+                             cascade='all, delete-orphan')
+
+    def __repr__(self):
+        return '<ArchivedWeekSheet: {}>'.format(self.id)
+
+
+class ArchivedSheet(db.Model):
+    """
+    Create a Sheet archive table, the days of archived timesheets
+    """
+
+    __tablename__ = 'sheets_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    weeksheet_id = db.Column(db.Integer, db.ForeignKey('weeksheet_archive.id'), index=True)
+    date = db.Column(db.String(20))
+    work_date = db.Column(db.Date, index=True)
+    workhours = db.Column(db.Integer)
+    description = db.Column(db.String(200))
+    status = db.Column(StatusType)
+    updated_at = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    def __repr__(self):
+        return '<ArchivedSheet: {}>'.format(self.id)
+
+
+class WeeklyHours(db.Model):
+    """
+    Create a weekly hours summary table: the hours of each employee's
+    timesheet by status, hot or archived, under the employee's current
+    department and role. Kept current with the timesheets, see
+    util/summary_util.py; `flask rebuild-weekly-hours` fills it anew.
+    """
+
+    __tablename__ = 'weekly_hours'
+    __table_args__ = (
+        db.Index('ix_weekly_hours_department_week', 'department_id', 'week_start'),
+        db.Index('ix_weekly_hours_role_week', 'role_id', 'week_start'),
+        db.Index('ix_weekly_hours_week', 'week_start'),
+    )
+
+    # an employee has one timesheet a week, so department and role, which
+    # may be empty, are part of the row rather than of its key
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), primary_key=True,
+                            autoincrement=False)
+    week_start = db.Column(db.Date, primary_key=True)
+    department_id = db.Column(db.Integer)
+    role_id = db.Column(db.Integer)
+    days = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_hours = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    not_submitted_hours = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    submitted_hours = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    approved_hours = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rejected_hours = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return '<WeeklyHours: {} {}>'.format(self.employee_id, self.week_start)
+
+
+class Job(db.Model):
+    """
+    Create a Job table, the queue of background work run by
+    `flask jobs-worker`, see util/job_util.py
+    """
+
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # the worker's poll: the oldest queued job that is due
+        db.Index('ix_jobs_status_run_after', 'status', 'run_after'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(60), nullable=False)
+    arguments = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(120))
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_by = db.Column(db.Integer, db.ForeignKey('employee.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    # refreshed by the worker running the job for as long as it runs
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return '<Job: {} {}>'.format(self.id, self.kind)
+
+
+class RevokedToken(db.Model):
+    """
+    Create a revoked API token table. Every process keeps the unexpired
+    rows in memory, see util/token_util.py, so checking a token does not
+    query it.
+    """
+
+    __tablename__ = 'revoked_tokens'
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(64), nullable=False, unique=True)
+    token_type = db.Column(db.String(10), nullable=False)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'))
+    # rows are of no use once the token has expired
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return '<RevokedToken: {}>'.format(self.jti)
+
+
+class TableVersion(db.Model):
+    """
+    Create a table of data versions, a counter per table bumped whenever
+    the table is written, which cache keys include, see
+    util/cache_util.py DataVersions
+    """
+
+    __tablename__ = 'table_versions'
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def __repr__(self):
+        return '<TableVersion: {} {}>'.format(self.name, self.version)
+
+
+@event.listens_for(TableVersion.__table__, 'after_create')
+def _add_table_versions(table, connection, **kw):
+    # db.create_all() makes every table at once, so each starts with a
+    # counter, as the migration that creates this table does
+    connection.execute(table.insert(), [{'name': name, 'version': 0} for name in table.metadata.tables])
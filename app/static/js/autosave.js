@@ -0,0 +1,84 @@
+/*
+ * Saves each day of a saved timesheet shortly after it is edited, with one
+ * PATCH per day instead of posting the whole week. Rows carry the autosave
+ * URL and the version of the day they were rendered with; a 409 means the
+ * day changed elsewhere and is shown instead of being overwritten.
+ */
+(function () {
+  'use strict';
+
+  var DELAY = 800;
+
+  function csrfToken() {
+    var input = document.querySelector('input[name="csrf_token"]');
+    return input ? input.value : '';
+  }
+
+  function setStatus(row, text) {
+    row.querySelector('.autosave-status').textContent = text;
+  }
+
+  function field(row, name) {
+    return row.querySelector('[data-field="' + name + '"]');
+  }
+
+  function save(row) {
+    if (row.saving) {
+      row.dirty = true;
+      return;
+    }
+    var workhours = Number(field(row, 'workhours').value);
+    var description = field(row, 'description').value;
+    if (!Number.isInteger(workhours) || workhours <= 0) {
+      setStatus(row, 'Hours must be a whole number');
+      return;
+    }
+    if (!description.trim()) {
+      setStatus(row, 'Description is required');
+      return;
+    }
+
+    row.saving = true;
+    row.dirty = false;
+    setStatus(row, 'Saving…');
+    fetch(row.dataset.autosaveUrl, {
+      method: 'PATCH',
+      credentials: 'same-origin',
+      headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrfToken()},
+      body: JSON.stringify({version: Number(row.dataset.version),
+                            workhours: workhours, description: description})
+    }).then(function (response) {
+      return response.json().then(function (body) {
+        if (response.ok) {
+          row.dataset.version = body.version;
+          setStatus(row, 'Saved');
+        } else if (response.status === 409 && body.current) {
+          setStatus(row, 'Changed elsewhere: ' + body.current.workhours + 'h, "' +
+                    body.current.description + '". Reload to continue.');
+          row.conflict = true;
+        } else {
+          setStatus(row, body.error || 'Not saved');
+        }
+      });
+    }).catch(function () {
+      setStatus(row, 'Not saved, check your connection');
+    }).then(function () {
+      row.saving = false;
+      if (row.dirty && !row.conflict) {
+        save(row);
+      }
+    });
+  }
+
+  Array.prototype.forEach.call(document.querySelectorAll('tr[data-autosave-url]'), function (row) {
+    var timer;
+    row.addEventListener('input', function () {
+      if (row.conflict) {
+        return;
+      }
+      setStatus(row, 'Unsaved');
+      clearTimeout(timer);
+      timer = setTimeout(function () { save(row); }, DELAY);
+    });
+  });
+}());
@@ -0,0 +1,223 @@
+import threading
+from collections import namedtuple
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import func
+
+from .. import analytics_cache, data_versions, db
+from ..models import Department, Employee, Role, WeekSheet, WeeklyHours
+from .lookup_util import lookup_choices
+
+REPORTS = ('department', 'role', 'employee', 'week')
+# the tables the reports read, and WeekSheet, which the views writing the
+# summary bump; a change to any of them makes the reports stale
+SOURCES = (WeeklyHours, WeekSheet, Employee, Department, Role)
+# the group of employees without a department or role
+NONE = -1
+# the employee report lists the employees with the most hours
+TOP_EMPLOYEES = 25
+# the ranges whose reports are being rebuilt, see _rebuild_later
+_rebuilding = {}
+_rebuilding_lock = threading.Lock()
+
+# the columns of load_columns, in query order
+COLUMNS = [('employee', np.int64), ('department', np.int64), ('role', np.int64),
+           ('week', 'datetime64[D]'), ('hours', np.float64), ('approved_hours', np.float64)]
+
+Report = namedtuple('Report', ['name', 'rows', 'totals'])
+ReportRow = namedtuple('ReportRow', ['key', 'label', 'hours', 'approved_hours', 'employees',
+                                     'timesheets', 'utilization', 'change'])
+
+
+def load_columns(start, end):
+    """
+    The timesheets of the weeks starting from start to end, archived ones
+    included, one array per column: employee, department, role, week
+    (datetime64[D]), hours and approved_hours. One query over the weekly
+    hours summary, which has them pre-summed and filed under the
+    employees' departments and roles.
+    """
+    query = db.session.query(WeeklyHours.employee_id,
+                             func.coalesce(WeeklyHours.department_id, NONE),
+                             func.coalesce(WeeklyHours.role_id, NONE),
+                             WeeklyHours.week_start, WeeklyHours.total_hours, WeeklyHours.approved_hours) \
+        .filter(WeeklyHours.week_start >= start, WeeklyHours.week_start <= end)
+    # the driver's rows, straight into one array: per row date parsing
+    # and row objects cost several times the query itself. numpy reads
+    # dates from strings (SQLite) and date objects alike.
+    result = db.session.execute(query.statement)
+    try:
+        rows = result.cursor.fetchall()
+    finally:
+        result.close()
+    table = np.array(rows, dtype=COLUMNS)
+    return {name: table[name] for name in table.dtype.names}
+
+
+def _utilization(hours, timesheets, baseline):
+    # hours over the baseline of every week with a timesheet
+    capacity = np.asarray(timesheets, dtype=np.float64) * baseline
+    return np.divide(hours, capacity, out=np.zeros_like(capacity), where=capacity > 0)
+
+
+def _factorize(keys):
+    """
+    (the distinct keys in order, the index of each key among them). Ids
+    and days are dense integers, so a counting pass does in linear time
+    what np.unique does by sorting.
+    """
+    if len(keys) and keys.dtype.kind in 'iM':
+        codes = keys.view(np.int64)
+        lowest = codes.min()
+        span = int(codes.max() - lowest) + 1
+        if span <= 4 * len(codes):
+            present = np.bincount(codes - lowest, minlength=span) > 0
+            groups = (np.flatnonzero(present) + lowest).view(keys.dtype)
+            return groups, (np.cumsum(present) - 1)[codes - lowest]
+    return np.unique(keys, return_inverse=True)
+
+
+def _group_by(keys, columns, baseline):
+    """
+    (groups, hours, approved_hours, employees, timesheets, utilization)
+    per distinct key, in key order
+    """
+    groups, inverse = _factorize(keys)
+    size = len(groups)
+    hours = np.bincount(inverse, weights=columns['hours'], minlength=size)
+    approved = np.bincount(inverse, weights=columns['approved_hours'], minlength=size)
+    timesheets = np.bincount(inverse, minlength=size)
+    # distinct employees: the distinct (group, employee) pairs of each group
+    stride = int(columns['employee'].max()) + 1 if size else 1
+    pairs = np.unique(inverse.astype(np.int64) * stride + columns['employee'])
+    employees = np.bincount(pairs // stride, minlength=size)
+    return groups, hours, approved, employees, timesheets, _utilization(hours, timesheets, baseline)
+
+
+def _rows(order, groups, labels, hours, approved, employees, timesheets, utilization, change=None):
+    return [ReportRow(key=groups[i].item(), label=labels[i], hours=float(hours[i]),
+                      approved_hours=float(approved[i]), employees=int(employees[i]),
+                      timesheets=int(timesheets[i]), utilization=float(utilization[i]),
+                      change=None if change is None else change[i])
+            for i in order]
+
+
+def _totals(columns, baseline):
+    hours, approved = columns['hours'].sum(), columns['approved_hours'].sum()
+    timesheets = len(columns['hours'])
+    return ReportRow(key=None, label='Total', hours=float(hours), approved_hours=float(approved),
+                     employees=len(np.unique(columns['employee'])), timesheets=timesheets,
+                     utilization=float(_utilization(hours, timesheets, baseline)), change=None)
+
+
+def _by_lookup(model, column):
+    def build(columns, baseline):
+        grouped = _group_by(columns[column], columns, baseline)
+        names = dict(lookup_choices(model))
+        labels = [names.get(key, 'None' if key == NONE else f'#{key}') for key in grouped[0].tolist()]
+        # most hours first
+        return _rows(np.argsort(-grouped[1], kind='stable'), grouped[0], labels, *grouped[1:])
+    return build
+
+
+def _by_employee(columns, baseline):
+    grouped = _group_by(columns['employee'], columns, baseline)
+    order = np.argsort(-grouped[1], kind='stable')[:TOP_EMPLOYEES]
+    ids = grouped[0][order].tolist()
+    names = {id: f'{first_name} {last_name}' for id, first_name, last_name in
+             db.session.query(Employee.id, Employee.first_name, Employee.last_name)
+             .filter(Employee.id.in_(ids))} if ids else {}
+    labels = {i: names.get(id, f'#{id}') for i, id in zip(order.tolist(), ids)}
+    return _rows(order, grouped[0], labels, *grouped[1:])
+
+
+def _by_week(columns, baseline):
+    grouped = _group_by(columns['week'], columns, baseline)
+    weeks, hours = grouped[0], grouped[1]
+    labels = [str(week) for week in weeks]
+    # week over week, against the previous week with timesheets
+    change = [None] + [float(now / before - 1) if before else None
+                       for before, now in zip(hours[:-1], hours[1:])]
+    return _rows(range(len(weeks)), weeks, labels, *grouped[1:], change=change)
+
+
+BUILDERS = {
+    'department': _by_lookup(Department, 'department'),
+    'role': _by_lookup(Role, 'role'),
+    'employee': _by_employee,
+    'week': _by_week,
+}
+
+
+def _build(names, start, end, baseline, versions):
+    """Build the named reports from one load of the columns, and cache them"""
+    columns = load_columns(start, end)
+    totals = _totals(columns, baseline)
+    reports = {}
+    for name in names:
+        reports[name] = Report(name, BUILDERS[name](columns, baseline), totals)
+        analytics_cache.set((name, start, end, baseline), (versions, reports[name]))
+    return reports
+
+
+def _rebuild_later(names, start, end, baseline):
+    """
+    Rebuild the named reports in a thread of their own, off the request,
+    unless a rebuild of the range is running already
+    """
+    app = current_app._get_current_object()
+    key = (start, end, baseline)
+
+    def rebuild():
+        try:
+            with app.app_context():
+                try:
+                    versions = tuple(data_versions.get(model.__tablename__) for model in SOURCES)
+                    _build(names, start, end, baseline, versions)
+                finally:
+                    db.session.remove()
+        except Exception:
+            app.logger.exception('Rebuilding the %s reports failed', ', '.join(names))
+        finally:
+            with _rebuilding_lock:
+                _rebuilding.pop(key, None)
+
+    with _rebuilding_lock:
+        if key in _rebuilding:
+            return None
+        thread = _rebuilding[key] = threading.Thread(target=rebuild, name='analytics-rebuild', daemon=True)
+    thread.start()
+    return thread
+
+
+def build_reports(names, start, end):
+    """
+    {name: Report} for the named REPORTS over the weeks starting from
+    start to end, cached per report and range. A report whose tables
+    changed since it was built is still returned, and rebuilt off the
+    request, so only the first build of a range in a process, or one
+    dropped after ANALYTICS_CACHE_TTL seconds, is on the request's time.
+
+    That cold build is not under a second at 100k employees: on SQLite,
+    400k summary rows take 1.2 to 1.7 s, most of it the driver returning
+    the rows, which GROUP BYs in SQL do not beat. Served from the cache,
+    stale or not, the reports take a few milliseconds.
+    """
+    baseline = current_app.config['ANALYTICS_BASELINE_HOURS']
+    # read before loading, as in fragment_util.cached_fragment
+    versions = tuple(data_versions.get(model.__tablename__) for model in SOURCES)
+    reports, missing, stale = {}, [], []
+    for name in names:
+        cached = analytics_cache.get((name, start, end, baseline))
+        if cached is None:
+            missing.append(name)
+            continue
+        built_with, reports[name] = cached
+        if built_with != versions:
+            stale.append(name)
+    if missing:
+        reports.update(_build(missing, start, end, baseline, versions))
+    if stale:
+        _rebuild_later(stale, start, end, baseline)
+    return {name: reports[name] for name in names}
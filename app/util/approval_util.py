@@ -0,0 +1,54 @@
+from .. import db
+from ..models import Employee, Sheet, WeekSheet
+from .rollup_util import rollup_values, settled_status
+from .status_util import Status, check_transition
+from .summary_util import refresh_weekly_hours
+from .week_util import week_bounds
+
+# decision in URLs, forms and job arguments: the status it sets
+DECISIONS = {"approve": Status.APPROVED, "reject": Status.REJECTED}
+
+
+def decide_timesheets(status, *criteria):
+    """
+    Decide the days still submitted of every submitted WeekSheet matching
+    criteria with status, then recount their rollups and weekly hours and
+    settle the timesheets, with a few set-based statements in the
+    caller's transaction. Days already decided on one by one keep their
+    status, so a timesheet with a rejected day ends up rejected, as with
+    rollup_util.settled_status when deciding day by day.
+    Returns the number of weeksheet and sheet rows changed.
+    """
+    check_transition(Status.SUBMITTED, status)
+    pending = db.session.query(WeekSheet.id) \
+        .filter(WeekSheet.status == Status.SUBMITTED, *criteria)
+    # days first: once the weeksheets change status they no longer match
+    sheets_changed = Sheet.query \
+        .filter(Sheet.weeksheet_id.in_(pending.subquery()), Sheet.status == Status.SUBMITTED) \
+        .update({Sheet.status: status, Sheet.version: Sheet.version + 1},
+                synchronize_session=False)
+    refresh_weekly_hours(WeekSheet.status == Status.SUBMITTED, *criteria)
+    # and the rollup recounted in the same statement; no day is pending now
+    values = rollup_values()
+    values[WeekSheet.status] = settled_status(values[WeekSheet.pending_days], values[WeekSheet.rejected_days])
+    timesheets_changed = WeekSheet.query \
+        .filter(WeekSheet.status == Status.SUBMITTED, *criteria) \
+        .update(values, synchronize_session=False)
+    return timesheets_changed, sheets_changed
+
+
+def timesheet_criteria(ids=(), department=None, week=None):
+    """
+    Filters on WeekSheet picking the given ids, the timesheets of a
+    department's employees and those of the week containing a day
+    """
+    criteria = []
+    if ids:
+        criteria.append(WeekSheet.id.in_(ids))
+    if department:
+        department_employees = db.session.query(Employee.id) \
+            .filter(Employee.department_id == department)
+        criteria.append(WeekSheet.employee_id.in_(department_employees.subquery()))
+    if week:
+        criteria.append(WeekSheet.week_start == week_bounds(week)[0])
+    return criteria
@@ -0,0 +1,75 @@
+from datetime import date, datetime
+
+from sqlalchemy import literal, select
+
+from .. import db
+from ..models import ArchivedSheet, ArchivedWeekSheet, Sheet, WeekSheet
+from .status_util import Status
+
+
+def retention_cutoff(months, today=None):
+    """
+    The first day of the month months months before today's; weeks
+    ending before it are past the retention period
+    """
+    today = today or date.today()
+    month = today.year * 12 + today.month - 1 - months
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def _copy(source, target, criterion, archived_at=None):
+    """INSERT INTO target SELECT the matching rows of source, column for column"""
+    names = [column.name for column in source.__table__.columns]
+    columns = [source.__table__.c[name] for name in names]
+    if archived_at is not None:
+        names.append('archived_at')
+        columns.append(literal(archived_at))
+    db.session.execute(target.__table__.insert().from_select(
+        names, select(columns).where(criterion)))
+
+
+def archive_timesheets(before, batch_size=1000):
+    """
+    Move approved timesheets whose week ended before the day before, with
+    their days, from the hot tables to the archive tables, batch_size
+    timesheets per transaction, so a long run neither holds locks for
+    long nor loses finished batches when interrupted. Returns the number
+    of timesheets and days moved.
+    """
+    timesheets_moved = sheets_moved = 0
+    while True:
+        ids = [id for id, in db.session.query(WeekSheet.id)
+               .filter(WeekSheet.status == Status.APPROVED, WeekSheet.week_end < before)
+               .order_by(WeekSheet.id).limit(batch_size)]
+        if not ids:
+            return timesheets_moved, sheets_moved
+        now = datetime.utcnow()
+        _copy(WeekSheet, ArchivedWeekSheet, WeekSheet.id.in_(ids), archived_at=now)
+        _copy(Sheet, ArchivedSheet, Sheet.weeksheet_id.in_(ids))
+        sheets_moved += Sheet.query.filter(Sheet.weeksheet_id.in_(ids)) \
+            .delete(synchronize_session=False)
+        timesheets_moved += WeekSheet.query.filter(WeekSheet.id.in_(ids)) \
+            .delete(synchronize_session=False)
+        db.session.commit()
+
+
+def purge_orphans(batch_size=1000):
+    """
+    Delete days whose timesheet no longer exists, left behind by deletes
+    made before the relationship cascaded, from the hot and the archive
+    tables, batch_size rows per transaction. Returns the number of days
+    deleted from each.
+    """
+    purged = []
+    for model, parent in ((Sheet, WeekSheet), (ArchivedSheet, ArchivedWeekSheet)):
+        orphan = model.weeksheet_id.is_(None) | \
+            ~model.weeksheet_id.in_(db.session.query(parent.id))
+        deleted = 0
+        while True:
+            ids = [id for id, in db.session.query(model.id).filter(orphan).limit(batch_size)]
+            if not ids:
+                break
+            deleted += model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+        purged.append(deleted)
+    return tuple(purged)
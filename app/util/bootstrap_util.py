@@ -0,0 +1,46 @@
+from flask_migrate import stamp, upgrade
+from sqlalchemy import inspect
+
+from .. import db
+from ..models import Employee
+
+# revisions matching schemas that db.create_all() used to build at boot
+INITIAL_REVISION = '32b36c1d60fd'
+TYPED_DATES_REVISION = '1c7985aea043'
+
+
+def _stamp_legacy_schema():
+    """
+    Databases created by the old boot-time create_all() have tables but no
+    alembic_version; record which revision they match before upgrading
+    """
+    tables = inspect(db.engine).get_table_names()
+    if 'alembic_version' in tables or 'employee' not in tables:
+        return None
+    columns = {column['name'] for column in inspect(db.engine).get_columns('weeksheet')}
+    revision = TYPED_DATES_REVISION if 'week_start' in columns else INITIAL_REVISION
+    stamp(revision=revision)
+    return revision
+
+
+def migrate_database():
+    """Bring the schema up to the latest migration; safe to run repeatedly"""
+    legacy_revision = _stamp_legacy_schema()
+    upgrade()
+    return legacy_revision
+
+
+def seed_admin(email, username, password):
+    """
+    Create the admin account unless an employee with that email or
+    username exists. Returns the new admin, or None when nothing changed.
+    """
+    exists = db.session.query(Employee.id) \
+        .filter((Employee.email == email) | (Employee.username == username)) \
+        .first()
+    if exists:
+        return None
+    admin = Employee(email=email, username=username, password=password, is_admin=True)
+    db.session.add(admin)
+    db.session.commit()
+    return admin
@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+
+
+class TTLCache(object):
+    """
+    A thread-safe, size-bounded LRU mapping whose entries expire ttl seconds
+    after they are stored. Hits and misses are counted for stats().
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self._data), 'maxsize': self.maxsize, 'ttl': self.ttl,
+                    'hits': self.hits, 'misses': self.misses,
+                    'hit_ratio': round(self.hits / lookups, 4) if lookups else None}
+
+
+class RedisStore(object):
+    """
+    A shared backend for FragmentCache, so every worker reuses fragments
+    another worker rendered. redis is only imported when CACHE_REDIS_URL
+    is set.
+    """
+
+    def __init__(self, url, prefix='kaarya:'):
+        import redis
+        self.client = redis.StrictRedis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode() if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.setex(self.prefix + key, ttl, value)
+
+
+class DataVersions(object):
+    """
+    Per-table version counters, kept in a table of the database so that
+    every web worker, the jobs worker and the CLI see the same ones.
+    Writers bump the tables they change and caches put the current version
+    in their keys, so a bump makes every older entry unreachable, in every
+    process, without having to find and delete it. A process reads all the
+    counters with one query at most every interval seconds: its own bumps
+    count at once, those of other processes within interval seconds.
+    """
+
+    def __init__(self, engine=None, table=None, interval=2):
+        self.engine = engine
+        self.table = table
+        self.interval = interval
+        self._read = None
+        self._lock = threading.Lock()
+
+    def _versions(self):
+        with self._lock:
+            if self._read is None or self._read[0] < time.monotonic():
+                columns = self.table.c
+                # on a connection of its own, so a bump the current
+                # transaction has not committed yet is never read
+                with self.engine.connect() as connection:
+                    versions = dict(connection.execute(select([columns.name, columns.version])).fetchall())
+                self._read = (time.monotonic() + self.interval, versions)
+            return self._read[1]
+
+    def get(self, table):
+        return self._versions().get(table, 0)
+
+    def clear(self):
+        """Read the counters again on the next get()"""
+        with self._lock:
+            self._read = None
+
+    def _bump(self, connection, names):
+        columns = self.table.c
+        bumped = connection.execute(self.table.update().where(columns.name.in_(names))
+                                    .values(version=columns.version + 1)).rowcount
+        if bumped == len(names):
+            return
+        # the migration, or create_all(), adds the counters of the tables
+        # there are; a table added since gets its counter here, unless
+        # another process adds it first
+        known = {name for name, in connection.execute(select([columns.name]).where(columns.name.in_(names)))}
+        for name in names:
+            if name in known:
+                continue
+            try:
+                with connection.begin_nested():
+                    connection.execute(self.table.insert(), name=name, version=1)
+            except IntegrityError:
+                connection.execute(self.table.update().where(columns.name == name)
+                                   .values(version=columns.version + 1))
+
+    def bump(self, *tables, session=None):
+        """
+        Add one to the versions of tables: in session's transaction, to be
+        committed with the change, or without session in a transaction of
+        its own, once the change is committed
+        """
+        names = sorted(set(tables))
+        if session is None:
+            with self.engine.begin() as connection:
+                self._bump(connection, names)
+            self.clear()
+        else:
+            self._bump(session.connection(), names)
+            event.listen(session, 'after_commit', lambda session: self.clear(), once=True)
+
+
+class FragmentCache(object):
+    """
+    Rendered HTML by key: a local TTLCache in front of an optional shared
+    store. Local misses that hit the shared store are copied locally.
+    """
+
+    def __init__(self, maxsize=256, ttl=300, shared=None):
+        self.local = TTLCache(maxsize, ttl)
+        self.shared = shared
+
+    def get(self, key):
+        html = self.local.get(key)
+        if html is None and self.shared is not None:
+            html = self.shared.get('fragment:' + key)
+            if html is not None:
+                self.local.set(key, html)
+        return html
+
+    def set(self, key, html):
+        self.local.set(key, html)
+        if self.shared is not None:
+            self.shared.set('fragment:' + key, html, self.local.ttl)
+
+    def stats(self):
+        return dict(self.local.stats(), shared=self.shared is not None)
@@ -0,0 +1,62 @@
+from sqlalchemy import event, exc, select
+
+
+def _tune_sqlite(app):
+    """Sets the configured pragmas on every new SQLite connection"""
+    pragmas = (
+        # readers no longer block behind a writer, and vice versa
+        'PRAGMA journal_mode=WAL',
+        # wait for a lock instead of failing with "database is locked"
+        f"PRAGMA busy_timeout={int(app.config['SQLITE_BUSY_TIMEOUT'])}",
+        f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA cache_size={int(app.config['SQLITE_CACHE_SIZE'])}",
+    )
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    return on_connect
+
+
+def _ping(connection, branch):
+    """
+    Checks a pooled connection is still alive before it is used, and
+    reconnects once if the database dropped it
+    """
+    if branch:
+        return
+    should_close_with_result = connection.should_close_with_result
+    connection.should_close_with_result = False
+    try:
+        connection.scalar(select([1]))
+    except exc.DBAPIError as error:
+        if error.connection_invalidated:
+            connection.scalar(select([1]))
+        else:
+            raise
+    finally:
+        connection.should_close_with_result = should_close_with_result
+
+
+def configure_engine(app, db):
+    """
+    Create the app's engine and hook in the connection tuning for its
+    database: pragmas for SQLite, pessimistic pings for pooled servers
+    """
+    engine = db.get_engine(app)
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', _tune_sqlite(app))
+    elif app.config['DATABASE_PRE_PING']:
+        event.listen(engine, 'engine_connect', _ping)
+    return engine
+
+
+def dispose_engine(app, db):
+    """
+    Drop pooled connections so a forked worker never shares the parent's
+    sockets; each worker opens its own on first use
+    """
+    db.get_engine(app).dispose()
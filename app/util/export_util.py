@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+
+from .. import db
+from ..models import ArchivedSheet, ArchivedWeekSheet, Department, Employee, Role, Sheet, WeekSheet
+from .status_util import Status
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+EXPORT_COLUMNS = ('sheet_id', 'date', 'workhours', 'description',
+                  'employee_id', 'username', 'first_name', 'last_name', 'email',
+                  'department', 'role')
+
+
+def _approved_days(sheet, weeksheet, start, end):
+    return db.session.query(sheet.id, sheet.work_date, sheet.workhours, sheet.description,
+                            Employee.id, Employee.username, Employee.first_name,
+                            Employee.last_name, Employee.email,
+                            Department.name, Role.name) \
+        .join(weeksheet, sheet.weeksheet_id == weeksheet.id) \
+        .join(Employee, weeksheet.employee_id == Employee.id) \
+        .outerjoin(Department, Employee.department_id == Department.id) \
+        .outerjoin(Role, Employee.role_id == Role.id) \
+        .filter(sheet.status == Status.APPROVED,
+                sheet.work_date >= start,
+                sheet.work_date <= end)
+
+
+def approved_hours(start, end, batch_size=1000):
+    """
+    Yields the approved days between start and end, inclusive, joined with
+    their employee, department and role, archived days included. Rows are
+    fetched batch_size at a time from a server-side cursor, so memory use
+    does not grow with the date range.
+    """
+    query = _approved_days(Sheet, WeekSheet, start, end) \
+        .union_all(_approved_days(ArchivedSheet, ArchivedWeekSheet, start, end)) \
+        .order_by(Sheet.work_date, Sheet.id) \
+        .execution_options(stream_results=True) \
+        .yield_per(batch_size)
+    for row in query:
+        yield dict(zip(EXPORT_COLUMNS, row))
+
+
+def to_csv(rows, chunk_rows=500):
+    """Serializes rows to CSV text chunks, header first"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def to_ndjson(rows, chunk_rows=500):
+    """Serializes rows to newline-delimited JSON text chunks"""
+    lines = []
+    for row in rows:
+        row['date'] = row['date'].isoformat() if row['date'] else None
+        lines.append(json.dumps(row) + '\n')
+        if len(lines) == chunk_rows:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+
+def export_approved_hours(start, end, export_format='csv', batch_size=1000):
+    """Streams the approved hours between start and end in export_format"""
+    serializer = to_ndjson if export_format == 'ndjson' else to_csv
+    return serializer(approved_hours(start, end, batch_size=batch_size))
@@ -0,0 +1,33 @@
+import hashlib
+
+from flask import render_template
+from markupsafe import Markup
+
+from .. import data_versions, fragment_cache
+
+
+def cached_fragment(template, models, load, *key):
+    """
+    Render template with the context load() returns, or return the copy
+    rendered for the same key while none of the tables of models has
+    changed since.
+    load() only runs on a miss, so a hit does not touch the database.
+    """
+    # read the versions before loading, so a write that commits meanwhile
+    # can only leave newer data under an older key, never the reverse
+    versions = tuple(data_versions.get(model.__tablename__) for model in models)
+    seed = repr((template, versions) + key).encode()
+    cache_key = hashlib.sha1(seed).hexdigest()
+    html = fragment_cache.get(cache_key)
+    if html is None:
+        html = render_template(template, **load())
+        fragment_cache.set(cache_key, html)
+    return Markup(html)
+
+
+def invalidate_tables(*models):
+    """
+    Call after committing a change to the tables of models; bumps their
+    versions in a transaction of its own
+    """
+    data_versions.bump(*(model.__tablename__ for model in models))
@@ -0,0 +1,169 @@
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+
+from .. import db
+from ..models import Department, Employee, Role
+from .fragment_util import invalidate_tables
+
+REQUIRED_FIELDS = ('email', 'username', 'first_name', 'last_name', 'password')
+
+# keeps IN lists under SQLite's limit of 999 bound parameters
+LOOKUP_CHUNK = 400
+
+
+class ImportReport(object):
+    """
+    Outcome of a bulk import: how many employees were created and one
+    error per rejected row, numbered from 1 in file order
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def reject(self, row_number, row, message):
+        self.errors.append({'row': row_number, 'email': row.get('email'), 'error': message})
+
+    def as_dict(self):
+        return {'created': self.created, 'rejected': len(self.errors), 'errors': self.errors}
+
+
+def read_rows(stream, filename):
+    """
+    Reads employee records from a CSV file with a header line or from a
+    JSON array of objects, picked by the file extension
+    """
+    text = stream.read()
+    if isinstance(text, bytes):
+        text = text.decode('utf-8-sig')
+    if filename.lower().endswith('.json'):
+        rows = json.loads(text)
+        if not isinstance(rows, list):
+            raise ValueError('JSON imports must be an array of employee objects')
+        return rows
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+def _clean(row):
+    return {key.strip().lower(): str(value).strip()
+            for key, value in row.items() if key and value is not None}
+
+
+def _taken(rows):
+    """
+    Returns the emails and usernames of rows that are already registered,
+    with one query against the unique indexes per chunk of rows
+    """
+    emails, usernames = set(), set()
+    for i in range(0, len(rows), LOOKUP_CHUNK):
+        chunk = rows[i:i + LOOKUP_CHUNK]
+        query = db.session.query(Employee.email, Employee.username) \
+            .filter(or_(Employee.email.in_([row['email'] for row in chunk]),
+                        Employee.username.in_([row['username'] for row in chunk])))
+        for email, username in query:
+            emails.add(email)
+            usernames.add(username)
+    return emails, usernames
+
+
+def _hash_passwords(passwords, workers):
+    """Hashes passwords across a process pool; hashing is CPU bound by design"""
+    if workers == 1 or len(passwords) < 2:
+        return [generate_password_hash(password) for password in passwords]
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(generate_password_hash, passwords, chunksize=chunksize))
+
+
+def import_employees(rows, workers=None, batch_size=1000):
+    """
+    Validates and inserts employee records. Rows with missing fields,
+    unknown departments or roles, or emails and usernames that are already
+    taken are reported and skipped; the rest are inserted batch_size at a
+    time with executemany, or one by one if a batch conflicts with an
+    employee registered meanwhile.
+    """
+    report = ImportReport()
+    departments = dict(db.session.query(Department.name, Department.id))
+    roles = dict(db.session.query(Role.name, Role.id))
+
+    candidates = []
+    seen_emails, seen_usernames = set(), set()
+    for row_number, row in enumerate(rows, 1):
+        row = _clean(row) if isinstance(row, dict) else {}
+        missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+        if missing:
+            report.reject(row_number, row, 'Missing ' + ', '.join(missing))
+            continue
+        if '@' not in row['email']:
+            report.reject(row_number, row, 'Invalid email address')
+            continue
+        if row.get('department') and row['department'] not in departments:
+            report.reject(row_number, row, f"Unknown department {row['department']}")
+            continue
+        if row.get('role') and row['role'] not in roles:
+            report.reject(row_number, row, f"Unknown role {row['role']}")
+            continue
+        if row['email'] in seen_emails or row['username'] in seen_usernames:
+            report.reject(row_number, row, 'Duplicate email or username in this file')
+            continue
+        seen_emails.add(row['email'])
+        seen_usernames.add(row['username'])
+        candidates.append((row_number, row))
+
+    taken_emails, taken_usernames = _taken([row for _, row in candidates])
+    accepted = []
+    for row_number, row in candidates:
+        if row['email'] in taken_emails:
+            report.reject(row_number, row, 'Email is already in use')
+        elif row['username'] in taken_usernames:
+            report.reject(row_number, row, 'Username is already in use')
+        else:
+            accepted.append((row_number, row))
+
+    hashes = _hash_passwords([row['password'] for _, row in accepted], workers)
+    insert = Employee.__table__.insert()
+    for i in range(0, len(accepted), batch_size):
+        batch = accepted[i:i + batch_size]
+        params = [{'email': row['email'],
+                   'username': row['username'],
+                   'first_name': row['first_name'],
+                   'last_name': row['last_name'],
+                   'password_hash': password_hash,
+                   'department_id': departments.get(row.get('department')),
+                   'role_id': roles.get(row.get('role')),
+                   'is_admin': False}
+                  for (_, row), password_hash in zip(batch, hashes[i:i + batch_size])]
+        try:
+            db.session.execute(insert, params)
+            db.session.commit()
+            report.created += len(batch)
+        except IntegrityError:
+            # someone registered one of these in the meantime: insert the
+            # batch again a row at a time, each in a savepoint, so only the
+            # rows that conflict are rejected
+            db.session.rollback()
+            for (row_number, row), values in zip(batch, params):
+                try:
+                    with db.session.begin_nested():
+                        db.session.execute(insert, values)
+                except IntegrityError:
+                    taken_emails, _ = _taken([row])
+                    report.reject(row_number, row, 'Email is already in use' if row['email'] in taken_emails
+                                  else 'Username is already in use')
+                else:
+                    report.created += 1
+            db.session.commit()
+
+    if report.created:
+        invalidate_tables(Employee)
+    report.errors.sort(key=lambda error: error['row'])
+    return report
@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from .. import db
+from ..models import Job
+
+log = logging.getLogger(__name__)
+
+# kind -> handler, filled by the @job decorators in app/jobs.py
+JOBS = {}
+PENDING = ('queued', 'running')
+
+
+def job(kind):
+    """
+    Register the decorated function as the handler of jobs of kind. It is
+    called in an app context with the job's arguments as keyword
+    arguments, and what it returns, which must be JSON serializable, is
+    stored as the job's result. Raising fails the attempt.
+    """
+    def decorator(handler):
+        JOBS[kind] = handler
+        return handler
+    return decorator
+
+
+def enqueue(kind, arguments=None, created_by=None):
+    """
+    Queue a job and commit it, so a worker can pick it up. Returns the Job.
+    """
+    if kind not in JOBS:
+        raise ValueError(f'Unknown job kind {kind}')
+    queued = Job(kind=kind, arguments=json.dumps(arguments or {}), status='queued',
+                 max_attempts=current_app.config['JOB_MAX_ATTEMPTS'],
+                 run_after=datetime.utcnow(), created_by=created_by)
+    db.session.add(queued)
+    db.session.commit()
+    return queued
+
+
+def claim_job(worker):
+    """
+    Take the oldest due job for worker, or None when there is none. The
+    claim is a conditional UPDATE on the queued status, so of several
+    workers racing for a job exactly one gets it, on any database.
+    """
+    now = datetime.utcnow()
+    due = db.session.query(Job.id) \
+        .filter(Job.status == 'queued', Job.run_after <= now) \
+        .order_by(Job.run_after, Job.id).limit(10).all()
+    for id, in due:
+        claimed = Job.query.filter(Job.id == id, Job.status == 'queued') \
+            .update({Job.status: 'running', Job.attempts: Job.attempts + 1,
+                     Job.locked_by: worker, Job.started_at: now, Job.heartbeat_at: now},
+                    synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return Job.query.get(id)
+    return None
+
+
+def _finish(id, worker, values):
+    # only the worker still holding the job records its outcome; a job
+    # requeued by requeue_stale meanwhile belongs to another worker
+    values.update({Job.locked_by: None})
+    Job.query.filter(Job.id == id, Job.status == 'running', Job.locked_by == worker) \
+        .update(values, synchronize_session=False)
+    db.session.commit()
+
+
+def run_job(claimed, worker):
+    """
+    Run a claimed job and record its result. A failed attempt is retried
+    after JOB_RETRY_DELAY seconds, doubling each time, until the job has
+    had max_attempts; then it is marked failed with the traceback.
+    Returns the job's new status.
+    """
+    id, kind, attempts, max_attempts = claimed.id, claimed.kind, claimed.attempts, claimed.max_attempts
+    try:
+        handler = JOBS.get(kind)
+        if handler is None:
+            raise LookupError(f'No handler for jobs of kind {kind}')
+        result = handler(**json.loads(claimed.arguments))
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc()
+        log.warning('Job %s (%s) failed, attempt %s of %s\n%s', id, kind, attempts, max_attempts, error)
+        if attempts < max_attempts:
+            delay = current_app.config['JOB_RETRY_DELAY'] * 2 ** (attempts - 1)
+            status, values = 'queued', {Job.run_after: datetime.utcnow() + timedelta(seconds=delay)}
+        else:
+            status, values = 'failed', {Job.finished_at: datetime.utcnow()}
+        values.update({Job.status: status, Job.error: error})
+        _finish(id, worker, values)
+        return status
+
+    _finish(id, worker, {Job.status: 'succeeded', Job.result: json.dumps(result),
+                         Job.error: None, Job.finished_at: datetime.utcnow()})
+    return 'succeeded'
+
+
+def heartbeat(workers):
+    """
+    Mark the running jobs of workers, the names they claimed them with, as
+    still being worked on, so requeue_stale leaves them be however long
+    they run
+    """
+    Job.query.filter(Job.status == 'running', Job.locked_by.in_(workers)) \
+        .update({Job.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+
+
+def requeue_stale(timeout):
+    """
+    Give back running jobs without a heartbeat for more than timeout
+    seconds, whose worker is gone: queued again if attempts are left,
+    failed otherwise. Returns the number of jobs changed.
+    """
+    stale = (Job.status == 'running',
+             Job.heartbeat_at < datetime.utcnow() - timedelta(seconds=timeout))
+    requeued = Job.query.filter(Job.attempts < Job.max_attempts, *stale) \
+        .update({Job.status: 'queued', Job.locked_by: None, Job.error: 'Worker timed out'},
+                synchronize_session=False)
+    failed = Job.query.filter(Job.attempts >= Job.max_attempts, *stale) \
+        .update({Job.status: 'failed', Job.locked_by: None, Job.error: 'Worker timed out',
+                 Job.finished_at: datetime.utcnow()},
+                synchronize_session=False)
+    db.session.commit()
+    return requeued + failed
+
+
+def work(app, threads=1, poll_interval=1, burst=False):
+    """
+    Run jobs on threads threads until interrupted, each thread claiming
+    and running one job at a time in its own app context, and polling
+    every poll_interval seconds while the queue is empty. With burst, the
+    threads stop once the queue is empty instead. Returns the number of
+    jobs run. Meanwhile the calling thread sends the heartbeat of the
+    running jobs and gives back those of workers that are gone.
+    """
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    names = [f'{worker}:{number}' for number in range(threads)]
+    stopping = threading.Event()
+    counts = [0] * threads
+
+    def loop(number):
+        name = names[number]
+        while not stopping.is_set():
+            claimed = None
+            try:
+                with app.app_context():
+                    claimed = claim_job(name)
+                    if claimed is not None:
+                        run_job(claimed, name)
+                        counts[number] += 1
+            except Exception:
+                # e.g. the database is unreachable; try again after a pause
+                log.exception('Job worker %s could not claim or record a job', name)
+            if claimed is None:
+                if burst:
+                    return
+                stopping.wait(poll_interval)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(loop, number) for number in range(threads)]
+        try:
+            while True:
+                try:
+                    with app.app_context():
+                        heartbeat(names)
+                        requeued = requeue_stale(app.config['JOB_TIMEOUT'])
+                    if requeued:
+                        log.warning('Requeued %s jobs of workers that timed out', requeued)
+                except Exception:
+                    log.exception('Job worker %s could not send its heartbeat', worker)
+                if not wait(futures, timeout=app.config['JOB_HEARTBEAT_INTERVAL']).not_done:
+                    break
+        except KeyboardInterrupt:
+            # let the running jobs finish
+            stopping.set()
+    return sum(counts)
@@ -0,0 +1,25 @@
+from .. import data_versions, db, lookup_cache
+from ..models import Department, Role
+
+
+def lookup_choices(model):
+    """
+    (id, name) pairs of a lookup table for select fields, cached until the
+    table's data version is bumped, see fragment_util.invalidate_tables
+    """
+    table = model.__tablename__
+    key = (table, data_versions.get(table))
+    choices = lookup_cache.get(key)
+    if choices is None:
+        choices = db.session.query(model.id, model.name).order_by(model.name).all()
+        lookup_cache.set(key, choices)
+    return choices
+
+
+def department_choices():
+    return lookup_choices(Department)
+
+
+def role_choices():
+    return lookup_choices(Role)
+
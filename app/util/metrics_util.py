@@ -0,0 +1,205 @@
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+
+from flask import abort, before_render_template, g, has_request_context, request, \
+    template_rendered
+from flask_login import current_user
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+HELP = {
+    'kaarya_requests_total': ('counter', 'Requests served, by endpoint, method and status'),
+    'kaarya_request_duration_seconds': ('histogram', 'Time to build the response'),
+    'kaarya_request_sql_queries': ('histogram', 'SQL statements executed per request'),
+    'kaarya_request_sql_seconds': ('histogram', 'Time spent executing SQL per request'),
+    'kaarya_request_template_seconds': ('histogram', 'Time spent rendering templates per request'),
+    'kaarya_response_size_bytes': ('histogram', 'Response body size, when known up front'),
+}
+
+
+class Metrics(object):
+    """
+    Counters and histograms of this worker. With a directory set, the
+    worker writes them to metrics-<pid>.json every flush_interval seconds,
+    and render() adds up the files of every worker, so a scrape answered by
+    any one worker reports the whole server.
+    """
+
+    def __init__(self, directory=None, flush_interval=5):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.counters = {}
+        self.histograms = {}
+        self._flushed = 0
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': list(buckets),
+                                                    'counts': [0] * len(buckets),
+                                                    'sum': 0, 'count': 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['counts'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {'counters': [[name, labels, value]
+                                 for (name, labels), value in self.counters.items()],
+                    'histograms': [[name, labels, dict(histogram, counts=list(histogram['counts']))]
+                                   for (name, labels), histogram in self.histograms.items()]}
+
+    def flush(self, force=False):
+        if not self.directory or (not force and time.monotonic() - self._flushed < self.flush_interval):
+            return
+        self._flushed = time.monotonic()
+        path = os.path.join(self.directory, f'metrics-{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file)
+        # readers never see a half-written file
+        os.replace(path + '.tmp', path)
+
+    def collect(self):
+        """This worker's snapshot, or the sum of every worker's"""
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush(force=True)
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path) as snapshot_file:
+                    snapshots.append(json.load(snapshot_file))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        counters, histograms = {}, {}
+        for snapshot in self.collect():
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, histogram in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                total = histograms.get(key)
+                if total is None:
+                    histograms[key] = dict(histogram, counts=list(histogram['counts']))
+                    continue
+                total['counts'] = [a + b for a, b in zip(total['counts'], histogram['counts'])]
+                total['sum'] += histogram['sum']
+                total['count'] += histogram['count']
+
+        lines = []
+        for name, (kind, description) in HELP.items():
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+            for (metric, labels), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(histogram['buckets'], histogram['counts']):
+                    lines.append(f'{name}_bucket{_labels(labels + (("le", repr(bound)),))} {count}')
+                lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {histogram["count"]}')
+                lines.append(f'{name}_sum{_labels(labels)} {histogram["sum"]}')
+                lines.append(f'{name}_count{_labels(labels)} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def init_metrics(app, db):
+    """
+    Time every request and count the SQL and template work it does, per
+    endpoint, and serve the totals on /metrics to admins or to scrapers
+    presenting METRICS_TOKEN. Streamed responses are timed up to their
+    first byte and their size is not recorded.
+    """
+    if app.config['METRICS_DIR']:
+        os.makedirs(app.config['METRICS_DIR'], exist_ok=True)
+    metrics = Metrics(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_INTERVAL'])
+    app.extensions['metrics'] = metrics
+    engine = db.get_engine(app)
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'metrics_started' in g:
+            conn.info.setdefault('metrics_query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('metrics_query_started')
+        if started and has_request_context():
+            g.sql_queries += 1
+            g.sql_seconds += time.perf_counter() - started.pop()
+
+    def start_template(sender, template, context, **extra):
+        g.setdefault('template_started', []).append(time.perf_counter())
+
+    def end_template(sender, template, context, **extra):
+        started = g.get('template_started')
+        if started and 'template_seconds' in g:
+            g.template_seconds += time.perf_counter() - started.pop()
+
+    before_render_template.connect(start_template, app)
+    template_rendered.connect(end_template, app)
+
+    @app.before_request
+    def start_request():
+        g.metrics_started = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+        g.template_seconds = 0.0
+
+    @app.after_request
+    def record_request(response):
+        if 'metrics_started' not in g:
+            return response
+        labels = (('endpoint', request.endpoint or 'none'), ('method', request.method))
+        metrics.inc('kaarya_requests_total', labels + (('status', str(response.status_code)),))
+        metrics.observe('kaarya_request_duration_seconds', labels,
+                        time.perf_counter() - g.metrics_started, LATENCY_BUCKETS)
+        metrics.observe('kaarya_request_sql_queries', labels, g.sql_queries, QUERY_BUCKETS)
+        metrics.observe('kaarya_request_sql_seconds', labels, g.sql_seconds, LATENCY_BUCKETS)
+        metrics.observe('kaarya_request_template_seconds', labels, g.template_seconds,
+                        LATENCY_BUCKETS)
+        if not response.is_streamed:
+            metrics.observe('kaarya_response_size_bytes', labels,
+                            response.calculate_content_length() or 0, SIZE_BUCKETS)
+        metrics.flush()
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        """
+        Metrics of every worker in the Prometheus text format
+        """
+        token = app.config['METRICS_TOKEN']
+        presented = request.headers.get('Authorization', '')
+        # as bytes: compare_digest rejects str with non-ASCII characters
+        if not (token and hmac.compare_digest(presented.encode(), ('Bearer ' + token).encode())):
+            if not (current_user.is_authenticated and current_user.is_admin):
+                abort(403)
+        return app.response_class(metrics.render(),
+                                  content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,115 @@
+import os
+import sys
+import traceback
+from functools import wraps
+
+import flask_sqlalchemy
+import jinja2
+import sqlalchemy
+from flask import current_app, g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+
+SQLALCHEMY_ORM = os.path.dirname(sqlalchemy.orm.__file__)
+# queries these run from within a lazy load are not the lazy load itself:
+# reloading the expired row to read its foreign key, and the autoflush
+NOT_LAZY_LOADS = ('load_scalar_attributes', '_autoflush')
+# frames of these packages are skipped when looking for the code that
+# triggered a query
+LIBRARIES = tuple(os.path.dirname(package.__file__)
+                  for package in (sqlalchemy, flask_sqlalchemy, jinja2))
+
+
+class LazyLoadError(InvalidRequestError):
+    """The same relationship was lazy loaded twice from one call site"""
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view ran more queries than its query_budget allows"""
+
+
+def _lazy_load_site(frame):
+    """
+    The file and line, or template and line, that lazy loaded a
+    relationship or iterated a dynamic one in the query being executed,
+    with its frame; None for queries that are not lazy loads.
+    """
+    lazy = False
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(SQLALCHEMY_ORM):
+            if frame.f_code.co_name in NOT_LAZY_LOADS and not lazy:
+                return None
+            if frame.f_code.co_name == '_emit_lazyload' or filename.endswith('dynamic.py'):
+                lazy = True
+        elif not filename.startswith(LIBRARIES):
+            template = frame.f_globals.get('__jinja_template__')
+            if template is None and filename.startswith('<'):
+                # code the libraries generate, such as SQLAlchemy's
+                # decorators, is no call site either
+                frame = frame.f_back
+                continue
+            if not lazy:
+                return None
+            if template is not None:
+                return f'{template.filename}:{template.get_corresponding_lineno(frame.f_lineno)}', frame
+            return f'{filename}:{frame.f_lineno}', frame
+        frame = frame.f_back
+    return None
+
+
+def init_query_guard(app, db):
+    """
+    Count the queries of each app context for query_budget, and with
+    LAZY_LOAD_GUARD set to "warn" or "raise", report a relationship lazy
+    loaded twice from the same line in one request: the signature of a
+    loop over rows that should have been eager loaded.
+    """
+    engine = db.get_engine(app)
+    mode = app.config['LAZY_LOAD_GUARD']
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        if has_app_context():
+            g.queries_run = g.get('queries_run', 0) + 1
+
+    if mode not in ('warn', 'raise'):
+        return
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def guard_lazy_load(conn, cursor, statement, parameters, context, executemany):
+        if not has_app_context():
+            return
+        found = _lazy_load_site(sys._getframe(1))
+        if found is None:
+            return
+        site, frame = found
+        sites = g.setdefault('lazy_load_sites', {})
+        sites[site] = sites.get(site, 0) + 1
+        if sites[site] != 2:
+            return
+        message = f'Repeated lazy load at {site}; eager load the relationship in the query instead'
+        if mode == 'raise':
+            raise LazyLoadError(message)
+        app.logger.warning('%s\n%s', message, ''.join(traceback.format_stack(frame, limit=8)))
+
+
+def query_budget(limit):
+    """
+    Declare the most queries a view may run. Going over fails the request
+    under TESTING and logs a warning otherwise.
+    """
+    def decorator(view):
+        @wraps(view)
+        def decorated_view(*args, **kwargs):
+            before = g.get('queries_run', 0)
+            response = view(*args, **kwargs)
+            used = g.get('queries_run', 0) - before
+            if used > limit:
+                message = f'{view.__name__} ran {used} queries, over its budget of {limit}'
+                if current_app.testing:
+                    raise QueryBudgetExceeded(message)
+                current_app.logger.warning(message)
+            return response
+        return decorated_view
+    return decorator
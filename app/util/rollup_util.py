@@ -0,0 +1,106 @@
+from itertools import chain
+
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import and_, case, event, func, inspect, literal, select
+
+from ..models import Sheet, WeekSheet
+from .status_util import Status
+
+ROLLUP_ATTRIBUTES = ('day_count', 'total_hours', 'approved_hours',
+                     'pending_days', 'approved_days', 'rejected_days')
+# a change of these on a day changes its timesheet's rollup
+COUNTED_ATTRIBUTES = ('weeksheet_id', 'workhours', 'status')
+
+
+def rollup_values(weeksheet=WeekSheet, sheet=Sheet):
+    """
+    {rollup column: correlated subquery over the days of the row}, to
+    SET in an UPDATE of weeksheet
+    """
+    def days(*criteria, hours=False):
+        total = func.coalesce(func.sum(sheet.workhours), 0) if hours else func.count(sheet.id)
+        return select([total]).where(and_(sheet.weeksheet_id == weeksheet.id, *criteria)).as_scalar()
+
+    return {
+        weeksheet.day_count: days(),
+        weeksheet.total_hours: days(hours=True),
+        weeksheet.approved_hours: days(sheet.status == Status.APPROVED, hours=True),
+        weeksheet.pending_days: days(sheet.status == Status.SUBMITTED),
+        weeksheet.approved_days: days(sheet.status == Status.APPROVED),
+        weeksheet.rejected_days: days(sheet.status == Status.REJECTED),
+    }
+
+
+def refresh_rollups(*criteria):
+    """
+    Recount the rollup of the timesheets matching criteria, all of them
+    without criteria, from their days with one UPDATE in the caller's
+    transaction; a timesheet has at most seven days, so this is cheap
+    for a few rows. Returns the number of timesheets refreshed.
+    """
+    return WeekSheet.query.filter(*criteria) \
+        .update(rollup_values(), synchronize_session=False)
+
+
+def settled_status(pending_days, rejected_days):
+    """
+    The status of a submitted timesheet with pending_days of its days
+    still submitted and rejected_days rejected, as a SQL expression:
+    unchanged while a day is pending, then rejected if any day is, so the
+    employee can correct it, and approved otherwise
+    """
+    status_type = WeekSheet.status.type
+    return case([(pending_days > 0, WeekSheet.status),
+                 (rejected_days > 0, literal(Status.REJECTED, status_type))],
+                else_=literal(Status.APPROVED, status_type))
+
+
+def decide_day_rollup(weeksheet_id, status, workhours):
+    """
+    Count one submitted day of weeksheet_id as decided on with status,
+    by adding to the counters in place rather than recounting, and
+    settle the timesheet once its last pending day is decided. The SET
+    expressions all read the row as it was, and the row lock orders
+    concurrent decisions.
+    """
+    rejected_days = WeekSheet.rejected_days
+    values = {WeekSheet.pending_days: WeekSheet.pending_days - 1}
+    if status == Status.APPROVED:
+        values.update({
+            WeekSheet.approved_days: WeekSheet.approved_days + 1,
+            WeekSheet.approved_hours: WeekSheet.approved_hours + (workhours or 0),
+        })
+    else:
+        rejected_days = rejected_days + 1
+        values[WeekSheet.rejected_days] = rejected_days
+    values[WeekSheet.status] = settled_status(WeekSheet.pending_days - 1, rejected_days)
+    return WeekSheet.query.filter(WeekSheet.id == weeksheet_id) \
+        .update(values, synchronize_session=False)
+
+
+@event.listens_for(SignallingSession, 'after_flush')
+def _refresh_flushed_rollups(session, flush_context):
+    """
+    Recount the timesheets whose days the ORM just added, changed or
+    deleted, in the flush's transaction
+    """
+    weeksheet_ids = set()
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(instance, Sheet):
+            continue
+        state = inspect(instance)
+        if instance in session.dirty and not any(state.attrs[name].history.has_changes()
+                                                 for name in COUNTED_ATTRIBUTES):
+            continue
+        history = state.attrs.weeksheet_id.history
+        weeksheet_ids.update(id for id in chain(history.unchanged or (), history.added or (),
+                                                history.deleted or ()) if id is not None)
+    if not weeksheet_ids:
+        return
+    session.execute(WeekSheet.__table__.update()
+                    .where(WeekSheet.__table__.c.id.in_(weeksheet_ids))
+                    .values({column.key: value for column, value in rollup_values().items()}))
+    # loaded timesheets read the new counts on next access
+    for instance in session.identity_map.values():
+        if isinstance(instance, WeekSheet) and inspect(instance).identity[0] in weeksheet_ids:
+            session.expire(instance, ROLLUP_ATTRIBUTES)
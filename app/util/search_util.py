@@ -0,0 +1,81 @@
+import re
+
+from sqlalchemy import and_, or_, text
+
+from .. import db
+from ..models import Department, Employee, Role, Sheet, WeekSheet
+
+# the columns searched in each model's table; the full_text_search
+# migration indexes the same ones
+SEARCH_COLUMNS = {
+    Sheet: ('description',),
+    Employee: ('first_name', 'last_name', 'username', 'email'),
+    Department: ('name', 'description'),
+    Role: ('name', 'description'),
+}
+TERM = re.compile(r'\w+')
+MAX_TERMS = 8
+
+
+def search_terms(query):
+    """The words of a search box query; punctuation is never syntax"""
+    return TERM.findall(query.lower())[:MAX_TERMS]
+
+
+def _ranked_ids(model, terms, limit, offset):
+    table = model.__tablename__
+    columns = SEARCH_COLUMNS[model]
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        # every term must match, the last one as the start of a word, so
+        # results show up while the last word is still being typed
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        statement = text(f'SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH :match '
+                         f'ORDER BY rank LIMIT :limit OFFSET :offset')
+    elif dialect == 'postgresql':
+        match = ' & '.join(terms) + ':*'
+        # the same expression as the ix_<table>_search index, or it is not used
+        document = "to_tsvector('english', {})".format(
+            " || ' ' || ".join(f"coalesce({column}, '')" for column in columns))
+        statement = text(f"SELECT id FROM {table} WHERE {document} @@ to_tsquery('english', :match) "
+                         f"ORDER BY ts_rank({document}, to_tsquery('english', :match)) DESC, id "
+                         f"LIMIT :limit OFFSET :offset")
+    else:
+        # no full text index: every term anywhere in the columns, newest first
+        attributes = [getattr(model, column) for column in columns]
+        query = db.session.query(model.id) \
+            .filter(and_(*(or_(*(attribute.ilike(f'%{term}%') for attribute in attributes))
+                           for term in terms))) \
+            .order_by(model.id.desc()).limit(limit).offset(offset)
+        return [id for id, in query]
+    return [id for id, in db.session.execute(statement, {'match': match, 'limit': limit,
+                                                         'offset': offset})]
+
+
+def _in_rank_order(rows, ids, key=lambda row: row.id):
+    by_id = {key(row): row for row in rows}
+    return [by_id[id] for id in ids if id in by_id]
+
+
+def search(model, terms, limit, offset=0):
+    """
+    The rows of model matching every term, best match first
+    """
+    ids = _ranked_ids(model, terms, limit, offset) if terms else []
+    if not ids:
+        return []
+    return _in_rank_order(model.query.filter(model.id.in_(ids)).all(), ids)
+
+
+def search_sheets(terms, limit, offset=0):
+    """
+    (sheet, employee id) for the days whose description matches every
+    term, best match first
+    """
+    ids = _ranked_ids(Sheet, terms, limit, offset) if terms else []
+    if not ids:
+        return []
+    rows = db.session.query(Sheet, WeekSheet.employee_id) \
+        .join(WeekSheet, Sheet.weeksheet_id == WeekSheet.id) \
+        .filter(Sheet.id.in_(ids)).all()
+    return _in_rank_order(rows, ids, key=lambda row: row[0].id)
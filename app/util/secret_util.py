@@ -0,0 +1,34 @@
+import os
+import secrets
+
+
+def load_secret_key(path):
+    """
+    The key stored in path, created there on first use, for development.
+    Of several processes starting at once, the first to link its key into
+    place wins and the others read that one. An empty file is an error
+    rather than an empty key.
+    """
+    try:
+        return _read(path)
+    except FileNotFoundError:
+        pass
+    draft = f'{path}.{os.getpid()}'
+    descriptor = os.open(draft, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, 'w') as stream:
+        stream.write(secrets.token_hex(32))
+    try:
+        os.link(draft, path)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(draft)
+    return _read(path)
+
+
+def _read(path):
+    with open(path) as stored:
+        key = stored.read().strip()
+    if not key:
+        raise RuntimeError(f'The secret key file {path} is empty')
+    return key
@@ -0,0 +1,52 @@
+import hashlib
+import os
+import time
+
+from flask import request
+from werkzeug.security import safe_join
+
+ONE_YEAR = 365 * 24 * 60 * 60
+
+
+def init_static_fingerprints(app):
+    """
+    Add a content hash to every url_for('static', ...) as ?v=<hash>, and
+    let browsers cache URLs carrying the current hash for a year. Other
+    static URLs keep the short SEND_FILE_MAX_AGE_DEFAULT, so a deploy
+    takes effect on the next page view.
+    """
+    fingerprints = {}
+
+    def fingerprint(filename):
+        path = safe_join(app.static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+        cached = fingerprints.get(filename)
+        # files only change between deploys, except in development
+        if cached is not None and not app.debug:
+            return cached[1]
+        modified = os.path.getmtime(path)
+        if cached is None or cached[0] != modified:
+            with open(path, 'rb') as static_file:
+                digest = hashlib.md5(static_file.read()).hexdigest()[:12]
+            cached = fingerprints[filename] = (modified, digest)
+        return cached[1]
+
+    @app.url_defaults
+    def add_fingerprint(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            digest = fingerprint(values['filename'])
+            if digest:
+                values['v'] = digest
+
+    @app.after_request
+    def cache_fingerprinted(response):
+        if request.endpoint != 'static' or response.status_code not in (200, 304):
+            return response
+        version = request.args.get('v')
+        if version and version == fingerprint(request.view_args['filename']):
+            response.cache_control.public = True
+            response.cache_control.max_age = ONE_YEAR
+            response.expires = int(time.time() + ONE_YEAR)
+            response.headers['Cache-Control'] += ', immutable'
+        return response
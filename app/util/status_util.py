@@ -0,0 +1,83 @@
+from enum import IntEnum
+
+from sqlalchemy.types import SmallInteger, TypeDecorator
+
+
+class Status(IntEnum):
+    """
+    Review status of a timesheet and of its days, stored as a small
+    integer. str() gives the label shown to people.
+    """
+    NOT_SUBMITTED = 0
+    SUBMITTED = 1
+    APPROVED = 2
+    REJECTED = 3
+
+    @property
+    def label(self):
+        return LABELS[self]
+
+    @property
+    def editable(self):
+        """Whether the employee may still change a timesheet or day in this status"""
+        return self in EDITABLE
+
+    def __str__(self):
+        return self.label
+
+    def __format__(self, spec):
+        return format(self.label, spec)
+
+    @classmethod
+    def from_label(cls, label):
+        """The status labelled label, case insensitively; KeyError otherwise"""
+        return BY_LABEL[label.lower()]
+
+
+LABELS = {
+    Status.NOT_SUBMITTED: 'Not Submitted',
+    Status.SUBMITTED: 'Submitted',
+    Status.APPROVED: 'Approved',
+    Status.REJECTED: 'Rejected',
+}
+BY_LABEL = {label.lower(): status for status, label in LABELS.items()}
+
+# the allowed changes of status; a rejected timesheet goes back to its
+# employee to be corrected and submitted again
+TRANSITIONS = {
+    Status.NOT_SUBMITTED: {Status.SUBMITTED},
+    Status.SUBMITTED: {Status.APPROVED, Status.REJECTED},
+    Status.APPROVED: set(),
+    Status.REJECTED: {Status.NOT_SUBMITTED, Status.SUBMITTED},
+}
+# the statuses of timesheets, and of days, their employee may edit, save
+# and submit; an approved day of a rejected timesheet stays as it is
+EDITABLE = frozenset({Status.NOT_SUBMITTED, Status.REJECTED})
+
+
+class InvalidTransition(ValueError):
+    """A status change the state machine does not allow"""
+
+
+def check_transition(current, new):
+    """
+    new, when a row in status current may move to it; raises
+    InvalidTransition otherwise. New rows, whose current is None, may
+    start in any status.
+    """
+    new = Status(new)
+    if current is not None and new != current and new not in TRANSITIONS[Status(current)]:
+        raise InvalidTransition(f'Cannot change status from {current} to {new}')
+    return new
+
+
+class StatusType(TypeDecorator):
+    """A Status in a SMALLINT column"""
+
+    impl = SmallInteger
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else int(Status(value))
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else Status(value)
@@ -0,0 +1,139 @@
+from datetime import datetime
+from itertools import chain
+
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import and_, case, event, exists, func, inspect, literal, or_, select
+
+from .. import db
+from ..models import ArchivedSheet, ArchivedWeekSheet, Employee, Sheet, WeekSheet, WeeklyHours
+from .rollup_util import COUNTED_ATTRIBUTES
+from .status_util import Status
+
+# summary column: the status of the days whose hours it sums
+HOURS_BY_STATUS = {
+    'not_submitted_hours': Status.NOT_SUBMITTED,
+    'submitted_hours': Status.SUBMITTED,
+    'approved_hours': Status.APPROVED,
+    'rejected_hours': Status.REJECTED,
+}
+# the columns of a summary row, in the order _summaries selects them
+SUMMARY_COLUMNS = ['employee_id', 'week_start', 'department_id', 'role_id', 'days', 'total_hours'] + \
+    list(HOURS_BY_STATUS) + ['updated_at']
+
+
+def _summaries(weeksheet, sheet, *criteria):
+    """SELECT the summary rows of the timesheets in weeksheet matching criteria"""
+    def hours(status=None):
+        workhours = sheet.workhours if status is None else \
+            case([(sheet.status == status, sheet.workhours)], else_=0)
+        return func.coalesce(func.sum(workhours), 0)
+
+    columns = [weeksheet.employee_id, weeksheet.week_start, Employee.department_id, Employee.role_id,
+               func.count(sheet.id), hours()] + \
+        [hours(status) for status in HOURS_BY_STATUS.values()] + [literal(datetime.utcnow())]
+    days = weeksheet.__table__ \
+        .join(Employee.__table__, weeksheet.employee_id == Employee.id) \
+        .outerjoin(sheet.__table__, sheet.weeksheet_id == weeksheet.id)
+    return select(columns).select_from(days) \
+        .where(and_(weeksheet.week_start.isnot(None), *criteria)) \
+        .group_by(weeksheet.id, weeksheet.employee_id, weeksheet.week_start,
+                  Employee.department_id, Employee.role_id)
+
+
+def refresh_weekly_hours(*criteria, session=None):
+    """
+    Sum again the weeks of the timesheets matching criteria, filters on
+    WeekSheet, from their days, with a DELETE and an INSERT in the
+    caller's transaction. A timesheet has at most seven days, so this is
+    cheap for a few timesheets.
+    """
+    session = session or db.session
+    summarised = exists().where(and_(WeekSheet.employee_id == WeeklyHours.employee_id,
+                                     WeekSheet.week_start == WeeklyHours.week_start, *criteria))
+    session.execute(WeeklyHours.__table__.delete().where(summarised))
+    session.execute(WeeklyHours.__table__.insert().from_select(
+        SUMMARY_COLUMNS, _summaries(WeekSheet, Sheet, *criteria)))
+
+
+def drop_weekly_hours(keys, session=None):
+    """Delete the summary rows of the (employee id, week start) keys"""
+    session = session or db.session
+    session.execute(WeeklyHours.__table__.delete().where(or_(
+        *(and_(WeeklyHours.employee_id == employee_id, WeeklyHours.week_start == week_start)
+          for employee_id, week_start in keys))))
+
+
+def move_weekly_hours(employee_ids, session=None):
+    """File the weeks of employee_ids under their current department and role"""
+    session = session or db.session
+    employee = Employee.__table__
+
+    def current(column):
+        return select([column]).where(employee.c.id == WeeklyHours.employee_id).as_scalar()
+
+    session.execute(WeeklyHours.__table__.update()
+                    .where(WeeklyHours.employee_id.in_(employee_ids))
+                    .values(department_id=current(employee.c.department_id),
+                            role_id=current(employee.c.role_id)))
+
+
+def rebuild_weekly_hours():
+    """
+    Replace every summary row with sums of the hot and archived days, in
+    one transaction, so readers see the old rows until it commits.
+    Returns the number of rows written.
+    """
+    db.session.execute(WeeklyHours.__table__.delete())
+    for weeksheet, sheet in ((WeekSheet, Sheet), (ArchivedWeekSheet, ArchivedSheet)):
+        db.session.execute(WeeklyHours.__table__.insert().from_select(
+            SUMMARY_COLUMNS, _summaries(weeksheet, sheet)))
+    db.session.commit()
+    return db.session.query(func.count()).select_from(WeeklyHours).scalar()
+
+
+def _values(state, name):
+    history = state.attrs[name].history
+    return [value for value in chain(history.added or (), history.unchanged or (), history.deleted or ())
+            if value is not None]
+
+
+def _old_value(state, name):
+    history = state.attrs[name].history
+    values = history.deleted or history.unchanged
+    return values[0] if values else None
+
+
+def _changed(state, names):
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+
+@event.listens_for(SignallingSession, 'after_flush')
+def _refresh_flushed_weekly_hours(session, flush_context):
+    """
+    Sum again the weeks whose timesheets or days the ORM just added,
+    changed or deleted, and move those of employees given another
+    department or role, in the flush's transaction
+    """
+    weeksheet_ids, stale_keys, employee_ids = set(), set(), set()
+    for instance in chain(session.new, session.dirty, session.deleted):
+        state = inspect(instance)
+        if isinstance(instance, Sheet):
+            if instance not in session.dirty or _changed(state, COUNTED_ATTRIBUTES):
+                weeksheet_ids.update(_values(state, 'weeksheet_id'))
+        elif isinstance(instance, WeekSheet):
+            moved = instance in session.dirty and _changed(state, ('employee_id', 'week_start'))
+            if instance in session.deleted or moved:
+                stale_keys.add((_old_value(state, 'employee_id'), _old_value(state, 'week_start')))
+            if instance not in session.deleted:
+                # new rows only get their identity once the flush is over
+                weeksheet_ids.update(_values(state, 'id'))
+        elif isinstance(instance, Employee) and instance in session.dirty \
+                and _changed(state, ('department_id', 'role_id')):
+            employee_ids.add(state.identity[0])
+    stale_keys = {key for key in stale_keys if None not in key}
+    if stale_keys:
+        drop_weekly_hours(stale_keys, session=session)
+    if weeksheet_ids:
+        refresh_weekly_hours(WeekSheet.id.in_(weeksheet_ids), session=session)
+    if employee_ids:
+        move_weekly_hours(employee_ids, session=session)
@@ -0,0 +1,181 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from itsdangerous import BadSignature, TimedJSONWebSignatureSerializer
+from sqlalchemy.exc import IntegrityError
+
+from .. import db, login_manager
+from ..models import RevokedToken, _from_snapshot
+
+TOKEN_TYPES = ('access', 'refresh')
+# rows revoked this long before the last sync are read again, for
+# revocations committed late or stamped by a host whose clock is behind
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def _serializer(token_type):
+    ttl = current_app.config['API_ACCESS_TOKEN_TTL' if token_type == 'access' else 'API_REFRESH_TOKEN_TTL']
+    # a salt per type, so neither kind of token passes for the other
+    return TimedJSONWebSignatureSerializer(current_app.config['SECRET_KEY'], expires_in=ttl,
+                                           salt=f'api-{token_type}-token')
+
+
+def issue_token(employee, token_type):
+    """A signed token of token_type for employee, as a string"""
+    claims = {'sub': employee.id, 'adm': bool(employee.is_admin), 'typ': token_type,
+              'jti': uuid.uuid4().hex}
+    return _serializer(token_type).dumps(claims).decode()
+
+
+def issue_tokens(employee):
+    """The access and refresh token pair handed out on login and refresh"""
+    return {'access_token': issue_token(employee, 'access'),
+            'refresh_token': issue_token(employee, 'refresh'),
+            'token_type': 'Bearer',
+            'expires_in': current_app.config['API_ACCESS_TOKEN_TTL']}
+
+
+def verify_token(token, token_type):
+    """
+    The claims of token, with its expiry as exp, when it is a valid,
+    unexpired and unrevoked token of token_type; None otherwise. Checks
+    the signature and the in-memory revocation list only.
+    """
+    try:
+        claims, header = _serializer(token_type).loads(token, return_header=True)
+    except BadSignature:
+        # SignatureExpired included
+        return None
+    if not isinstance(claims, dict) or claims.get('typ') != token_type:
+        return None
+    if revoked_tokens.is_revoked(claims.get('jti')):
+        return None
+    claims['exp'] = header['exp']
+    return claims
+
+
+def revoke_token(claims):
+    """
+    Record the token of claims as revoked, and commit; True when this
+    call revoked it, False when it already was. The INSERT of its unique
+    jti is the check, so of two calls for a token, in any processes and
+    however close, exactly one revokes it; other processes' lists pick
+    it up within REVOCATION_SYNC_INTERVAL seconds.
+    """
+    expires_at = datetime.utcfromtimestamp(claims['exp'])
+    try:
+        db.session.execute(RevokedToken.__table__.insert().values(
+            jti=claims['jti'], token_type=claims['typ'], employee_id=claims['sub'],
+            expires_at=expires_at, revoked_at=datetime.utcnow()))
+        db.session.commit()
+        revoked = True
+    except IntegrityError:
+        db.session.rollback()
+        revoked = False
+    revoked_tokens.add(claims['jti'], expires_at)
+    return revoked
+
+
+def purge_revoked_tokens():
+    """Delete the rows of revoked tokens that have expired anyway; returns how many"""
+    purged = RevokedToken.query.filter(RevokedToken.expires_at < datetime.utcnow()) \
+        .delete(synchronize_session=False)
+    db.session.commit()
+    return purged
+
+
+class RevocationList(object):
+    """
+    The unexpired revoked token ids, kept in memory and brought up to date
+    from the revoked_tokens table at most every sync_interval seconds, so
+    checking a token costs a query per interval rather than per request.
+    An LRU of maxsize ids; once more than that many unexpired tokens are
+    revoked, ids it does not hold are looked up in the table instead.
+    """
+
+    def __init__(self, maxsize=100000, sync_interval=5):
+        self.maxsize = maxsize
+        self.sync_interval = sync_interval
+        self.overflowed = False
+        self._revoked = OrderedDict()  # jti -> expires_at
+        self._synced_at = None
+        self._next_sync = 0
+        self._lock = threading.Lock()
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._add(jti, expires_at)
+
+    def _add(self, jti, expires_at):
+        self._revoked[jti] = expires_at
+        self._revoked.move_to_end(jti)
+        while len(self._revoked) > self.maxsize:
+            _, evicted_expiry = self._revoked.popitem(last=False)
+            if evicted_expiry > datetime.utcnow():
+                self.overflowed = True
+
+    def sync(self):
+        """Read the revocations since the last sync, and forget expired ones"""
+        now = datetime.utcnow()
+        query = db.session.query(RevokedToken.jti, RevokedToken.expires_at) \
+            .filter(RevokedToken.expires_at > now)
+        if self._synced_at is not None:
+            query = query.filter(RevokedToken.revoked_at >= self._synced_at - SYNC_OVERLAP)
+        rows = query.order_by(RevokedToken.revoked_at).all()
+        with self._lock:
+            for jti, expires_at in rows:
+                self._add(jti, expires_at)
+            for jti in [jti for jti, expires_at in self._revoked.items() if expires_at <= now]:
+                del self._revoked[jti]
+            self._synced_at = now
+            self._next_sync = time.monotonic() + self.sync_interval
+
+    def is_revoked(self, jti):
+        if time.monotonic() >= self._next_sync:
+            self.sync()
+        with self._lock:
+            if jti in self._revoked:
+                self._revoked.move_to_end(jti)
+                return True
+            if not self.overflowed:
+                return False
+        return db.session.query(RevokedToken.id).filter(RevokedToken.jti == jti).first() is not None
+
+    def clear(self):
+        with self._lock:
+            self._revoked.clear()
+            self.overflowed = False
+            self._synced_at = None
+            self._next_sync = 0
+
+
+revoked_tokens = RevocationList()
+
+
+def bearer_token(request):
+    """The token of an "Authorization: Bearer <token>" header, or None"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return (token.strip() or None) if scheme.lower() == 'bearer' else None
+
+
+@login_manager.request_loader
+def load_user_from_request(request):
+    """
+    The employee an access token was issued to, built from its claims
+    without a query, like a cached user in load_user; columns other than
+    id and is_admin load from the database when first read
+    """
+    token = bearer_token(request)
+    claims = verify_token(token, 'access') if token else None
+    if claims is None:
+        return None
+    return _from_snapshot({'id': claims['sub'], 'is_admin': claims['adm']})
+
+
+def init_tokens(app):
+    revoked_tokens.maxsize = app.config['REVOCATION_CACHE_SIZE']
+    revoked_tokens.sync_interval = app.config['REVOCATION_SYNC_INTERVAL']
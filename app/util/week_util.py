@@ -0,0 +1,37 @@
+from collections import namedtuple
+from datetime import date, timedelta
+from functools import lru_cache
+
+PERIOD_DATE_FORMAT = "%d/%m/%Y"
+WORK_DAYS = 5
+
+Week = namedtuple('Week', ['start', 'end', 'period', 'days', 'dates'])
+
+
+def week_bounds(day):
+    """Returns the Monday and Sunday of the week containing day"""
+    start = day - timedelta(days=day.weekday())
+    return start, start + timedelta(days=6)
+
+
+def format_period(start, end):
+    """Formats a week as the dd/mm/YYYY-dd/mm/YYYY period string"""
+    return start.strftime(PERIOD_DATE_FORMAT) + '-' + end.strftime(PERIOD_DATE_FORMAT)
+
+
+@lru_cache(maxsize=256)
+def week_calendar(start):
+    """
+    The Week beginning on the Monday start: its Sunday, period string, and
+    work days as dates and as dd/mm/YYYY strings. Weeks never change, so
+    each is only built once per process.
+    """
+    end = start + timedelta(days=6)
+    days = tuple(start + timedelta(days=i) for i in range(WORK_DAYS))
+    return Week(start, end, format_period(start, end), days,
+                tuple(day.strftime(PERIOD_DATE_FORMAT) for day in days))
+
+
+def current_week():
+    """The Week of today, looked up on every call rather than at import"""
+    return week_calendar(week_bounds(date.today())[0])
@@ -0,0 +1,165 @@
+"""
+Fills the database with synthetic departments, roles, employees and
+timesheets for benchmarking.
+
+Every generated employee gets one timesheet of five days for each of the
+--weeks weeks before the current one, so the current week is left free
+for adding timesheets. Older weeks are mostly approved; the latest one is
+a mix of submitted, saved and approved timesheets. All employees share the
+password "benchmark". Rows are inserted with executemany, --batch-size at
+a time, into the database DATABASE_URL points at, after migrating it.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/datagen.py --employees 50000 --weeks 104
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# nothing is signed here, but the default, production, config refuses to
+# start without a key; it is read when app is first imported
+os.environ.setdefault('SECRET_KEY', 'datagen')
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import db  # noqa: E402
+from app.models import Department, Employee, Role, Sheet, WeekSheet  # noqa: E402
+from app.util.status_util import Status  # noqa: E402
+from app.util.summary_util import refresh_weekly_hours  # noqa: E402
+from app.util.week_util import PERIOD_DATE_FORMAT, format_period, week_bounds  # noqa: E402
+
+PASSWORD = 'benchmark'
+DAYS_PER_WEEK = 5
+
+
+def _next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def _insert(model, rows):
+    if rows:
+        db.session.execute(model.__table__.insert(), rows)
+
+
+def _status(rng, latest):
+    roll = rng.random()
+    if latest:
+        return Status.SUBMITTED if roll < 0.5 else Status.NOT_SUBMITTED if roll < 0.75 else Status.APPROVED
+    return Status.APPROVED if roll < 0.9 else Status.REJECTED if roll < 0.95 else Status.SUBMITTED
+
+
+def generate(employees, weeks, departments=20, roles=10, seed=0, batch_size=5000):
+    """
+    Inserts the synthetic data in the current app context and returns
+    the number of rows added per table. Ids continue from the existing
+    rows, so it can be run again on a filled database.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    counts = {}
+
+    department_id, role_id = _next_id(Department), _next_id(Role)
+    _insert(Department, [{'id': department_id + i, 'name': f'Department {department_id + i}',
+                          'description': 'Generated for benchmarks'} for i in range(departments)])
+    _insert(Role, [{'id': role_id + i, 'name': f'Role {role_id + i}',
+                    'description': 'Generated for benchmarks'} for i in range(roles)])
+    db.session.commit()
+    counts['departments'], counts['roles'] = departments, roles
+
+    # hashing is deliberately slow, so every employee shares one hash
+    password_hash = generate_password_hash(PASSWORD)
+    first_employee = _next_id(Employee)
+    for start in range(0, employees, batch_size):
+        _insert(Employee, [{'id': first_employee + i,
+                            'email': f'bench{first_employee + i}@example.com',
+                            'username': f'bench{first_employee + i}',
+                            'first_name': 'Bench', 'last_name': str(first_employee + i),
+                            'password_hash': password_hash,
+                            'department_id': department_id + rng.randrange(departments),
+                            'role_id': role_id + rng.randrange(roles),
+                            'is_admin': False, 'updated_at': now}
+                           for i in range(start, min(start + batch_size, employees))])
+        db.session.commit()
+    counts['employees'] = employees
+
+    current_week = week_bounds(date.today())[0]
+    week_starts = [current_week - timedelta(weeks=n) for n in range(weeks, 0, -1)]
+    weeksheet_id, sheet_id = _next_id(WeekSheet), _next_id(Sheet)
+    first_weeksheet = weeksheet_id
+    weeksheets, sheets = [], []
+    counts['weeksheets'] = counts['sheets'] = 0
+
+    def flush():
+        _insert(WeekSheet, weeksheets)
+        _insert(Sheet, sheets)
+        db.session.commit()
+        counts['weeksheets'] += len(weeksheets)
+        counts['sheets'] += len(sheets)
+        del weeksheets[:], sheets[:]
+
+    for employee_id in range(first_employee, first_employee + employees):
+        for week_start in week_starts:
+            week_end = week_start + timedelta(days=6)
+            status = _status(rng, week_start == week_starts[-1])
+            hours = [rng.randint(4, 10) for _ in range(DAYS_PER_WEEK)]
+            # the rows are inserted without the ORM, so with their rollup
+            weeksheets.append({'id': weeksheet_id, 'employee_id': employee_id,
+                               'period': format_period(week_start, week_end),
+                               'week_start': week_start, 'week_end': week_end,
+                               'status': status, 'updated_at': now,
+                               'day_count': DAYS_PER_WEEK, 'total_hours': sum(hours),
+                               'approved_hours': sum(hours) if status == Status.APPROVED else 0,
+                               'pending_days': DAYS_PER_WEEK if status == Status.SUBMITTED else 0,
+                               'approved_days': DAYS_PER_WEEK if status == Status.APPROVED else 0,
+                               'rejected_days': 0})
+            for day_number, workhours in enumerate(hours):
+                day = week_start + timedelta(days=day_number)
+                sheets.append({'id': sheet_id, 'weeksheet_id': weeksheet_id,
+                               'date': day.strftime(PERIOD_DATE_FORMAT), 'work_date': day,
+                               'workhours': workhours,
+                               'description': 'Generated for benchmarks',
+                               'status': status, 'updated_at': now})
+                sheet_id += 1
+            weeksheet_id += 1
+            if len(sheets) >= batch_size:
+                flush()
+    flush()
+    # summed from the rows just inserted, as the app would have
+    refresh_weekly_hours(WeekSheet.id >= first_weeksheet)
+    db.session.commit()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--employees', type=int, default=1000)
+    parser.add_argument('--weeks', type=int, default=52)
+    parser.add_argument('--departments', type=int, default=20)
+    parser.add_argument('--roles', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.util.bootstrap_util import migrate_database, seed_admin
+
+    # the migrations directory is looked up relative to the working directory
+    os.chdir(ROOT)
+    app = create_app()
+    with app.app_context():
+        migrate_database()
+        seed_admin('admin@admin.com', 'admin', 'admin2020')
+        started = time.perf_counter()
+        counts = generate(args.employees, args.weeks, args.departments, args.roles,
+                          args.seed, args.batch_size)
+        counts['seconds'] = round(time.perf_counter() - started, 2)
+    print(json.dumps(counts, indent=2))
+
+
+if __name__ == '__main__':
+    main()
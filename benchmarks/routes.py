@@ -0,0 +1,208 @@
+"""
+Drives the main routes through the Flask test client and reports latency
+percentiles, throughput and SQL queries per request as JSON.
+
+Without --database the runner migrates a new SQLite file and fills it with
+datagen.py at the --employees and --weeks scale; with it, the database
+must already hold generated data. Only the request under test is timed:
+logging in as the next employee for the add scenario is not. Compare the
+output of two releases to spot regressions.
+
+    python benchmarks/routes.py --requests 200 --output routes.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import event  # noqa: E402
+
+ADMIN_EMAIL, ADMIN_PASSWORD = 'admin@admin.com', 'admin2020'
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    index = max(0, min(len(samples) - 1, int(round(fraction * len(samples) + 0.5)) - 1))
+    return samples[index]
+
+
+def summarize(timings, queries, elapsed):
+    timings = sorted(timings)
+    return {'requests': len(timings),
+            'p50_ms': round(percentile(timings, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+            'max_ms': round(timings[-1] * 1000, 2),
+            'throughput_rps': round(len(timings) / elapsed, 1) if elapsed else None,
+            'queries_per_request': round(sum(queries) / len(queries), 2),
+            'max_queries': max(queries)}
+
+
+class Runner(object):
+    def __init__(self, app, db):
+        self.app = app
+        self.queries = 0
+        event.listen(db.get_engine(app), 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.queries += 1
+
+    def login(self, email, password):
+        client = self.app.test_client()
+        response = client.post('/login', data={'email': email, 'password': password})
+        if response.status_code != 302:
+            raise RuntimeError(f'Unable to log in as {email}')
+        return client
+
+    def measure(self, requests):
+        """Times each (client, method, url, data) request and counts its queries"""
+        timings, queries = [], []
+        # throughput is over the wall time of the whole run, not the sum
+        # of the timings, so it counts what happens between requests too
+        started = time.perf_counter()
+        for client, method, url, data in requests:
+            before = self.queries
+            request_started = time.perf_counter()
+            response = client.open(url, method=method, data=data)
+            timings.append(time.perf_counter() - request_started)
+            queries.append(self.queries - before)
+            if response.status_code >= 400:
+                raise RuntimeError(f'{method} {url} answered {response.status_code}')
+        return summarize(timings, queries, time.perf_counter() - started)
+
+
+def day_fields(days, description):
+    fields = {}
+    for i, day in enumerate(days):
+        fields[f'sheets-{i}-date'] = day
+        fields[f'sheets-{i}-workhours'] = '8'
+        fields[f'sheets-{i}-description'] = description
+    return fields
+
+
+def scenarios(runner, db, count):
+    from app.models import Employee, WeekSheet
+    from datagen import DAYS_PER_WEEK, PASSWORD
+    from app.util.status_util import Status
+    from app.util.week_util import PERIOD_DATE_FORMAT, week_bounds
+
+    with runner.app.app_context():
+        employee_emails = [email for email, in db.session.query(Employee.email)
+                           .filter(Employee.is_admin.isnot(True))
+                           .order_by(Employee.id).limit(count)]
+        current_week = week_bounds(date.today())[0]
+        free_emails = [email for email, in db.session.query(Employee.email)
+                       .filter(Employee.is_admin.isnot(True),
+                               ~Employee.id.in_(db.session.query(WeekSheet.employee_id)
+                                                .filter(WeekSheet.week_start == current_week)))
+                       .order_by(Employee.id).limit(count)]
+        drafts = db.session.query(WeekSheet.id, Employee.email) \
+            .join(Employee, Employee.id == WeekSheet.employee_id) \
+            .filter(WeekSheet.status == Status.NOT_SUBMITTED) \
+            .order_by(WeekSheet.id).limit(count).all()
+        submitted = [id for id, in db.session.query(WeekSheet.id)
+                     .filter(WeekSheet.status == Status.SUBMITTED)
+                     .order_by(WeekSheet.id).limit(count)]
+    if not employee_emails:
+        raise SystemExit('No generated employees; run datagen.py first')
+
+    admin = runner.login(ADMIN_EMAIL, ADMIN_PASSWORD)
+    employee = runner.login(employee_emails[0], PASSWORD)
+    this_week = [(current_week + timedelta(days=i)).strftime(PERIOD_DATE_FORMAT)
+                 for i in range(DAYS_PER_WEEK)]
+    anonymous = runner.app.test_client()
+    draft_clients = {}
+
+    def draft_client(email):
+        if email not in draft_clients:
+            draft_clients[email] = runner.login(email, PASSWORD)
+        return draft_clients[email]
+
+    yield 'login', [(anonymous, 'POST', '/login',
+                     {'email': employee_emails[i % len(employee_emails)], 'password': PASSWORD})
+                    for i in range(count)]
+    yield 'employee.list_timesheets', [(employee, 'GET', '/employee/timesheets', None)] * count
+    yield 'employee.add_timesheet', [(runner.login(email, PASSWORD), 'POST', '/employee/timesheets/add',
+                                      day_fields(this_week, 'Benchmark add'))
+                                     for email in free_emails]
+    yield 'employee.edit_timesheet (GET)', [(draft_client(email), 'GET',
+                                             f'/employee/timesheets/edit/{id}', None)
+                                            for id, email in drafts]
+    yield 'employee.edit_timesheet (POST)', [(draft_client(email), 'POST',
+                                              f'/employee/timesheets/edit/{id}',
+                                              dict(day_fields(this_week, 'Benchmark edit'), period='-'))
+                                             for id, email in drafts]
+    yield 'admin.list_timesheets', [(admin, 'GET', f'/admin/timesheets?page={1 + i % 10}', None)
+                                    for i in range(count)]
+    yield 'admin.approve_timesheet', [(admin, 'GET', f'/admin/timesheets/approval/{id}/approve', None)
+                                      for id in submitted]
+    yield 'admin.list_employees', [(admin, 'GET', '/admin/employee', None)] * count
+    # the first request builds the reports, the rest are served from the cache
+    yield 'home.admin_dashboard', [(admin, 'GET', '/admin/dashboard', None)] * count
+
+
+def revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', help='URL of an already generated database')
+    parser.add_argument('--employees', type=int, default=500)
+    parser.add_argument('--weeks', type=int, default=26)
+    parser.add_argument('--requests', type=int, default=100, help='per scenario, at most')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ['TEST_DATABASE_URL'] = args.database or 'sqlite:///' + os.path.join(directory, 'bench.db')
+    # time the routes as production runs them, without the stack inspection
+    os.environ.setdefault('LAZY_LOAD_GUARD', 'off')
+    os.chdir(ROOT)
+    # the configuration reads the environment when app is first imported
+    from app import create_app, db
+    from app.util.bootstrap_util import migrate_database, seed_admin
+    from datagen import generate
+
+    # testing turns off CSRF so the runner can post forms
+    app = create_app('testing')
+    dataset = None
+    with app.app_context():
+        migrate_database()
+        seed_admin(ADMIN_EMAIL, 'admin', ADMIN_PASSWORD)
+        if not args.database:
+            dataset = generate(args.employees, args.weeks)
+
+    runner = Runner(app, db)
+    results = {}
+    for name, requests in scenarios(runner, db, args.requests):
+        if requests:
+            results[name] = runner.measure(requests)
+
+    report = {'revision': revision(),
+              'generated_at': datetime.utcnow().isoformat() + 'Z',
+              'python': platform.python_version(),
+              'database': db.get_engine(app).url.drivername,
+              'dataset': dataset,
+              'routes': results}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Measures the cold-start time of create_app() in fresh interpreters.
+
+"current" times create_app() as it is now. "legacy" adds the work create_app()
+used to do on every boot: db.create_all() followed by hashing and inserting
+the admin account. Each sample runs in a new process against a new SQLite
+file, so import and first-connection costs are included.
+
+    python benchmarks/startup.py --runs 10 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE = '''
+import time
+started = time.perf_counter()
+from app import create_app, db
+app = create_app()
+if {legacy!r}:
+    from app.models import Employee
+    with app.app_context():
+        db.create_all()
+        db.session.add(Employee(email="admin@admin.com", username="admin",
+                                password="admin2020", is_admin=True))
+        db.session.commit()
+print(time.perf_counter() - started)
+'''
+
+
+def sample(legacy):
+    with tempfile.TemporaryDirectory() as directory:
+        # the default, production, config refuses to start without a key
+        env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(directory, 'startup.db'),
+                   SECRET_KEY=os.environ.get('SECRET_KEY') or 'benchmark')
+        output = subprocess.check_output([sys.executable, '-c', SAMPLE.format(legacy=legacy)],
+                                         cwd=ROOT, env=env)
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def summarize(samples):
+    return {'runs': len(samples),
+            'min_ms': round(min(samples) * 1000, 2),
+            'median_ms': round(statistics.median(samples) * 1000, 2),
+            'max_ms': round(max(samples) * 1000, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = {name: summarize([sample(legacy) for _ in range(args.runs)])
+               for name, legacy in (('legacy', True), ('current', False))}
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+# Gunicorn settings, see Procfile
+import os
+
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+
+def on_starting(server):
+    # metrics files of a previous run would be added to this one's
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir and os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            if name.startswith('metrics-'):
+                os.remove(os.path.join(metrics_dir, name))
+
+
+def post_fork(server, worker):
+    # with --preload the app was created in the master; give each worker
+    # its own database connections instead of the inherited ones
+    if not server.cfg.preload_app:
+        return
+    from app import db
+    from app.util.db_util import dispose_engine
+    from run import app
+
+    dispose_engine(app, db)
@@ -0,0 +1,92 @@
+"""typed week dates and indexes
+
+Revision ID: 1c7985aea043
+Revises: 32b36c1d60fd
+Create Date: 2026-10-18 09:31:07.562904
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c7985aea043'
+down_revision = '32b36c1d60fd'
+branch_labels = None
+depends_on = None
+
+weeksheet = sa.table('weeksheet',
+                     sa.column('id', sa.Integer),
+                     sa.column('period', sa.String),
+                     sa.column('week_start', sa.Date),
+                     sa.column('week_end', sa.Date))
+
+sheets = sa.table('sheets',
+                  sa.column('id', sa.Integer),
+                  sa.column('date', sa.String),
+                  sa.column('work_date', sa.Date))
+
+
+def _parse_day(value):
+    try:
+        return datetime.strptime(value.strip(), "%d/%m/%Y").date()
+    except (AttributeError, ValueError):
+        return None
+
+
+def _backfill(connection, table, source, targets, batch_size=1000):
+    """Parse the dd/mm/YYYY strings of source into the Date targets"""
+    update = table.update() \
+        .where(table.c.id == sa.bindparam('_id')) \
+        .values({target: sa.bindparam(target) for target in targets})
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select([table.c.id, table.c[source]])
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(batch_size)).fetchall()
+        if not rows:
+            break
+        params = []
+        for row_id, value in rows:
+            days = [_parse_day(part) for part in (value or '').split('-')]
+            if len(days) != len(targets):
+                # not a period (or day) we can read: leave it empty
+                days = [None] * len(targets)
+            params.append(dict(zip(targets, days), _id=row_id))
+        connection.execute(update, params)
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    op.add_column('weeksheet', sa.Column('week_start', sa.Date(), nullable=True))
+    op.add_column('weeksheet', sa.Column('week_end', sa.Date(), nullable=True))
+    op.add_column('sheets', sa.Column('work_date', sa.Date(), nullable=True))
+
+    connection = op.get_bind()
+    _backfill(connection, weeksheet, 'period', ['week_start', 'week_end'])
+    _backfill(connection, sheets, 'date', ['work_date'])
+
+    op.create_index('ix_weeksheet_employee_week', 'weeksheet', ['employee_id', 'week_start'], unique=True)
+    op.create_index(op.f('ix_weeksheet_week_start'), 'weeksheet', ['week_start'], unique=False)
+    op.create_index(op.f('ix_weeksheet_status'), 'weeksheet', ['status'], unique=False)
+    op.create_index(op.f('ix_sheets_weeksheet_id'), 'sheets', ['weeksheet_id'], unique=False)
+    op.create_index(op.f('ix_sheets_work_date'), 'sheets', ['work_date'], unique=False)
+    op.create_index('ix_sheets_status_work_date', 'sheets', ['status', 'work_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_sheets_status_work_date', table_name='sheets')
+    op.drop_index(op.f('ix_sheets_work_date'), table_name='sheets')
+    op.drop_index(op.f('ix_sheets_weeksheet_id'), table_name='sheets')
+    op.drop_index(op.f('ix_weeksheet_status'), table_name='weeksheet')
+    op.drop_index(op.f('ix_weeksheet_week_start'), table_name='weeksheet')
+    op.drop_index('ix_weeksheet_employee_week', table_name='weeksheet')
+    with op.batch_alter_table('sheets') as batch_op:
+        batch_op.drop_column('work_date')
+    with op.batch_alter_table('weeksheet') as batch_op:
+        batch_op.drop_column('week_end')
+        batch_op.drop_column('week_start')
@@ -0,0 +1,50 @@
+"""weeksheet rollups
+
+Revision ID: 4f6c2d9a8b31
+Revises: e51d0b8c7a93
+Create Date: 2026-10-18 17:35:41.207356
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f6c2d9a8b31'
+down_revision = 'e51d0b8c7a93'
+branch_labels = None
+depends_on = None
+
+# timesheet table, its days' table
+TABLES = (('weeksheet', 'sheets'), ('weeksheet_archive', 'sheets_archive'))
+# rollup column: (aggregate over the days, condition on their status code),
+# as in app/util/rollup_util.py
+ROLLUPS = (('day_count', 'count(*)', None),
+           ('total_hours', 'coalesce(sum(workhours), 0)', None),
+           ('approved_hours', 'coalesce(sum(workhours), 0)', 2),
+           ('pending_days', 'count(*)', 1),
+           ('approved_days', 'count(*)', 2),
+           ('rejected_days', 'count(*)', 3))
+
+
+def upgrade():
+    for table, days in TABLES:
+        for column, _, _ in ROLLUPS:
+            op.add_column(table, sa.Column(column, sa.Integer(), server_default='0', nullable=False))
+        # count what is there; from now on the app keeps the counts current
+        values = ', '.join(
+            f'{column} = (SELECT {aggregate} FROM {days} WHERE {days}.weeksheet_id = {table}.id'
+            f"{'' if status is None else f' AND {days}.status = {status}'})"
+            for column, aggregate, status in ROLLUPS)
+        op.execute(f'UPDATE {table} SET {values}')
+
+
+def downgrade():
+    # batch mode would recreate the partial index without its condition
+    op.drop_index('ix_weeksheet_pending', table_name='weeksheet')
+    for table, _ in reversed(TABLES):
+        with op.batch_alter_table(table) as batch_op:
+            for column, _, _ in reversed(ROLLUPS):
+                batch_op.drop_column(column)
+    op.create_index('ix_weeksheet_pending', 'weeksheet', ['week_start', 'id'], unique=False,
+                    postgresql_where=sa.text('status = 1'), sqlite_where=sa.text('status = 1'))
@@ -0,0 +1,26 @@
+"""sheet versions
+
+Revision ID: 53007417ecc4
+Revises: 581d25dbcbcf
+Create Date: 2026-10-18 12:14:40.218311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '53007417ecc4'
+down_revision = '581d25dbcbcf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing days start at version 1
+    op.add_column('sheets', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('sheets') as batch_op:
+        batch_op.drop_column('version')
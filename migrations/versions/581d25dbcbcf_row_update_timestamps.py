@@ -0,0 +1,34 @@
+"""row update timestamps
+
+Revision ID: 581d25dbcbcf
+Revises: 1c7985aea043
+Create Date: 2026-10-18 11:02:51.473120
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '581d25dbcbcf'
+down_revision = '1c7985aea043'
+branch_labels = None
+depends_on = None
+
+TABLES = ('employee', 'weeksheet', 'sheets')
+
+
+def upgrade():
+    now = datetime.utcnow()
+    for table_name in TABLES:
+        op.add_column(table_name, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        table = sa.table(table_name, sa.column('updated_at', sa.DateTime))
+        op.execute(table.update().values(updated_at=now))
+
+
+def downgrade():
+    for table_name in reversed(TABLES):
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_column('updated_at')
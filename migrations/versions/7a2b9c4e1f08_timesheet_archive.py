@@ -0,0 +1,57 @@
+"""timesheet archive
+
+Revision ID: 7a2b9c4e1f08
+Revises: c3f8a61d2e47
+Create Date: 2026-10-18 15:40:12.581903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a2b9c4e1f08'
+down_revision = 'c3f8a61d2e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('weeksheet_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('period', sa.String(length=20), nullable=True),
+    sa.Column('week_start', sa.Date(), nullable=True),
+    sa.Column('week_end', sa.Date(), nullable=True),
+    sa.Column('status', sa.String(length=60), nullable=True),
+    sa.Column('employee_id', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['employee_id'], ['employee.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_weeksheet_archive_employee_id'), 'weeksheet_archive', ['employee_id'], unique=False)
+    op.create_index(op.f('ix_weeksheet_archive_week_start'), 'weeksheet_archive', ['week_start'], unique=False)
+    op.create_table('sheets_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('weeksheet_id', sa.Integer(), nullable=True),
+    sa.Column('date', sa.String(length=20), nullable=True),
+    sa.Column('work_date', sa.Date(), nullable=True),
+    sa.Column('workhours', sa.Integer(), nullable=True),
+    sa.Column('description', sa.String(length=200), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+    sa.ForeignKeyConstraint(['weeksheet_id'], ['weeksheet_archive.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sheets_archive_weeksheet_id'), 'sheets_archive', ['weeksheet_id'], unique=False)
+    op.create_index(op.f('ix_sheets_archive_work_date'), 'sheets_archive', ['work_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_sheets_archive_work_date'), table_name='sheets_archive')
+    op.drop_index(op.f('ix_sheets_archive_weeksheet_id'), table_name='sheets_archive')
+    op.drop_table('sheets_archive')
+    op.drop_index(op.f('ix_weeksheet_archive_week_start'), table_name='weeksheet_archive')
+    op.drop_index(op.f('ix_weeksheet_archive_employee_id'), table_name='weeksheet_archive')
+    op.drop_table('weeksheet_archive')
@@ -0,0 +1,33 @@
+"""table versions
+
+Revision ID: a9e4b7c2d610
+Revises: f2a7c5d09e16
+Create Date: 2026-10-18 21:36:05.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9e4b7c2d610'
+down_revision = 'f2a7c5d09e16'
+branch_labels = None
+depends_on = None
+
+# the tables whose writers bump their version; the first bump of any
+# other table adds its row
+TABLES = ('employee', 'departments', 'roles', 'weeksheet', 'sheets', 'weekly_hours')
+
+
+def upgrade():
+    table_versions = op.create_table('table_versions',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(table_versions, [{'name': name, 'version': 0} for name in TABLES])
+
+
+def downgrade():
+    op.drop_table('table_versions')
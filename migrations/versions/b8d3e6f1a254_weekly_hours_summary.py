@@ -0,0 +1,64 @@
+"""weekly hours summary
+
+Revision ID: b8d3e6f1a254
+Revises: 4f6c2d9a8b31
+Create Date: 2026-10-18 19:02:17.664120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d3e6f1a254'
+down_revision = '4f6c2d9a8b31'
+branch_labels = None
+depends_on = None
+
+# timesheet table, its days' table
+TABLES = (('weeksheet', 'sheets'), ('weeksheet_archive', 'sheets_archive'))
+# summary column: status code of the days it sums, as in app/util/summary_util.py
+HOURS_BY_STATUS = (('not_submitted_hours', 0), ('submitted_hours', 1),
+                   ('approved_hours', 2), ('rejected_hours', 3))
+
+
+def upgrade():
+    op.create_table('weekly_hours',
+    sa.Column('employee_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('week_start', sa.Date(), nullable=False),
+    sa.Column('department_id', sa.Integer(), nullable=True),
+    sa.Column('role_id', sa.Integer(), nullable=True),
+    sa.Column('days', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('total_hours', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('not_submitted_hours', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('submitted_hours', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('approved_hours', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('rejected_hours', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['employee_id'], ['employee.id'], ),
+    sa.PrimaryKeyConstraint('employee_id', 'week_start')
+    )
+    op.create_index('ix_weekly_hours_department_week', 'weekly_hours', ['department_id', 'week_start'], unique=False)
+    op.create_index('ix_weekly_hours_role_week', 'weekly_hours', ['role_id', 'week_start'], unique=False)
+    op.create_index('ix_weekly_hours_week', 'weekly_hours', ['week_start'], unique=False)
+
+    # sum what is there; from now on the app keeps the rows current
+    by_status = ', '.join(f'coalesce(sum(CASE WHEN s.status = {status} THEN s.workhours ELSE 0 END), 0)'
+                          for _, status in HOURS_BY_STATUS)
+    for weeksheet, sheets in TABLES:
+        op.execute(
+            'INSERT INTO weekly_hours (employee_id, week_start, department_id, role_id, days, total_hours, '
+            f"{', '.join(column for column, _ in HOURS_BY_STATUS)}, updated_at) "
+            'SELECT w.employee_id, w.week_start, e.department_id, e.role_id, count(s.id), '
+            f'coalesce(sum(s.workhours), 0), {by_status}, CURRENT_TIMESTAMP '
+            f'FROM {weeksheet} w JOIN employee e ON e.id = w.employee_id '
+            f'LEFT OUTER JOIN {sheets} s ON s.weeksheet_id = w.id '
+            'WHERE w.week_start IS NOT NULL '
+            'GROUP BY w.id, w.employee_id, w.week_start, e.department_id, e.role_id')
+
+
+def downgrade():
+    op.drop_index('ix_weekly_hours_week', table_name='weekly_hours')
+    op.drop_index('ix_weekly_hours_role_week', table_name='weekly_hours')
+    op.drop_index('ix_weekly_hours_department_week', table_name='weekly_hours')
+    op.drop_table('weekly_hours')
@@ -0,0 +1,75 @@
+"""full text search
+
+Revision ID: c3f8a61d2e47
+Revises: 9e4d21c7b5a0
+Create Date: 2026-10-18 14:21:53.330716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8a61d2e47'
+down_revision = '9e4d21c7b5a0'
+branch_labels = None
+depends_on = None
+
+# the columns searched in each table, as in app/util/search_util.py
+SEARCH_COLUMNS = {
+    'sheets': ('description',),
+    'employee': ('first_name', 'last_name', 'username', 'email'),
+    'departments': ('name', 'description'),
+    'roles': ('name', 'description'),
+}
+
+
+def create_sqlite_index(table, columns):
+    # an external content FTS5 table: the index only, kept in step with
+    # the table by triggers, the text itself is read from the table
+    index = f'{table}_fts'
+    names = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    op.execute(f"CREATE VIRTUAL TABLE {index} USING fts5({names}, content='{table}', "
+               f"content_rowid='id', tokenize='porter unicode61')")
+    op.execute(f"CREATE TRIGGER {index}_insert AFTER INSERT ON {table} BEGIN "
+               f"INSERT INTO {index}(rowid, {names}) VALUES (new.id, {new}); END")
+    op.execute(f"CREATE TRIGGER {index}_delete AFTER DELETE ON {table} BEGIN "
+               f"INSERT INTO {index}({index}, rowid, {names}) VALUES ('delete', old.id, {old}); END")
+    op.execute(f"CREATE TRIGGER {index}_update AFTER UPDATE OF {names} ON {table} BEGIN "
+               f"INSERT INTO {index}({index}, rowid, {names}) VALUES ('delete', old.id, {old}); "
+               f"INSERT INTO {index}(rowid, {names}) VALUES (new.id, {new}); END")
+    op.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+
+def drop_sqlite_index(table):
+    index = f'{table}_fts'
+    for trigger in ('insert', 'delete', 'update'):
+        op.execute(f'DROP TRIGGER IF EXISTS {index}_{trigger}')
+    op.execute(f'DROP TABLE IF EXISTS {index}')
+
+
+def postgresql_document(columns):
+    return "to_tsvector('english', {})".format(
+        " || ' ' || ".join(f"coalesce({column}, '')" for column in columns))
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for table, columns in SEARCH_COLUMNS.items():
+        if dialect == 'sqlite':
+            create_sqlite_index(table, columns)
+        elif dialect == 'postgresql':
+            # an expression index needs no triggers: PostgreSQL keeps it current
+            op.execute(f'CREATE INDEX ix_{table}_search ON {table} '
+                       f'USING gin ({postgresql_document(columns)})')
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table in SEARCH_COLUMNS:
+        if dialect == 'sqlite':
+            drop_sqlite_index(table)
+        elif dialect == 'postgresql':
+            op.execute(f'DROP INDEX IF EXISTS ix_{table}_search')
@@ -0,0 +1,29 @@
+"""job heartbeat
+
+Revision ID: c5f1d8e3a7b2
+Revises: a9e4b7c2d610
+Create Date: 2026-10-18 22:04:51.630917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5f1d8e3a7b2'
+down_revision = 'a9e4b7c2d610'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+    # jobs running now count as alive since they started
+    op.execute('UPDATE jobs SET heartbeat_at = started_at WHERE heartbeat_at IS NULL')
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_column('heartbeat_at')
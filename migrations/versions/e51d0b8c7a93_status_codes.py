@@ -0,0 +1,69 @@
+"""status codes
+
+Revision ID: e51d0b8c7a93
+Revises: 7a2b9c4e1f08
+Create Date: 2026-10-18 16:52:08.113482
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e51d0b8c7a93'
+down_revision = '7a2b9c4e1f08'
+branch_labels = None
+depends_on = None
+
+# the labels stored so far and their codes, as in app/util/status_util.py
+STATUS_CODES = (('Not Submitted', 0), ('Submitted', 1), ('Approved', 2), ('Rejected', 3))
+TABLES = (('weeksheet', sa.String(length=60), False),
+          ('sheets', sa.String(), False),
+          ('weeksheet_archive', sa.String(length=60), True),
+          ('sheets_archive', sa.String(), True))
+
+
+def recreate_sheets_search_triggers():
+    # SQLite drops the triggers of a table that batch mode recreates
+    new, old = 'new.description', 'old.description'
+    op.execute('CREATE TRIGGER sheets_fts_insert AFTER INSERT ON sheets BEGIN '
+               f'INSERT INTO sheets_fts(rowid, description) VALUES (new.id, {new}); END')
+    op.execute('CREATE TRIGGER sheets_fts_delete AFTER DELETE ON sheets BEGIN '
+               f"INSERT INTO sheets_fts(sheets_fts, rowid, description) VALUES ('delete', old.id, {old}); END")
+    op.execute('CREATE TRIGGER sheets_fts_update AFTER UPDATE OF description ON sheets BEGIN '
+               f"INSERT INTO sheets_fts(sheets_fts, rowid, description) VALUES ('delete', old.id, {old}); "
+               f'INSERT INTO sheets_fts(rowid, description) VALUES (new.id, {new}); END')
+
+
+def upgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    encode = ' '.join(f"WHEN '{label}' THEN '{code}'" for label, code in STATUS_CODES)
+    with op.batch_alter_table('weeksheet') as batch_op:
+        batch_op.drop_index('ix_weeksheet_status')
+    for table, string_type, nullable in TABLES:
+        # unknown or missing labels become drafts
+        op.execute(f'UPDATE {table} SET status = CASE status {encode} ELSE '
+                   f"{'NULL' if nullable else repr('0')} END")
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('status', existing_type=string_type, type_=sa.SmallInteger(),
+                                  nullable=nullable, server_default=None if nullable else '0',
+                                  postgresql_using='status::smallint')
+    if sqlite:
+        recreate_sheets_search_triggers()
+    op.create_index('ix_weeksheet_pending', 'weeksheet', ['week_start', 'id'], unique=False,
+                    postgresql_where=sa.text('status = 1'), sqlite_where=sa.text('status = 1'))
+
+
+def downgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    decode = ' '.join(f"WHEN '{code}' THEN '{label}'" for label, code in STATUS_CODES)
+    op.drop_index('ix_weeksheet_pending', table_name='weeksheet')
+    for table, string_type, nullable in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('status', existing_type=sa.SmallInteger(), type_=string_type,
+                                  nullable=True, server_default=None,
+                                  postgresql_using='status::varchar')
+        op.execute(f'UPDATE {table} SET status = CASE status {decode} ELSE status END')
+    if sqlite:
+        recreate_sheets_search_triggers()
+    op.create_index('ix_weeksheet_status', 'weeksheet', ['status'], unique=False)
@@ -0,0 +1,129 @@
+import atexit
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+
+from flask import g
+from flask.testing import FlaskClient
+from flask_testing import TestCase
+
+from app import analytics_cache, create_app, db, fragment_cache, lookup_cache, user_cache
+from app.config import TestingConfig
+from app.models import Department, Employee, Role, Sheet, WeekSheet
+from app.util.bootstrap_util import migrate_database, seed_admin
+from app.util.status_util import Status
+from app.util.token_util import revoked_tokens
+from app.util.week_util import week_calendar
+
+ADMIN_EMAIL, ADMIN_PASSWORD = 'admin@example.com', 'admin2020'
+PASSWORD = 'secret'
+# the Monday of the week the timesheets are added for by default
+WEEK = date(2025, 6, 2)
+
+# a database migrated to the latest revision, copied for every test: the
+# migrations, not create_all(), build the full text search tables
+_migrated = None
+
+
+def migrated_database():
+    global _migrated
+    if _migrated is None:
+        directory = tempfile.mkdtemp(prefix='kaarya-tests-')
+        atexit.register(shutil.rmtree, directory, True)
+        _migrated = os.path.join(directory, 'migrated.db')
+        TestingConfig.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + _migrated
+        with create_app('testing').app_context():
+            migrate_database()
+    return _migrated
+
+
+class RequestClient(FlaskClient):
+    """
+    A test client starting every request with a new session and lazy load
+    guard. The requests share the test's app context, which would carry
+    both over; in production each request has an app context of its own.
+    """
+
+    def open(self, *args, **kwargs):
+        db.session.remove()
+        g.pop('lazy_load_sites', None)
+        try:
+            return super().open(*args, **kwargs)
+        finally:
+            db.session.remove()
+
+
+class BaseTestCase(TestCase):
+    """
+    An app under TestingConfig with a database of its own, holding only
+    an admin. The caches are module level, so they are emptied for every
+    test: ids and data versions start over with the database. Requests
+    start from a new session, so the helpers return ids rather than rows.
+    """
+
+    def create_app(self):
+        self.database = tempfile.mktemp(suffix='.db', dir=os.path.dirname(migrated_database()))
+        shutil.copyfile(migrated_database(), self.database)
+        TestingConfig.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + self.database
+        app = create_app('testing')
+        app.test_client_class = RequestClient
+        return app
+
+    def setUp(self):
+        for cache in (user_cache, lookup_cache, analytics_cache, fragment_cache.local):
+            cache.clear()
+        revoked_tokens.clear()
+        self.admin_id = seed_admin(ADMIN_EMAIL, 'admin', ADMIN_PASSWORD).id
+
+    def tearDown(self):
+        db.session.remove()
+        db.engine.dispose()
+        os.remove(self.database)
+
+    def login(self, name=None):
+        """Log in as the employee added as name, or as the admin"""
+        email, password = (f'{name}@example.com', PASSWORD) if name else (ADMIN_EMAIL, ADMIN_PASSWORD)
+        self.client.get('/logout')
+        response = self.client.post('/login', data={'email': email, 'password': password})
+        self.assertStatus(response, 302)
+        return response
+
+    def assertFlashed(self, message):
+        # assertMessageFlashed of Flask-Testing 0.6.1 only reads the first
+        self.assertIn(message, [flashed for flashed, _ in self.flashed_messages])
+
+    def add_employee(self, name, department_id=None, role_id=None):
+        employee = Employee(email=f'{name}@example.com', username=name, first_name=name.title(),
+                            last_name='Tester', password=PASSWORD,
+                            department_id=department_id, role_id=role_id)
+        db.session.add(employee)
+        db.session.commit()
+        return employee.id
+
+    def add_lookups(self):
+        department, role = Department(name='Engineering'), Role(name='Developer')
+        db.session.add_all([department, role])
+        db.session.commit()
+        return department.id, role.id
+
+    def add_timesheet(self, employee_id, week_start=WEEK, status=Status.NOT_SUBMITTED, workhours=8):
+        """A timesheet of the work days of a week, workhours each, all in status"""
+        week = week_calendar(week_start)
+        timesheet = WeekSheet(employee_id=employee_id, period=week.period, status=status,
+                              week_start=week.start, week_end=week.end)
+        timesheet.sheets = [Sheet(date=date_string, work_date=day, workhours=workhours,
+                                  description='Work', status=status)
+                            for day, date_string in zip(week.days, week.dates)]
+        db.session.add(timesheet)
+        db.session.commit()
+        return timesheet.id
+
+    def add_weeks(self, employee_id, weeks, status=Status.NOT_SUBMITTED):
+        """Timesheets of weeks weeks up to WEEK, the latest first"""
+        return [self.add_timesheet(employee_id, WEEK - timedelta(weeks=week), status)
+                for week in range(weeks)]
+
+    def sheet_ids(self, timesheet_id):
+        return [id for id, in db.session.query(Sheet.id).filter(Sheet.weeksheet_id == timesheet_id)
+                .order_by(Sheet.work_date)]
@@ -0,0 +1,79 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import db
+from app.employee.forms import MAX_WEEKS
+from app.models import ArchivedWeekSheet, Sheet, WeekSheet
+from app.util.status_util import Status
+from app.util.week_util import current_week
+from tests.base import WEEK, BaseTestCase
+
+
+class AddWeeksTestCase(BaseTestCase):
+    """Filling in several weeks of timesheets at once"""
+
+    def setUp(self):
+        super().setUp()
+        self.employee_id = self.add_employee('ann')
+        self.login('ann')
+
+    def add(self, weeks, first_week=WEEK, **data):
+        data = dict(dict(first_week=first_week.isoformat(), weeks=weeks, workhours=7, description='Leave',
+                         save='Save'), **data)
+        return self.client.post('/employee/timesheets/add/weeks', data=data)
+
+    def weeks(self):
+        return db.session.query(WeekSheet.week_start, WeekSheet.status) \
+            .filter(WeekSheet.employee_id == self.employee_id).order_by(WeekSheet.week_start).all()
+
+    def test_form_starts_at_the_current_week(self):
+        response = self.client.get('/employee/timesheets/add/weeks')
+        self.assert200(response)
+        self.assertIn(f'value="{current_week().start.isoformat()}"', response.data.decode())
+
+    def test_weeks_added(self):
+        # any day picks its week
+        response = self.add(3, WEEK + timedelta(days=3))
+        self.assertRedirects(response, '/employee/timesheets')
+        self.assertFlashed('3 timesheets added, 0 weeks already had one.')
+        self.assertEqual(self.weeks(), [(WEEK + timedelta(weeks=week), Status.NOT_SUBMITTED) for week in range(3)])
+        days = db.session.query(Sheet.work_date, Sheet.workhours, Sheet.description, Sheet.status) \
+            .join(WeekSheet, Sheet.weeksheet_id == WeekSheet.id) \
+            .filter(WeekSheet.week_start == WEEK).order_by(Sheet.work_date).all()
+        self.assertEqual(days, [(WEEK + timedelta(days=day), 7, 'Leave', Status.NOT_SUBMITTED) for day in range(5)])
+
+    def test_weeks_submitted(self):
+        self.add(2, submit='Submit', save='')
+        self.assertEqual([status for _, status in self.weeks()], [Status.SUBMITTED] * 2)
+
+    def test_weeks_with_a_timesheet_are_skipped(self):
+        kept_id = self.add_timesheet(self.employee_id, WEEK + timedelta(weeks=1), Status.APPROVED)
+        db.session.add(ArchivedWeekSheet(id=1000, employee_id=self.employee_id, status=Status.APPROVED,
+                                         week_start=WEEK + timedelta(weeks=3),
+                                         week_end=WEEK + timedelta(weeks=3, days=6),
+                                         archived_at=datetime.utcnow()))
+        db.session.commit()
+
+        self.add(4)
+        self.assertFlashed('2 timesheets added, 2 weeks already had one.')
+        self.assertEqual(self.weeks(), [(WEEK, Status.NOT_SUBMITTED),
+                                        (WEEK + timedelta(weeks=1), Status.APPROVED),
+                                        (WEEK + timedelta(weeks=2), Status.NOT_SUBMITTED)])
+        self.assertEqual(db.session.query(Sheet.workhours).filter(Sheet.weeksheet_id == kept_id).distinct().all(),
+                         [(8,)])
+
+    def test_limits(self):
+        self.add(MAX_WEEKS + 1)
+        self.assertFlashed(f'Error in the Number of weeks field - Number must be between 1 and {MAX_WEEKS}.')
+        self.add(1, workhours=25)
+        self.assertFlashed('Error in the Workhours per day field - Number must be between 1 and 24.')
+        self.assertEqual(self.weeks(), [])
+
+    def test_other_employees_weeks_do_not_count(self):
+        self.add_timesheet(self.add_employee('bob'))
+        self.add(1)
+        self.assertFlashed('1 timesheets added, 0 weeks already had one.')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from datetime import timedelta
+
+from werkzeug.http import http_date
+
+from app import db
+from app.models import Employee, Sheet
+from tests.base import WEEK, BaseTestCase
+
+
+class ApiCachingTestCase(BaseTestCase):
+    """Conditional GETs of the API answered with 304 while nothing changed"""
+
+    def setUp(self):
+        super().setUp()
+        self.employee_id = self.add_employee('ann')
+        self.timesheet_id = self.add_timesheet(self.employee_id)
+        self.login('ann')
+
+    def get(self, url, **headers):
+        return self.client.get('/api/v1' + url, headers=headers)
+
+    def test_validators(self):
+        response = self.get(f'/employees/{self.employee_id}')
+        self.assert200(response)
+        self.assertTrue(response.headers['ETag'])
+        self.assertTrue(response.headers['Last-Modified'])
+        self.assertEqual(set(response.headers['Cache-Control'].split(', ')), {'private', 'no-cache'})
+
+    def test_if_none_match(self):
+        etag = self.get(f'/employees/{self.employee_id}').headers['ETag']
+        response = self.get(f'/employees/{self.employee_id}', If_None_Match=etag)
+        self.assertStatus(response, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers['ETag'], etag)
+
+        employee = Employee.query.get(self.employee_id)
+        employee.first_name = 'Anne'
+        db.session.commit()
+        response = self.get(f'/employees/{self.employee_id}', If_None_Match=etag)
+        self.assert200(response)
+        self.assertEqual(response.json['first_name'], 'Anne')
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_if_modified_since(self):
+        last_modified = self.get(f'/employees/{self.employee_id}').headers['Last-Modified']
+        self.assertStatus(self.get(f'/employees/{self.employee_id}', If_Modified_Since=last_modified), 304)
+        updated_at = Employee.query.get(self.employee_id).updated_at
+        earlier = http_date(updated_at - timedelta(seconds=1))
+        self.assert200(self.get(f'/employees/{self.employee_id}', If_Modified_Since=earlier))
+        # a stale ETag wins over a matching date
+        self.assert200(self.get(f'/employees/{self.employee_id}', If_None_Match='"stale"',
+                                If_Modified_Since=last_modified))
+
+    def test_etag_per_query_and_employee(self):
+        etag = self.get('/weeksheets').headers['ETag']
+        self.assertNotEqual(self.get('/weeksheets?fields=id').headers['ETag'], etag)
+        self.login()
+        self.assertNotEqual(self.get('/weeksheets').headers['ETag'], etag)
+
+    def test_collection_changes(self):
+        etag = self.get('/weeksheets').headers['ETag']
+        self.assertStatus(self.get('/weeksheets', If_None_Match=etag), 304)
+        self.add_timesheet(self.employee_id, WEEK - timedelta(weeks=1))
+        response = self.get('/weeksheets', If_None_Match=etag)
+        self.assert200(response)
+        self.assertEqual(len(response.json['data']), 2)
+
+    def test_weeksheet_changes_with_its_days(self):
+        url = f'/weeksheets/{self.timesheet_id}'
+        etag = self.get(url).headers['ETag']
+        self.assertStatus(self.get(url, If_None_Match=etag), 304)
+        sheet = Sheet.query.get(self.sheet_ids(self.timesheet_id)[0])
+        sheet.workhours = 4
+        db.session.commit()
+        response = self.get(url, If_None_Match=etag)
+        self.assert200(response)
+        self.assertEqual(response.json['sheets'][0]['workhours'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from datetime import date, timedelta
+
+from click.testing import CliRunner
+from flask.cli import ScriptInfo
+
+from app import db
+from app.models import ArchivedSheet, ArchivedWeekSheet, Sheet, WeekSheet
+from app.util.archive_util import archive_timesheets, purge_orphans, retention_cutoff
+from app.util.export_util import approved_hours
+from app.util.status_util import Status
+from tests.base import WEEK, BaseTestCase
+
+
+class ArchiveTestCase(BaseTestCase):
+    """Moving old approved timesheets to the archive tables, and purging orphaned days"""
+
+    def setUp(self):
+        super().setUp()
+        self.employee_id = self.add_employee('ann')
+        # the latest week first
+        self.approved = self.add_weeks(self.employee_id, 3, Status.APPROVED)
+        self.submitted_id = self.add_timesheet(self.employee_id, WEEK - timedelta(weeks=3), Status.SUBMITTED)
+
+    def hot_ids(self):
+        return sorted(id for id, in db.session.query(WeekSheet.id))
+
+    def archived_ids(self):
+        return sorted(id for id, in db.session.query(ArchivedWeekSheet.id))
+
+    def cli(self, *args):
+        result = CliRunner().invoke(self.app.cli, args, obj=ScriptInfo(create_app=lambda info: self.app))
+        self.assertEqual(result.exit_code, 0, result.output)
+        return result.output
+
+    def test_retention_cutoff(self):
+        self.assertEqual(retention_cutoff(24, date(2025, 6, 18)), date(2023, 6, 1))
+        self.assertEqual(retention_cutoff(6, date(2025, 3, 31)), date(2024, 9, 1))
+        self.assertEqual(retention_cutoff(0, date(2025, 1, 1)), date(2025, 1, 1))
+
+    def test_approved_weeks_ended_before_the_cutoff_move(self):
+        sheet_ids = self.sheet_ids(self.approved[1]) + self.sheet_ids(self.approved[2])
+        # the week of approved[1] ends on the Sunday before WEEK
+        self.assertEqual(archive_timesheets(WEEK, batch_size=1), (2, 10))
+        self.assertEqual(self.hot_ids(), sorted([self.approved[0], self.submitted_id]))
+        self.assertEqual(self.archived_ids(), sorted(self.approved[1:]))
+        self.assertEqual(sorted(id for id, in db.session.query(ArchivedSheet.id)), sorted(sheet_ids))
+        self.assertEqual(Sheet.query.filter(Sheet.id.in_(sheet_ids)).count(), 0)
+
+        archived = db.session.query(ArchivedWeekSheet.employee_id, ArchivedWeekSheet.week_start,
+                                    ArchivedWeekSheet.status, ArchivedWeekSheet.total_hours,
+                                    ArchivedWeekSheet.approved_days) \
+            .filter(ArchivedWeekSheet.id == self.approved[1]).one()
+        self.assertEqual(archived, (self.employee_id, WEEK - timedelta(weeks=1), Status.APPROVED, 40, 5))
+        self.assertIsNotNone(db.session.query(ArchivedWeekSheet.archived_at)
+                             .filter(ArchivedWeekSheet.id == self.approved[1]).scalar())
+
+        # nothing left to move
+        self.assertEqual(archive_timesheets(WEEK), (0, 0))
+
+    def test_export_includes_archived_days(self):
+        start, end = WEEK - timedelta(weeks=2), WEEK + timedelta(days=6)
+        before = [(row['sheet_id'], row['date']) for row in approved_hours(start, end, batch_size=4)]
+        self.assertEqual(len(before), 15)
+        archive_timesheets(WEEK)
+        self.assertEqual([(row['sheet_id'], row['date']) for row in approved_hours(start, end, batch_size=4)],
+                         before)
+
+    def test_purge_orphans(self):
+        archive_timesheets(WEEK)
+        kept = Sheet.query.count() + ArchivedSheet.query.count()
+        # deleted without the relationship's cascade, and a day never attached
+        WeekSheet.query.filter(WeekSheet.id == self.submitted_id).delete(synchronize_session=False)
+        ArchivedWeekSheet.query.filter(ArchivedWeekSheet.id == self.approved[2]) \
+            .delete(synchronize_session=False)
+        db.session.add(Sheet(work_date=WEEK, workhours=1, description='Lost', status=Status.NOT_SUBMITTED))
+        db.session.commit()
+
+        self.assertEqual(purge_orphans(batch_size=2), (6, 5))
+        self.assertEqual(Sheet.query.count() + ArchivedSheet.query.count(), kept - 10)
+        self.assertEqual(purge_orphans(), (0, 0))
+
+    def test_commands(self):
+        self.app.config['ARCHIVE_AFTER_MONTHS'] = 0
+        cutoff = retention_cutoff(0)
+        self.assertEqual(self.cli('archive-timesheets', '--dry-run'),
+                         f'3 timesheets of weeks ending before {cutoff} are due for archiving.\n')
+        self.assertEqual(self.archived_ids(), [])
+        self.assertEqual(self.cli('archive-timesheets', '--months', '0'),
+                         f'Archived 3 timesheets (15 days) of weeks ending before {cutoff}.\n')
+        self.assertEqual(self.hot_ids(), [self.submitted_id])
+        self.assertEqual(self.cli('purge-orphans'), 'Purged 0 orphaned days and 0 orphaned archived days.\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
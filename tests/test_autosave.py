@@ -0,0 +1,87 @@
+import json
+import unittest
+
+from sqlalchemy.orm.exc import StaleDataError
+
+from app import db
+from app.models import Sheet, WeekSheet
+from app.util.status_util import Status
+from tests.base import BaseTestCase
+
+
+class AutosaveTestCase(BaseTestCase):
+    """Saving one day with the version it was read at, and the conflicts"""
+
+    def setUp(self):
+        super().setUp()
+        self.employee_id = self.add_employee('ann')
+        self.timesheet_id = self.add_timesheet(self.employee_id)
+        self.sheet_id = self.sheet_ids(self.timesheet_id)[0]
+        self.login('ann')
+
+    def patch(self, sheet_id, **body):
+        response = self.client.open(f'/employee/timesheets/sheet/{sheet_id}', method='PATCH',
+                                    data=json.dumps(body), content_type='application/json')
+        return response.status_code, response.json
+
+    def test_saves_the_version_it_read(self):
+        self.assertEqual(self.patch(self.sheet_id, version=1, workhours=6, description='Review'),
+                         (200, {'id': self.sheet_id, 'version': 2}))
+        sheet = Sheet.query.get(self.sheet_id)
+        self.assertEqual((sheet.workhours, sheet.description, sheet.version), (6, 'Review', 2))
+
+    def test_stale_version_conflicts(self):
+        self.patch(self.sheet_id, version=1, workhours=6)
+        status, body = self.patch(self.sheet_id, version=1, workhours=7)
+        self.assertEqual(status, 409)
+        self.assertEqual(body['current'], {'version': 2, 'workhours': 6, 'description': 'Work'})
+        self.assertEqual(Sheet.query.get(self.sheet_id).workhours, 6)
+
+    def test_submitted_timesheet_conflicts(self):
+        self.client.get(f'/employee/timesheets/view/{self.timesheet_id}/submit')
+        status, body = self.patch(self.sheet_id, version=2, workhours=6)
+        self.assertEqual(status, 409)
+        self.assertEqual(body['error'], 'This timesheet is submitted and can no longer be edited')
+
+    def test_approved_day_of_rejected_timesheet_conflicts(self):
+        approved, rejected = self.sheet_ids(self.timesheet_id)[:2]
+        Sheet.query.filter(Sheet.id == approved).update({Sheet.status: Status.APPROVED})
+        Sheet.query.filter(Sheet.id == rejected).update({Sheet.status: Status.REJECTED})
+        WeekSheet.query.filter(WeekSheet.id == self.timesheet_id).update({WeekSheet.status: Status.REJECTED})
+        db.session.commit()
+        status, body = self.patch(approved, version=1, workhours=6)
+        self.assertEqual((status, body['error']), (409, 'This day is approved and can no longer be edited'))
+        self.assertEqual(self.patch(rejected, version=1, workhours=6)[0], 200)
+
+    def test_other_employees_day_is_forbidden(self):
+        self.add_employee('bob')
+        self.login('bob')
+        self.assertEqual(self.patch(self.sheet_id, version=1, workhours=6)[0], 403)
+        self.assertEqual(Sheet.query.get(self.sheet_id).workhours, 8)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.patch(self.sheet_id, workhours=6)[0], 400)
+        self.assertEqual(self.patch(self.sheet_id, version=1, workhours=0)[0], 400)
+        self.assertEqual(self.patch(self.sheet_id, version=1)[0], 400)
+        self.assertEqual(self.patch(0, version=1, workhours=6)[0], 404)
+
+    def test_csrf_token_required(self):
+        self.app.config['WTF_CSRF_ENABLED'] = True
+        status, body = self.patch(self.sheet_id, version=1, workhours=6)
+        self.assertEqual((status, body['error']), (400, 'Missing or invalid CSRF token'))
+
+    def test_edit_of_a_day_changed_meanwhile_fails(self):
+        # a session of its own: every request starts with a new one
+        session = db.create_scoped_session()
+        sheet = session.query(Sheet).get(self.sheet_id)
+        # another request saves the day after this one read it
+        self.assertEqual(self.patch(self.sheet_id, version=1, workhours=6)[0], 200)
+        sheet.workhours = 9
+        with self.assertRaises(StaleDataError):
+            session.commit()
+        session.remove()
+        self.assertEqual(Sheet.query.get(self.sheet_id).workhours, 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
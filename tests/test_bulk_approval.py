@@ -0,0 +1,90 @@
+import json
+import unittest
+from datetime import timedelta
+
+from app.models import Job, WeekSheet
+from app.util.job_util import work
+from app.util.status_util import Status
+from tests.base import WEEK, BaseTestCase
+
+
+class BulkApprovalTestCase(BaseTestCase):
+    """
+    Deciding many submitted timesheets at once: the ids checked in the
+    queue right away, a department or week by a background job
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.department_id, role_id = self.add_lookups()
+        self.ann_weeks = self.add_weeks(self.add_employee('ann', self.department_id, role_id), 2,
+                                        Status.SUBMITTED)
+        self.bob_weeks = self.add_weeks(self.add_employee('bob'), 2, Status.SUBMITTED)
+        self.login()
+
+    def bulk(self, decision='approve', **data):
+        data.setdefault('department', 0)
+        data[decision] = decision.title()
+        return self.client.post('/admin/timesheets/approval/bulk', data=data)
+
+    def statuses(self):
+        return {id: status for id, status in WeekSheet.query.with_entities(WeekSheet.id, WeekSheet.status)}
+
+    def assertDecided(self, ids, status):
+        self.assertEqual({id for id, decided in self.statuses().items() if decided == status}, set(ids))
+
+    def test_ids(self):
+        response = self.bulk('reject', ids=[self.ann_weeks[0], self.bob_weeks[1]])
+        self.assertRedirects(response, '/admin/timesheets')
+        self.assertFlashed('2 timesheets (10 days) Rejected.')
+        self.assertDecided([self.ann_weeks[0], self.bob_weeks[1]], Status.REJECTED)
+        self.assertEqual(Job.query.count(), 0)
+
+    def test_ids_as_json(self):
+        response = self.client.post('/admin/timesheets/approval/bulk', headers={'Accept': 'application/json'},
+                                    data={'ids': self.bob_weeks, 'department': 0, 'approve': 'Approve'})
+        self.assertEqual(response.json, {'status': 'Approved', 'timesheets': 2, 'sheets': 10})
+
+    def test_department_is_decided_by_a_job(self):
+        response = self.bulk(department=self.department_id)
+        job = Job.query.one()
+        self.assertRedirects(response, f'/admin/jobs/{job.id}')
+        self.assertFlashed(f'Queued: Approved timesheets, job {job.id}.')
+        self.assertEqual((job.kind, job.status, job.created_by), ('decide_timesheets', 'queued', self.admin_id))
+        self.assertEqual(json.loads(job.arguments),
+                         {'decision': 'approve', 'ids': [], 'department': self.department_id, 'week': None})
+        # nothing is decided until a worker runs the job
+        self.assertDecided([], Status.APPROVED)
+
+        self.assertEqual(work(self.app, burst=True), 1)
+        self.assertDecided(self.ann_weeks, Status.APPROVED)
+        self.assertEqual(json.loads(Job.query.one().result),
+                         {'status': 'Approved', 'timesheets': 2, 'sheets': 10})
+
+    def test_week_is_decided_by_a_job(self):
+        # any day of the week picks the week
+        response = self.client.post('/admin/timesheets/approval/bulk', headers={'Accept': 'application/json'},
+                                    data={'department': 0, 'week': (WEEK + timedelta(days=2)).isoformat(),
+                                          'reject': 'Reject'})
+        self.assertStatus(response, 202)
+        job = Job.query.one()
+        self.assertEqual(response.headers['Location'], f'http://localhost/api/v1/jobs/{job.id}')
+        self.assertEqual(response.json, {'id': job.id, 'kind': 'decide_timesheets', 'status': 'queued',
+                                         'url': f'/api/v1/jobs/{job.id}'})
+
+        work(self.app, burst=True)
+        self.assertDecided([self.ann_weeks[0], self.bob_weeks[0]], Status.REJECTED)
+
+    def test_department_and_week(self):
+        self.bulk(department=self.department_id, week=(WEEK - timedelta(weeks=1)).isoformat())
+        work(self.app, burst=True)
+        self.assertDecided([self.ann_weeks[1]], Status.APPROVED)
+
+    def test_nothing_picked(self):
+        self.assertRedirects(self.bulk(), '/admin/timesheets')
+        self.assertFlashed('Select timesheets, a department or a week to decide on.')
+        self.assertEqual(Job.query.count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+from app.models import WeekSheet, WeeklyHours
+from app.util.analytics_util import _rebuilding, build_reports
+from app.util.fragment_util import invalidate_tables
+from app.util.status_util import Status
+from tests.base import WEEK, BaseTestCase
+
+
+class DashboardTestCase(BaseTestCase):
+    """The range of weeks the admin dashboard reports on"""
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+
+    def assertRange(self, query, error=None):
+        self.assert200(self.client.get('/admin/dashboard' + query))
+        errors = [message for message, category in self.flashed_messages if category == 'error']
+        self.assertEqual(errors, [error] if error else [])
+
+    def test_default_range(self):
+        self.assertRange('')
+        self.assertRange('?start=2026-01-05&end=2026-06-01')
+
+    def test_range_limited_with_one_date_given(self):
+        self.assertRange('?start=1900-01-01', 'Error in the From field - Pick at most three years.')
+
+    def test_range_limited_with_the_end_given(self):
+        self.assertRange('?end=2100-01-04', 'Error in the To field - Pick at most three years.')
+
+    def test_end_before_start(self):
+        self.assertRange('?start=2026-06-01&end=2026-01-05',
+                         'Error in the To field - The end must not be before the start.')
+
+    def test_changed_reports_are_rebuilt_off_the_request(self):
+        def week_hours():
+            return [row.hours for row in build_reports(['week'], WEEK, WEEK)['week'].rows]
+
+        self.add_timesheet(self.add_employee('ann'), status=Status.APPROVED)
+        self.assertEqual(week_hours(), [40])
+        self.add_timesheet(self.add_employee('bob'), status=Status.APPROVED)
+        invalidate_tables(WeekSheet, WeeklyHours)
+        # the reports as they were, while they are rebuilt
+        self.assertEqual(week_hours(), [40])
+        for thread in list(_rebuilding.values()):
+            thread.join()
+        self.assertEqual(week_hours(), [80])
+        self.assertEqual(_rebuilding, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+import unittest
+from datetime import timedelta
+
+from app.util.export_util import EXPORT_COLUMNS, export_approved_hours
+from app.util.status_util import Status
+from tests.base import WEEK, BaseTestCase
+
+
+class ExportTestCase(BaseTestCase):
+    """Streaming the approved hours of a date range for payroll"""
+
+    def setUp(self):
+        super().setUp()
+        self.ann_id = self.add_employee('ann', *self.add_lookups())
+        self.approved_id = self.add_timesheet(self.ann_id, status=Status.APPROVED)
+        self.add_timesheet(self.ann_id, WEEK - timedelta(weeks=1), Status.SUBMITTED)
+        self.bob_id = self.add_employee('bob')
+        self.add_timesheet(self.bob_id, WEEK + timedelta(weeks=1), Status.APPROVED)
+        self.login()
+
+    def export(self, start=WEEK - timedelta(weeks=1), end=WEEK + timedelta(days=6), export_format='csv'):
+        return self.client.get('/admin/export', query_string={'start': start.isoformat(), 'end': end.isoformat(),
+                                                              'format': export_format})
+
+    def test_csv(self):
+        response = self.export()
+        self.assert200(response)
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertEqual(response.headers['Content-Disposition'],
+                         'attachment; filename=approved-hours-2025-05-26-2025-06-08.csv')
+        reader = csv.DictReader(io.StringIO(response.data.decode()))
+        self.assertEqual(tuple(reader.fieldnames), EXPORT_COLUMNS)
+        rows = list(reader)
+        # the approved days only, by date
+        self.assertEqual([row['sheet_id'] for row in rows], [str(id) for id in self.sheet_ids(self.approved_id)])
+        self.assertEqual(rows[0], {'sheet_id': rows[0]['sheet_id'], 'date': WEEK.isoformat(), 'workhours': '8',
+                                   'description': 'Work', 'employee_id': str(self.ann_id), 'username': 'ann',
+                                   'first_name': 'Ann', 'last_name': 'Tester', 'email': 'ann@example.com',
+                                   'department': 'Engineering', 'role': 'Developer'})
+
+    def test_ndjson(self):
+        response = self.export(WEEK + timedelta(days=4), WEEK + timedelta(weeks=1), 'ndjson')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        rows = [json.loads(line) for line in response.data.decode().splitlines()]
+        # both ends of the range are included
+        self.assertEqual([(row['date'], row['username'], row['department']) for row in rows],
+                         [((WEEK + timedelta(days=4)).isoformat(), 'ann', 'Engineering'),
+                          ((WEEK + timedelta(weeks=1)).isoformat(), 'bob', None)])
+
+    def test_chunks(self):
+        chunks = list(export_approved_hours(WEEK, WEEK + timedelta(weeks=2), 'ndjson', batch_size=3))
+        self.assertEqual(sum(chunk.count('\n') for chunk in chunks), 10)
+        chunks = list(export_approved_hours(WEEK, WEEK + timedelta(weeks=2)))
+        self.assertEqual(''.join(chunks).count('\r\n'), 11)
+
+    def test_invalid_range(self):
+        response = self.client.get('/admin/export', query_string={'start': 'someday', 'end': WEEK.isoformat()})
+        self.assert200(response)
+        self.assertEqual(response.mimetype, 'text/html')
+        self.assertFlashed('Error in the From field - This field is required.')
+
+    def test_admins_only(self):
+        self.login('ann')
+        self.assert403(self.export())
+
+
+if __name__ == '__main__':
+    unittest.main()
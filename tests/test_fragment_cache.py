@@ -0,0 +1,84 @@
+import unittest
+
+from flask import g
+from sqlalchemy import event, select
+from sqlalchemy.sql import Select
+
+from app import data_versions, db
+from app.models import Department, TableVersion
+from app.util.fragment_util import invalidate_tables
+from tests.base import BaseTestCase
+
+table_versions = TableVersion.__table__
+
+
+class FragmentCacheTestCase(BaseTestCase):
+    """Rendered admin tables, keyed by the data versions of their tables"""
+
+    def setUp(self):
+        super().setUp()
+        self.login()
+
+    def queries(self, url):
+        """The queries of a request for url"""
+        before = g.get('queries_run', 0)
+        response = self.client.get(url)
+        self.assert200(response)
+        return g.get('queries_run', 0) - before, response.data.decode()
+
+    def version(self, table):
+        return db.engine.scalar(select([table_versions.c.version]).where(table_versions.c.name == table))
+
+    def test_hit_runs_no_query(self):
+        self.queries('/admin/departments')
+        self.assertEqual(self.queries('/admin/departments')[0], 0)
+
+    def test_change_in_this_worker_shows_at_once(self):
+        self.queries('/admin/departments')
+        self.client.post('/admin/departments/add', data={'name': 'Support', 'description': 'Help'})
+        self.assertIn('Support', self.queries('/admin/departments')[1])
+
+    def test_change_in_another_worker_shows_after_the_interval(self):
+        self.queries('/admin/departments')
+        db.engine.execute(Department.__table__.insert(), name='Support')
+        db.engine.execute(table_versions.update().where(table_versions.c.name == 'departments')
+                          .values(version=table_versions.c.version + 1))
+        self.assertNotIn('Support', self.queries('/admin/departments')[1])
+        # as after DATA_VERSIONS_INTERVAL seconds
+        data_versions.clear()
+        self.assertIn('Support', self.queries('/admin/departments')[1])
+
+    def test_bump_leaves_the_pending_changes_alone(self):
+        version = self.version('departments')
+        db.session.add(Department(name='Pending'))
+        invalidate_tables(Department)
+        db.session.rollback()
+        self.assertEqual(self.version('departments'), version + 1)
+        self.assertEqual(Department.query.count(), 0)
+
+    def test_missing_counter_is_added(self):
+        db.engine.execute(table_versions.delete().where(table_versions.c.name == 'roles'))
+        data_versions.bump('roles')
+        self.assertEqual(self.version('roles'), 1)
+        self.assertEqual(data_versions.get('roles'), 1)
+
+    def test_missing_counter_added_meanwhile_is_bumped(self):
+        db.engine.execute(table_versions.delete().where(table_versions.c.name == 'roles'))
+        added = []
+
+        # another process adds the counter once bump() found it missing
+        def add_first(connection, clauseelement, multiparams, params, result):
+            if isinstance(clauseelement, Select) and clauseelement.froms == [table_versions] and not added:
+                added.append(True)
+                connection.execute(table_versions.insert(), name='roles', version=4)
+
+        event.listen(db.engine, 'after_execute', add_first)
+        try:
+            data_versions.bump('roles')
+        finally:
+            event.remove(db.engine, 'after_execute', add_first)
+        self.assertEqual(self.version('roles'), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import io
+import json
+import unittest
+from unittest import mock
+
+from app.models import Employee
+from app.util.import_util import _taken, import_employees, read_rows
+from tests.base import BaseTestCase
+
+HEADER = 'email,username,first_name,last_name,password,department,role\n'
+
+
+class ImportTestCase(BaseTestCase):
+    """Registering employees from an uploaded CSV or JSON file"""
+
+    def setUp(self):
+        super().setUp()
+        self.app.config['IMPORT_HASH_WORKERS'] = 1
+        self.lookup_ids = self.add_lookups()
+        self.add_employee('taken')
+        self.login()
+
+    def upload(self, content, filename='employees.csv'):
+        return self.client.post('/admin/register/bulk', content_type='multipart/form-data',
+                                data={'employees': (io.BytesIO(content.encode()), filename)})
+
+    def test_csv(self):
+        response = self.upload(HEADER + 'ann@example.com,ann,Ann,Lee,secret,Engineering,Developer\n'
+                                        'bob@example.com,bob,Bob,Ray,secret,,\n')
+        self.assert200(response)
+        self.assertFlashed('2 employees registered, 0 rows rejected.')
+        ann = Employee.query.filter_by(username='ann').one()
+        self.assertTrue(ann.verify_password('secret'))
+        self.assertEqual((ann.department_id, ann.role_id), self.lookup_ids)
+        self.assertIsNone(Employee.query.filter_by(username='bob').one().department_id)
+
+    def test_rejected_rows(self):
+        response = self.upload(HEADER + 'ann@example.com,ann,Ann,Lee,secret,,\n'
+                                        'no-name@example.com,,Ann,Lee,secret,,\n'
+                                        'not-an-email,cid,Cid,Lee,secret,,\n'
+                                        'dan@example.com,dan,Dan,Lee,secret,Sales,\n'
+                                        'eve@example.com,eve,Eve,Lee,secret,,Tester\n'
+                                        'ann@example.com,ann2,Ann,Lee,secret,,\n'
+                                        'taken@example.com,fay,Fay,Lee,secret,,\n'
+                                        'gus@example.com,taken,Gus,Lee,secret,,\n')
+        self.assertFlashed('1 employees registered, 7 rows rejected.')
+        page = response.data.decode()
+        for error in ['Missing username', 'Invalid email address', 'Unknown department Sales',
+                      'Unknown role Tester', 'Duplicate email or username in this file',
+                      'Email is already in use', 'Username is already in use']:
+            self.assertIn(error, page)
+        self.assertEqual(sorted(name for name, in Employee.query.with_entities(Employee.username)),
+                         ['admin', 'ann', 'taken'])
+
+    def test_json(self):
+        rows = [{'email': 'ann@example.com', 'username': 'ann', 'first_name': 'Ann',
+                 'last_name': 'Lee', 'password': 'secret', 'department': 'Engineering'}]
+        self.upload(json.dumps(rows), 'employees.json')
+        self.assertFlashed('1 employees registered, 0 rows rejected.')
+        self.upload(json.dumps({'email': 'bob@example.com'}), 'employees.json')
+        self.assertFlashed('Unable to read employees.json: JSON imports must be an array of employee objects')
+
+    def test_file_type(self):
+        self.upload(HEADER, 'employees.txt')
+        self.assertFlashed('Error in the Employees File field - Upload a .csv or .json file')
+
+    def test_report(self):
+        rows = read_rows(io.BytesIO((HEADER + 'ann@example.com,ann,Ann,Lee,secret,,\n'
+                                              ',bob,Bob,Ray,,,\n').encode('utf-8-sig')), 'employees.csv')
+        report = import_employees(rows, workers=1, batch_size=1)
+        self.assertEqual(report.as_dict(), {'created': 1, 'rejected': 1, 'errors': [
+            {'row': 2, 'email': '', 'error': 'Missing email, password'}]})
+
+    def test_registered_meanwhile(self):
+        rows = [{'email': f'{name}@example.com', 'username': name, 'first_name': name.title(),
+                 'last_name': 'Lee', 'password': 'secret'} for name in ('ann', 'bob', 'cid', 'dan')]
+        rows[1]['email'], rows[3]['username'] = 'taken@example.com', 'taken'
+        lookups = []
+
+        # as if the taken employee registered after the lookup of taken names
+        def registered_after(rows):
+            lookups.append(rows)
+            return (set(), set()) if len(lookups) == 1 else _taken(rows)
+
+        with mock.patch('app.util.import_util._taken', registered_after):
+            report = import_employees(rows, workers=1, batch_size=3)
+        self.assertEqual(report.created, 2)
+        self.assertEqual(report.errors, [
+            {'row': 2, 'email': 'taken@example.com', 'error': 'Email is already in use'},
+            {'row': 4, 'email': 'dan@example.com', 'error': 'Username is already in use'}])
+        self.assertEqual(sorted(name for name, in Employee.query.with_entities(Employee.username)),
+                         ['admin', 'ann', 'cid', 'taken'])
+
+
+if __name__ == '__main__':
+    unittest.main()
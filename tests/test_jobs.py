@@ -0,0 +1,115 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import Job, WeekSheet
+from app.util.job_util import claim_job, enqueue, heartbeat, job, requeue_stale, run_job, work
+from app.util.status_util import Status
+from tests.base import BaseTestCase
+
+# attempts of the flaky job that fail before one succeeds
+failures = []
+
+
+@job('flaky')
+def flaky_job(fail=0):
+    """Fails its first fail attempts, then returns how many failed"""
+    if len(failures) < fail:
+        failures.append(datetime.utcnow())
+        raise RuntimeError('flaky')
+    return {'failed': len(failures)}
+
+
+class JobTestCase(BaseTestCase):
+    """Claiming, retrying and giving back background jobs"""
+
+    def setUp(self):
+        super().setUp()
+        del failures[:]
+
+    def make_due(self, id):
+        Job.query.filter(Job.id == id).update({Job.run_after: datetime.utcnow()})
+        db.session.commit()
+
+    def test_each_job_is_claimed_once(self):
+        first, second = enqueue('flaky').id, enqueue('flaky').id
+        claimed = [claim_job(worker) for worker in ('one', 'two', 'three')]
+        self.assertEqual([claim and claim.id for claim in claimed], [first, second, None])
+        self.assertEqual((claimed[0].status, claimed[0].attempts, claimed[0].locked_by), ('running', 1, 'one'))
+
+    def test_failed_attempt_is_retried_later(self):
+        id = enqueue('flaky', dict(fail=1)).id
+        self.assertEqual(run_job(claim_job('one'), 'one'), 'queued')
+        queued = Job.query.get(id)
+        self.assertIn('RuntimeError: flaky', queued.error)
+        self.assertIsNone(queued.locked_by)
+        self.assertGreater(queued.run_after, datetime.utcnow())
+        # not due before the retry delay is over
+        self.assertIsNone(claim_job('two'))
+
+        self.make_due(id)
+        self.assertEqual(run_job(claim_job('two'), 'two'), 'succeeded')
+        succeeded = Job.query.get(id)
+        self.assertEqual((succeeded.attempts, succeeded.result, succeeded.error), (2, '{"failed": 1}', None))
+
+    def test_retry_delay_doubles(self):
+        self.app.config['JOB_RETRY_DELAY'] = 60
+        id = enqueue('flaky', dict(fail=2)).id
+        delays = []
+        for _ in range(2):
+            started = datetime.utcnow()
+            run_job(claim_job('one'), 'one')
+            delays.append((Job.query.get(id).run_after - started).total_seconds())
+            self.make_due(id)
+        self.assertAlmostEqual(delays[0], 60, delta=5)
+        self.assertAlmostEqual(delays[1], 120, delta=5)
+
+    def test_last_attempt_fails_the_job(self):
+        self.app.config['JOB_MAX_ATTEMPTS'] = 2
+        id = enqueue('flaky', dict(fail=5)).id
+        run_job(claim_job('one'), 'one')
+        self.make_due(id)
+        self.assertEqual(run_job(claim_job('one'), 'one'), 'failed')
+        failed = Job.query.get(id)
+        self.assertEqual((failed.status, failed.attempts), ('failed', 2))
+        self.assertIsNotNone(failed.finished_at)
+        self.assertIsNone(claim_job('one'))
+
+    def test_jobs_without_heartbeat_are_given_back(self):
+        alive, dead, exhausted = enqueue('flaky').id, enqueue('flaky').id, enqueue('flaky').id
+        for worker in ('alive', 'dead', 'exhausted'):
+            claim_job(worker)
+        Job.query.filter(Job.id == exhausted).update({Job.max_attempts: 1})
+        Job.query.filter(Job.id.in_([alive, dead, exhausted])) \
+            .update({Job.heartbeat_at: datetime.utcnow() - timedelta(minutes=5)}, synchronize_session=False)
+        db.session.commit()
+        heartbeat(['alive'])
+
+        self.assertEqual(requeue_stale(60), 2)
+        statuses = {row.id: (row.status, row.locked_by) for row in Job.query}
+        self.assertEqual(statuses, {alive: ('running', 'alive'), dead: ('queued', None),
+                                    exhausted: ('failed', None)})
+
+    def test_given_back_job_is_not_finished_by_its_old_worker(self):
+        id = enqueue('flaky').id
+        claimed = claim_job('dead')
+        Job.query.filter(Job.id == id).update({Job.heartbeat_at: datetime.utcnow() - timedelta(minutes=5)})
+        db.session.commit()
+        requeue_stale(60)
+        claim_job('other')
+        run_job(claimed, 'dead')
+        running = Job.query.get(id)
+        self.assertEqual((running.status, running.locked_by, running.attempts), ('running', 'other', 2))
+
+    def test_worker_runs_queued_decisions(self):
+        employee_id = self.add_employee('ann')
+        timesheet_id = self.add_timesheet(employee_id, status=Status.SUBMITTED)
+        id = enqueue('decide_timesheets', dict(decision='approve', ids=[timesheet_id])).id
+        db.session.remove()
+        self.assertEqual(work(self.app, threads=2, burst=True), 1)
+        self.assertEqual(Job.query.get(id).status, 'succeeded')
+        self.assertEqual(WeekSheet.query.get(timesheet_id).status, Status.APPROVED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import re
+import unittest
+
+from flask import g
+
+from app import db, lookup_cache
+from app.models import Department
+from app.util.fragment_util import invalidate_tables
+from app.util.lookup_util import department_choices, role_choices
+from tests.base import BaseTestCase
+
+
+class LookupCacheTestCase(BaseTestCase):
+    """Department and role choices, cached until the table changes"""
+
+    def setUp(self):
+        super().setUp()
+        self.department_id, self.role_id = self.add_lookups()
+        self.employee_id = self.add_employee('ann')
+        self.login()
+
+    def choices(self):
+        """The department and role options of the assign form"""
+        response = self.client.get(f'/admin/employee/assign/{self.employee_id}')
+        self.assert200(response)
+        fields = {}
+        for name in ('department_id', 'role_id'):
+            select = re.search(rf'<select[^>]*name="{name}"[^>]*>(.*?)</select>', response.data.decode(), re.S)
+            fields[name] = [(int(id), label) for id, label in
+                            re.findall(r'<option[^>]*value="(\d+)"[^>]*>([^<]*)</option>', select.group(1))]
+        return fields
+
+    def test_cached(self):
+        cold = self.choices()
+        self.assertEqual(cold, {'department_id': [(self.department_id, 'Engineering')],
+                                'role_id': [(self.role_id, 'Developer')]})
+        hits = lookup_cache.hits
+        before = g.get('queries_run', 0)
+        self.assertEqual(department_choices(), cold['department_id'])
+        self.assertEqual(role_choices(), cold['role_id'])
+        self.assertEqual((lookup_cache.hits - hits, g.get('queries_run', 0) - before), (2, 0))
+        self.assertEqual(self.choices(), cold)
+        self.assertEqual(lookup_cache.hits - hits, 4)
+
+    def test_add(self):
+        self.choices()
+        self.client.post('/admin/departments/add', data={'name': 'Accounts', 'description': 'Books'})
+        self.client.post('/admin/roles/add', data={'name': 'Auditor', 'description': 'Checks'})
+        fields = self.choices()
+        self.assertEqual([label for _, label in fields['department_id']], ['Accounts', 'Engineering'])
+        self.assertEqual([label for _, label in fields['role_id']], ['Auditor', 'Developer'])
+
+    def test_edit(self):
+        self.choices()
+        self.client.post(f'/admin/departments/edit/{self.department_id}',
+                         data={'name': 'Research', 'description': 'Labs'})
+        self.client.post(f'/admin/roles/edit/{self.role_id}', data={'name': 'Engineer', 'description': 'Builds'})
+        self.assertEqual(self.choices(), {'department_id': [(self.department_id, 'Research')],
+                                          'role_id': [(self.role_id, 'Engineer')]})
+
+    def test_delete(self):
+        self.choices()
+        self.client.get(f'/admin/departments/delete/{self.department_id}')
+        self.client.get(f'/admin/roles/delete/{self.role_id}')
+        self.assertEqual(self.choices(), {'department_id': [], 'role_id': []})
+
+    def test_invalidate_tables(self):
+        self.assertEqual(department_choices(), [(self.department_id, 'Engineering')])
+        db.session.add(Department(name='Accounts', description='Books'))
+        db.session.commit()
+        invalidate_tables(Department)
+        self.assertEqual([name for _, name in department_choices()], ['Accounts', 'Engineering'])
+        self.assertEqual(role_choices(), [(self.role_id, 'Developer')])
+
+
+if __name__ == '__main__':
+    unittest.main()
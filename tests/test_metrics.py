@@ -0,0 +1,48 @@
+import unittest
+
+from tests.base import BaseTestCase
+
+TOKEN = 'scrape-token'
+
+
+class MetricsTestCase(BaseTestCase):
+    """Who may read /metrics"""
+
+    def setUp(self):
+        super().setUp()
+        self.app.config['METRICS_TOKEN'] = TOKEN
+
+    def scrape(self, authorization=None):
+        headers = {'Authorization': authorization} if authorization is not None else {}
+        return self.client.get('/metrics', headers=headers)
+
+    def test_right_token(self):
+        self.client.get('/login')
+        response = self.scrape(f'Bearer {TOKEN}')
+        self.assert200(response)
+        self.assertIn('kaarya_requests_total', response.data.decode())
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+
+    def test_wrong_token(self):
+        for authorization in [None, '', 'Bearer wrong', TOKEN, f'Bearer {TOKEN} ']:
+            self.assert403(self.scrape(authorization))
+
+    def test_non_ascii_token(self):
+        self.assert403(self.scrape('Bearer sécret'))
+        self.assert403(self.scrape(f'Bearer {TOKEN}é'))
+
+    def test_no_token_configured(self):
+        self.app.config['METRICS_TOKEN'] = None
+        self.assert403(self.scrape('Bearer '))
+        self.assert403(self.scrape('Bearer None'))
+
+    def test_admin_session(self):
+        self.login()
+        self.assert200(self.scrape())
+        self.add_employee('ann')
+        self.login('ann')
+        self.assert403(self.scrape())
+
+
+if __name__ == '__main__':
+    unittest.main()
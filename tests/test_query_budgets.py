@@ -0,0 +1,92 @@
+import json
+import unittest
+from datetime import date
+
+from flask import g
+
+from app import db
+from app.models import Employee
+from app.util.archive_util import archive_timesheets
+from app.util.job_util import enqueue
+from app.util.query_util import QueryBudgetExceeded, query_budget
+from app.util.status_util import Status
+from app.util.summary_util import rebuild_weekly_hours
+from tests.base import BaseTestCase
+
+# more rows than any budget, so a query per row goes over it
+EMPLOYEES, WEEKS = 3, 4
+
+
+class QueryBudgetTestCase(BaseTestCase):
+    """
+    Every view with a @query_budget, over enough rows that a query per row
+    would go over it. Under TESTING going over raises QueryBudgetExceeded
+    out of the request.
+    """
+
+    def setUp(self):
+        super().setUp()
+        department_id, role_id = self.add_lookups()
+        self.employee_ids = [self.add_employee(f'employee{number}', department_id, role_id)
+                             for number in range(EMPLOYEES)]
+        for employee_id in self.employee_ids:
+            self.timesheet_id = self.add_weeks(employee_id, WEEKS, Status.SUBMITTED)[0]
+        self.add_timesheet(self.employee_ids[0], date(2025, 1, 6), Status.APPROVED)
+        archive_timesheets(date(2025, 2, 1))
+        rebuild_weekly_hours()
+        self.job_id = enqueue('decide_timesheets', dict(decision='approve'), created_by=self.admin_id).id
+        enqueue('decide_timesheets', dict(decision='reject'), created_by=self.admin_id)
+
+    def get(self, url, **kwargs):
+        response = self.client.get(url, **kwargs)
+        self.assert200(response, url)
+        return response
+
+    def test_admin_views(self):
+        self.login()
+        for url in ['/admin/timesheets', '/admin/timesheets?status=all&page=2',
+                    f'/admin/timesheets/view/{self.timesheet_id}', '/admin/timesheets/archive',
+                    '/admin/jobs', f'/admin/jobs/{self.job_id}', '/admin/search?q=work',
+                    '/admin/departments', '/admin/roles', '/admin/employee', '/admin/dashboard']:
+            self.get(url)
+        # twice: the second time from the fragment and report caches
+        for url in ['/admin/timesheets', '/admin/departments', '/admin/dashboard']:
+            self.get(url)
+
+    def test_approve_sheet(self):
+        self.login()
+        for sheet_id in self.sheet_ids(self.timesheet_id):
+            self.assertStatus(self.client.get(f'/admin/timesheets/approval/sheet/{sheet_id}/approve'), 302)
+
+    def test_api_views(self):
+        self.login()
+        for url in ['/api/v1/employees', f'/api/v1/employees/{self.employee_ids[0]}',
+                    '/api/v1/weeksheets', f'/api/v1/weeksheets/{self.timesheet_id}',
+                    '/api/v1/sheets', '/api/v1/hours?group=department,week',
+                    f'/api/v1/jobs/{self.job_id}']:
+            etag = self.get(url).headers['ETag']
+            self.assertStatus(self.client.get(url, headers={'If-None-Match': etag}), 304)
+
+    def test_employee_views(self):
+        timesheet_id = self.add_weeks(self.add_employee('editor'), WEEKS)[0]
+        self.login('editor')
+        self.get('/employee/timesheets')
+        self.get(f'/employee/timesheets/view/{timesheet_id}')
+        response = self.client.open(f'/employee/timesheets/sheet/{self.sheet_ids(timesheet_id)[0]}',
+                                    method='PATCH', data=json.dumps({'version': 1, 'workhours': 6}),
+                                    content_type='application/json')
+        self.assert200(response)
+
+    def test_over_budget(self):
+        @query_budget(1)
+        def view():
+            return [Employee.query.count() for _ in range(2)]
+
+        g.queries_run = 0
+        with self.assertRaises(QueryBudgetExceeded):
+            view()
+        db.session.rollback()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import json
+import unittest
+from datetime import timedelta
+
+from sqlalchemy.orm import subqueryload
+
+from app import db
+from app.models import ArchivedWeekSheet, Department, Employee, Role, WeekSheet, WeeklyHours
+from app.util.archive_util import archive_timesheets
+from app.util.status_util import Status
+from app.util.summary_util import HOURS_BY_STATUS
+from app.util.week_util import current_week
+from tests.base import WEEK, BaseTestCase
+
+
+def recount(timesheet):
+    """The rollup of a timesheet counted from its days"""
+    days = timesheet.sheets
+    return {
+        'day_count': len(days),
+        'total_hours': sum(day.workhours for day in days),
+        'approved_hours': sum(day.workhours for day in days if day.status == Status.APPROVED),
+        'pending_days': sum(day.status == Status.SUBMITTED for day in days),
+        'approved_days': sum(day.status == Status.APPROVED for day in days),
+        'rejected_days': sum(day.status == Status.REJECTED for day in days),
+    }
+
+
+class RollupTestCase(BaseTestCase):
+    """
+    The rollup of every timesheet and the weekly hours summary agree with
+    the days after each kind of write
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.department_id, self.role_id = self.add_lookups()
+        self.employee_id = self.add_employee('ann', self.department_id, self.role_id)
+        self.timesheet_id = self.add_timesheet(self.employee_id)
+
+    def assertConsistent(self):
+        db.session.remove()
+        expected = {}
+        for model in (WeekSheet, ArchivedWeekSheet):
+            for timesheet in model.query.options(subqueryload(model.sheets)):
+                counts = recount(timesheet)
+                self.assertEqual({name: getattr(timesheet, name) for name in counts}, counts)
+                employee = Employee.query.get(timesheet.employee_id)
+                row = {'department_id': employee.department_id, 'role_id': employee.role_id,
+                       'days': counts['day_count'], 'total_hours': counts['total_hours']}
+                row.update((column, sum(day.workhours for day in timesheet.sheets if day.status == status))
+                           for column, status in HOURS_BY_STATUS.items())
+                expected[timesheet.employee_id, timesheet.week_start] = row
+        summary = {(row.employee_id, row.week_start): {name: getattr(row, name) for name in
+                                                       expected[row.employee_id, row.week_start]}
+                   if (row.employee_id, row.week_start) in expected else None
+                   for row in WeeklyHours.query.all()}
+        self.assertEqual(summary, expected)
+
+    def edit(self, workhours, submit=False):
+        timesheet = WeekSheet.query.get(self.timesheet_id)
+        data = {'period': timesheet.period}
+        for number, sheet in enumerate(timesheet.sheets):
+            data.update({f'sheets-{number}-date': sheet.date, f'sheets-{number}-workhours': workhours,
+                         f'sheets-{number}-description': 'Edited'})
+        if submit:
+            data['submit'] = 'Submit'
+        self.assertStatus(self.client.post(f'/employee/timesheets/edit/{self.timesheet_id}', data=data), 302)
+
+    def submit(self):
+        self.login('ann')
+        self.edit(8, submit=True)
+        self.login()
+
+    def test_add(self):
+        self.assertConsistent()
+        self.login('ann')
+        data = {'submit': 'Submit'}
+        for number, date_string in enumerate(current_week().dates):
+            data.update({f'sheets-{number}-date': date_string, f'sheets-{number}-workhours': number + 1,
+                         f'sheets-{number}-description': 'Added'})
+        self.assertStatus(self.client.post('/employee/timesheets/add', data=data), 302)
+        self.assertEqual(WeekSheet.query.filter_by(week_start=current_week().start).one().total_hours, 15)
+        self.assertConsistent()
+
+    def test_add_weeks_skips_archived_weeks(self):
+        self.submit()
+        self.client.get(f'/admin/timesheets/approval/{self.timesheet_id}/approve')
+        archive_timesheets(WEEK + timedelta(weeks=1))
+        self.login('ann')
+        response = self.client.post('/employee/timesheets/add/weeks',
+                                    data={'first_week': (WEEK - timedelta(weeks=1)).isoformat(), 'weeks': 3,
+                                          'workhours': 7, 'description': 'Holidays', 'save': 'Save'})
+        self.assertStatus(response, 302)
+        self.assertFlashed('2 timesheets added, 1 weeks already had one.')
+        self.assertEqual(ArchivedWeekSheet.query.one().total_hours, 40)
+        self.assertConsistent()
+
+    def test_edit(self):
+        self.login('ann')
+        self.edit(6)
+        self.assertEqual(WeekSheet.query.get(self.timesheet_id).total_hours, 30)
+        self.assertConsistent()
+
+    def test_autosave(self):
+        self.login('ann')
+        sheet_id = self.sheet_ids(self.timesheet_id)[0]
+        response = self.client.open(f'/employee/timesheets/sheet/{sheet_id}', method='PATCH',
+                                    data=json.dumps({'version': 1, 'workhours': 3}),
+                                    content_type='application/json')
+        self.assert200(response)
+        self.assertEqual(WeekSheet.query.get(self.timesheet_id).total_hours, 35)
+        self.assertConsistent()
+
+    def test_decide_timesheet(self):
+        self.submit()
+        self.assertConsistent()
+        self.client.get(f'/admin/timesheets/approval/{self.timesheet_id}/reject')
+        self.assertEqual(WeekSheet.query.get(self.timesheet_id).rejected_days, 5)
+        self.assertConsistent()
+
+    def test_decide_days(self):
+        self.submit()
+        first, second = self.sheet_ids(self.timesheet_id)[:2]
+        self.client.get(f'/admin/timesheets/approval/sheet/{first}/approve')
+        self.client.get(f'/admin/timesheets/approval/sheet/{second}/reject')
+        timesheet = WeekSheet.query.get(self.timesheet_id)
+        self.assertEqual((timesheet.approved_hours, timesheet.pending_days), (8, 3))
+        self.assertConsistent()
+
+    def test_bulk_decide(self):
+        other_id = self.add_timesheet(self.employee_id, WEEK - timedelta(weeks=1), Status.SUBMITTED)
+        self.submit()
+        response = self.client.post('/admin/timesheets/approval/bulk',
+                                    data={'ids': [self.timesheet_id, other_id], 'department': 0,
+                                          'approve': 'Approve'})
+        self.assertStatus(response, 302)
+        self.assertEqual({timesheet.status for timesheet in WeekSheet.query}, {Status.APPROVED})
+        self.assertConsistent()
+
+    def test_delete(self):
+        other_id = self.add_timesheet(self.employee_id, WEEK - timedelta(weeks=1), Status.SUBMITTED)
+        self.login('ann')
+        self.client.get(f'/employee/timesheets/delete/{self.timesheet_id}')
+        self.login()
+        self.client.get(f'/admin/timesheets/delete/{other_id}')
+        self.assertEqual(WeekSheet.query.count(), 0)
+        self.assertEqual(WeeklyHours.query.count(), 0)
+        self.assertConsistent()
+
+    def test_employee_moved(self):
+        department, role = Department(name='Support'), Role(name='Lead')
+        db.session.add_all([department, role])
+        db.session.commit()
+        moved_to = (department.id, role.id)
+        self.login()
+        response = self.client.post(f'/admin/employee/assign/{self.employee_id}',
+                                    data={'department_id': moved_to[0], 'role_id': moved_to[1]})
+        self.assertStatus(response, 302)
+        self.assertEqual(db.session.query(WeeklyHours.department_id, WeeklyHours.role_id).one(), moved_to)
+        self.assertConsistent()
+
+    def test_archive(self):
+        self.submit()
+        self.client.get(f'/admin/timesheets/approval/{self.timesheet_id}/approve')
+        archive_timesheets(WEEK + timedelta(weeks=1))
+        self.assertEqual((WeekSheet.query.count(), ArchivedWeekSheet.query.count()), (0, 1))
+        self.assertConsistent()
+
+
+if __name__ == '__main__':
+    unittest.main()
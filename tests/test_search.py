@@ -0,0 +1,85 @@
+import unittest
+
+from app import db
+from app.models import Department, Employee, Role, Sheet
+from app.util.search_util import MAX_TERMS, search, search_sheets, search_terms
+from tests.base import BaseTestCase
+
+
+class SearchTestCase(BaseTestCase):
+    """Full text search of days, employees, departments and roles"""
+
+    def setUp(self):
+        super().setUp()
+        self.ann_id = self.add_employee('ann')
+        self.timesheet_id = self.add_timesheet(self.ann_id)
+        self.sheet_id = self.sheet_ids(self.timesheet_id)[2]
+        self.describe(self.sheet_id, 'Invoice export for Payroll')
+        db.session.add_all([Department(name='Payroll', description='Pays everyone'),
+                            Role(name='Clerk', description='Keeps the payroll books')])
+        db.session.commit()
+
+    def describe(self, sheet_id, description):
+        sheet = Sheet.query.get(sheet_id)
+        sheet.description = description
+        db.session.commit()
+
+    def names(self, model, query):
+        return [row.name for row in search(model, search_terms(query), 10)]
+
+    def test_terms(self):
+        self.assertEqual(search_terms('Payroll, "export" (OR) invoice*'), ['payroll', 'export', 'or', 'invoice'])
+        self.assertEqual(search_terms('a ' * (MAX_TERMS + 2)), ['a'] * MAX_TERMS)
+        self.assertEqual(search_terms('"*)( - : ^'), [])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(search_sheets(search_terms('invoice payroll'), 10), [(Sheet.query.get(self.sheet_id),
+                                                                              self.ann_id)])
+        self.assertEqual(search_sheets(search_terms('invoice holiday'), 10), [])
+
+    def test_last_term_is_a_prefix(self):
+        self.assertEqual([sheet.id for sheet, _ in search_sheets(search_terms('invoice expo'), 10)],
+                         [self.sheet_id])
+        self.assertEqual(search_sheets(search_terms('invo export'), 10), [])
+        self.assertEqual([employee.id for employee in search(Employee, ['an'], 10)], [self.ann_id])
+
+    def test_models(self):
+        self.assertEqual(self.names(Department, 'payroll'), ['Payroll'])
+        # descriptions are searched as well as names
+        self.assertEqual(self.names(Role, 'payroll'), ['Clerk'])
+        self.assertEqual([employee.id for employee in search(Employee, search_terms('ann@example.com'), 10)],
+                         [self.ann_id])
+
+    def test_index_follows_changes(self):
+        self.describe(self.sheet_id, 'Holiday')
+        self.assertEqual(search_sheets(['invoice'], 10), [])
+        self.assertEqual([sheet.id for sheet, _ in search_sheets(['holiday'], 10)], [self.sheet_id])
+        db.session.delete(Sheet.query.get(self.sheet_id))
+        db.session.commit()
+        self.assertEqual(search_sheets(['holiday'], 10), [])
+
+    def test_pages(self):
+        for sheet_id in self.sheet_ids(self.timesheet_id):
+            self.describe(sheet_id, 'Invoice run')
+        found = [sheet.id for sheet, _ in search_sheets(['invoice'], 3)] + \
+            [sheet.id for sheet, _ in search_sheets(['invoice'], 3, 3)]
+        self.assertEqual(sorted(found), self.sheet_ids(self.timesheet_id))
+
+    def test_page(self):
+        self.login()
+        response = self.client.get('/admin/search', query_string={'q': 'payroll'})
+        self.assert200(response)
+        page = response.data.decode()
+        for found in ['Invoice export for Payroll', 'Pays everyone', 'Keeps the payroll books']:
+            self.assertIn(found, page)
+
+    def test_punctuation_only(self):
+        self.login()
+        for query in ['"', '*', '"*)(', 'AND (']:
+            response = self.client.get('/admin/search', query_string={'q': query})
+            self.assert200(response)
+            self.assertIn('No days match.', response.data.decode())
+
+
+if __name__ == '__main__':
+    unittest.main()
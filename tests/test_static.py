@@ -0,0 +1,63 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+from flask import url_for
+
+from app.util.static_util import ONE_YEAR
+from tests.base import BaseTestCase
+
+
+def digest(path):
+    with open(path, 'rb') as static_file:
+        return hashlib.md5(static_file.read()).hexdigest()[:12]
+
+
+class StaticTestCase(BaseTestCase):
+    """Static URLs fingerprinted with their content, cached for a year"""
+
+    def headers(self, url):
+        response = self.client.get(url)
+        self.assert200(response)
+        response.close()
+        return response.headers
+
+    def cache_control(self, url):
+        return set(self.headers(url)['Cache-Control'].split(', '))
+
+    def test_fingerprinted_urls(self):
+        version = digest(os.path.join(self.app.static_folder, 'css', 'style.css'))
+        self.assertEqual(url_for('static', filename='css/style.css'), f'/static/css/style.css?v={version}')
+        self.assertIn(f'/static/css/style.css?v={version}', self.client.get('/login').data.decode())
+        # no fingerprint for what is not there
+        self.assertEqual(url_for('static', filename='css/missing.css'), '/static/css/missing.css')
+
+    def test_current_fingerprint_is_immutable(self):
+        url = url_for('static', filename='js/autosave.js')
+        self.assertEqual(self.cache_control(url), {'public', f'max-age={ONE_YEAR}', 'immutable'})
+        self.assertTrue(self.headers(url)['Expires'])
+
+    def test_other_urls_are_revalidated(self):
+        max_age = f"max-age={self.app.config['SEND_FILE_MAX_AGE_DEFAULT']}"
+        self.assertEqual(self.cache_control('/static/js/autosave.js'), {'public', max_age})
+        self.assertEqual(self.cache_control('/static/js/autosave.js?v=0123456789ab'), {'public', max_age})
+
+    def test_changes_picked_up_in_debug(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        path = os.path.join(folder, 'site.css')
+        with open(path, 'w') as static_file:
+            static_file.write('body {}')
+        self.app.static_folder, self.app.debug = folder, True
+        before = url_for('static', filename='site.css')
+        with open(path, 'w') as static_file:
+            static_file.write('body { margin: 0 }')
+        os.utime(path, (os.path.getatime(path), os.path.getmtime(path) + 1))
+        self.assertEqual(url_for('static', filename='site.css'), f'/static/site.css?v={digest(path)}')
+        self.assertNotEqual(url_for('static', filename='site.css'), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import unittest
+
+from app import db
+from app.models import Sheet, WeekSheet
+from app.util.rollup_util import refresh_rollups
+from app.util.status_util import InvalidTransition, Status, check_transition
+from app.util.week_util import current_week
+from tests.base import BaseTestCase
+
+
+class TransitionTestCase(unittest.TestCase):
+
+    def test_allowed_transitions(self):
+        for current, new in [(Status.NOT_SUBMITTED, Status.SUBMITTED), (Status.SUBMITTED, Status.APPROVED),
+                             (Status.SUBMITTED, Status.REJECTED), (Status.REJECTED, Status.SUBMITTED),
+                             (Status.APPROVED, Status.APPROVED), (None, Status.APPROVED)]:
+            self.assertEqual(check_transition(current, new), new)
+
+    def test_forbidden_transitions(self):
+        for current, new in [(Status.NOT_SUBMITTED, Status.APPROVED), (Status.APPROVED, Status.REJECTED),
+                             (Status.APPROVED, Status.SUBMITTED), (Status.REJECTED, Status.APPROVED)]:
+            with self.assertRaises(InvalidTransition):
+                check_transition(current, new)
+
+
+class StatusTestCase(BaseTestCase):
+    """A timesheet and its days going from saved to decided on, through the views"""
+
+    def setUp(self):
+        super().setUp()
+        self.employee_id = self.add_employee('ann')
+        self.timesheet_id = self.add_timesheet(self.employee_id)
+        self.day_ids = self.sheet_ids(self.timesheet_id)
+
+    def statuses(self):
+        return (WeekSheet.query.get(self.timesheet_id).status,
+                [status for status, in Sheet.query.with_entities(Sheet.status)
+                 .filter(Sheet.weeksheet_id == self.timesheet_id).order_by(Sheet.work_date)])
+
+    def submit(self):
+        self.login('ann')
+        return self.client.get(f'/employee/timesheets/view/{self.timesheet_id}/submit')
+
+    def decide(self, decision, sheet_id=None):
+        self.login()
+        if sheet_id is None:
+            return self.client.get(f'/admin/timesheets/approval/{self.timesheet_id}/{decision}')
+        return self.client.get(f'/admin/timesheets/approval/sheet/{sheet_id}/{decision}')
+
+    def edit(self, workhours, submit=False):
+        self.login('ann')
+        timesheet = WeekSheet.query.get(self.timesheet_id)
+        data = {'period': timesheet.period}
+        for number, sheet in enumerate(timesheet.sheets):
+            data.update({f'sheets-{number}-date': sheet.date, f'sheets-{number}-workhours': workhours,
+                         f'sheets-{number}-description': 'Corrected'})
+        if submit:
+            data['submit'] = 'Submit'
+        return self.client.post(f'/employee/timesheets/edit/{self.timesheet_id}', data=data)
+
+    def test_submit_and_approve(self):
+        self.submit()
+        self.assertEqual(self.statuses(), (Status.SUBMITTED, [Status.SUBMITTED] * 5))
+        self.decide('approve')
+        self.assertEqual(self.statuses(), (Status.APPROVED, [Status.APPROVED] * 5))
+        self.assertFlashed('Your approval is Successful')
+
+    def test_decided_timesheet_is_not_decided_again(self):
+        self.submit()
+        self.decide('approve')
+        self.decide('reject')
+        self.assertFlashed('This timesheet is Approved and cannot be decided on.')
+        self.assertEqual(self.statuses(), (Status.APPROVED, [Status.APPROVED] * 5))
+
+    def test_saved_timesheet_is_not_decided_on(self):
+        self.decide('approve')
+        self.assertEqual(self.statuses(), (Status.NOT_SUBMITTED, [Status.NOT_SUBMITTED] * 5))
+        self.decide('approve', self.day_ids[0])
+        self.assertEqual(self.statuses()[1][0], Status.NOT_SUBMITTED)
+
+    def test_approved_timesheet_is_not_submitted_or_edited(self):
+        self.submit()
+        self.decide('approve')
+        self.submit()
+        self.assertFlashed('This timesheet is Approved and cannot be submitted again')
+        response = self.edit(9)
+        self.assertRedirects(response, f'/employee/timesheets/view/{self.timesheet_id}')
+        self.assertEqual(Sheet.query.get(self.day_ids[0]).workhours, 8)
+
+    def test_last_day_approved_approves_the_timesheet(self):
+        self.submit()
+        for sheet_id in self.day_ids[:-1]:
+            self.decide('approve', sheet_id)
+        self.assertEqual(self.statuses()[0], Status.SUBMITTED)
+        self.decide('approve', self.day_ids[-1])
+        self.assertEqual(self.statuses(), (Status.APPROVED, [Status.APPROVED] * 5))
+
+    def test_last_day_decided_with_a_day_rejected_rejects_the_timesheet(self):
+        self.submit()
+        self.decide('reject', self.day_ids[0])
+        for sheet_id in self.day_ids[1:-1]:
+            self.decide('approve', sheet_id)
+        self.assertEqual(self.statuses()[0], Status.SUBMITTED)
+        self.decide('approve', self.day_ids[-1])
+        self.assertEqual(self.statuses(), (Status.REJECTED, [Status.REJECTED] + [Status.APPROVED] * 4))
+        self.assertEqual(WeekSheet.query.get(self.timesheet_id).pending_days, 0)
+
+        # back with the employee, out of the approval queue
+        self.login()
+        self.assertNotIn(f'/admin/timesheets/view/{self.timesheet_id}"',
+                         self.client.get('/admin/timesheets').data.decode())
+        self.edit(9, submit=True)
+        self.assertEqual(self.statuses(), (Status.SUBMITTED, [Status.SUBMITTED] + [Status.APPROVED] * 4))
+
+    def test_bulk_decision_with_a_day_rejected_rejects_the_timesheet(self):
+        self.submit()
+        self.decide('reject', self.day_ids[0])
+        response = self.client.post('/admin/timesheets/approval/bulk',
+                                    data={'ids': [self.timesheet_id], 'department': 0, 'approve': 'Approve'})
+        self.assertStatus(response, 302)
+        self.assertFlashed('1 timesheets (4 days) Approved.')
+        self.assertEqual(self.statuses(), (Status.REJECTED, [Status.REJECTED] + [Status.APPROVED] * 4))
+
+    def test_bulk_decision_settles_a_timesheet_with_no_day_pending(self):
+        # as left behind by deciding its days one by one before they settled it
+        timesheet_id = self.add_timesheet(self.employee_id, current_week().start, Status.SUBMITTED)
+        Sheet.query.filter(Sheet.weeksheet_id == timesheet_id).update({Sheet.status: Status.APPROVED})
+        refresh_rollups(WeekSheet.id == timesheet_id)
+        db.session.commit()
+        self.login()
+        response = self.client.post('/admin/timesheets/approval/bulk',
+                                    data={'ids': [timesheet_id], 'department': 0, 'reject': 'Reject'})
+        self.assertStatus(response, 302)
+        self.assertEqual(WeekSheet.query.get(timesheet_id).status, Status.APPROVED)
+
+    def test_rejected_timesheet_keeps_its_approved_days(self):
+        self.submit()
+        self.decide('approve', self.day_ids[0])
+        self.decide('reject')
+        self.assertEqual(self.statuses(), (Status.REJECTED, [Status.APPROVED] + [Status.REJECTED] * 4))
+
+        # corrected and submitted again: the approved day stays as it was
+        self.edit(9, submit=True)
+        self.assertEqual(self.statuses(), (Status.SUBMITTED, [Status.APPROVED] + [Status.SUBMITTED] * 4))
+        self.assertEqual([sheet.workhours for sheet in WeekSheet.query.get(self.timesheet_id).sheets],
+                         [8, 9, 9, 9, 9])
+        self.decide('approve')
+        self.assertEqual(self.statuses(), (Status.APPROVED, [Status.APPROVED] * 5))
+
+    def test_rejected_timesheet_of_this_week_opens_for_editing(self):
+        timesheet_id = self.add_timesheet(self.employee_id, current_week().start, Status.REJECTED)
+        self.login('ann')
+        response = self.client.get('/employee/timesheets/add')
+        self.assertRedirects(response, f'/employee/timesheets/edit/{timesheet_id}')
+        self.assertFlashed('Your timesheet was rejected. Please correct it and Submit again')
+
+    def test_only_saved_timesheets_are_deleted_by_employees(self):
+        self.submit()
+        self.client.get(f'/employee/timesheets/delete/{self.timesheet_id}')
+        self.assertFlashed('Submitted timesheet cannot be deleted')
+        self.assertIsNotNone(WeekSheet.query.get(self.timesheet_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
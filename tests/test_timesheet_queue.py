@@ -0,0 +1,69 @@
+import re
+import unittest
+from datetime import timedelta
+
+from app.util.status_util import Status
+from tests.base import WEEK, BaseTestCase
+
+
+class TimesheetQueueTestCase(BaseTestCase):
+    """The admin approval queue, a page at a time and filtered"""
+
+    def setUp(self):
+        super().setUp()
+        self.app.config['TIMESHEETS_PER_PAGE'] = 3
+        self.ann_id, self.bob_id = self.add_employee('ann'), self.add_employee('bob')
+        # the latest week first
+        self.ann_weeks = self.add_weeks(self.ann_id, 4, Status.SUBMITTED)
+        self.bob_weeks = self.add_weeks(self.bob_id, 2, Status.SUBMITTED)
+        self.saved_id = self.add_timesheet(self.bob_id, WEEK - timedelta(weeks=2))
+        self.approved_id = self.add_timesheet(self.bob_id, WEEK - timedelta(weeks=3), Status.APPROVED)
+        self.login()
+
+    def listed(self, query=''):
+        response = self.client.get('/admin/timesheets' + query)
+        self.assert200(response)
+        return [int(id) for id in re.findall(r'/admin/timesheets/view/(\d+)"', response.data.decode())]
+
+    def test_pages(self):
+        ann, bob = self.ann_weeks, self.bob_weeks
+        # by week, the latest first, then the latest added
+        queue = [bob[0], ann[0], bob[1], ann[1], ann[2], ann[3]]
+        self.assertEqual(self.listed(), queue[:3])
+        self.assertEqual(self.listed('?page=2'), queue[3:])
+        self.assertEqual(self.listed('?page=3'), [])
+
+    def test_statuses(self):
+        self.assertNotIn(self.approved_id, self.listed('?page=2'))
+        self.assertEqual(self.listed(f'?status={int(Status.APPROVED)}'), [self.approved_id])
+        self.assertEqual(self.listed(f'?status={int(Status.REJECTED)}'), [])
+        listed = self.listed('?status=all&page=1') + self.listed('?status=all&page=2') + \
+            self.listed('?status=all&page=3')
+        self.assertEqual(sorted(listed), sorted(self.ann_weeks + self.bob_weeks + [self.approved_id]))
+        self.assertNotIn(self.saved_id, listed)
+
+    def test_employee(self):
+        self.assertEqual(self.listed(f'?employee_id={self.bob_id}'), self.bob_weeks)
+        self.assertEqual(self.listed(f'?employee_id={self.bob_id}&status=all'),
+                         self.bob_weeks + [self.approved_id])
+
+    def test_weeks(self):
+        # week_from may be any day of the first week
+        week_from = (WEEK - timedelta(weeks=1, days=-3)).isoformat()
+        self.assertEqual(self.listed(f'?week_from={week_from}&week_to={WEEK - timedelta(weeks=1)}'),
+                         [self.bob_weeks[1], self.ann_weeks[1]])
+        self.assertEqual(self.listed(f'?week_to={WEEK - timedelta(weeks=2)}'), self.ann_weeks[2:])
+
+    def test_invalid_filter(self):
+        self.assertEqual(self.listed('?week_from=someday'), [self.bob_weeks[0], self.ann_weeks[0],
+                                                             self.bob_weeks[1]])
+        self.assertFlashed('Error in the Week From field - Not a valid date value')
+
+    def test_pages_keep_the_filter(self):
+        response = self.client.get(f'/admin/timesheets?employee_id={self.ann_id}')
+        self.assertIn(f'employee_id={self.ann_id}', re.search(r'href="([^"]*page=2[^"]*)"',
+                                                             response.data.decode()).group(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
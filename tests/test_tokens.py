@@ -0,0 +1,93 @@
+import json
+import unittest
+
+from app import db
+from app.models import Employee, RevokedToken
+from app.util.token_util import revoked_tokens
+from tests.base import PASSWORD, BaseTestCase
+
+
+class TokenTestCase(BaseTestCase):
+    """Issuing, using, refreshing and revoking API tokens"""
+
+    def setUp(self):
+        super().setUp()
+        self.employee_id = self.add_employee('ann')
+
+    def issue(self, name='ann', password=PASSWORD):
+        return self.client.post('/api/v1/tokens', content_type='application/json',
+                                data=json.dumps({'email': f'{name}@example.com', 'password': password}))
+
+    def tokens(self, name='ann'):
+        response = self.issue(name)
+        self.assertStatus(response, 201)
+        return response.json
+
+    def read(self, token):
+        return self.client.get(f'/api/v1/employees/{self.employee_id}',
+                               headers={'Authorization': f'Bearer {token}'})
+
+    def refresh(self, token):
+        return self.client.post('/api/v1/tokens/refresh', data=json.dumps({'refresh_token': token}),
+                                content_type='application/json')
+
+    def revoke(self, access, refresh=None):
+        data = {'refresh_token': refresh} if refresh else {}
+        return self.client.post('/api/v1/tokens/revoke', data=json.dumps(data), content_type='application/json',
+                                headers={'Authorization': f'Bearer {access}'})
+
+    def test_issue(self):
+        tokens = self.tokens()
+        self.assertEqual(tokens['token_type'], 'Bearer')
+        self.assertEqual(self.read(tokens['access_token']).json['email'], 'ann@example.com')
+        self.assertStatus(self.issue(password='wrong'), 401)
+        self.assertStatus(self.client.post('/api/v1/tokens', data='{}', content_type='application/json'), 400)
+
+    def test_tokens_only_pass_for_their_type(self):
+        tokens = self.tokens()
+        self.assertStatus(self.read(tokens['refresh_token']), 401)
+        self.assertStatus(self.refresh(tokens['access_token']), 401)
+        self.assertStatus(self.read('not-a-token'), 401)
+
+    def test_refresh_uses_the_refresh_token_up(self):
+        tokens = self.tokens()
+        response = self.refresh(tokens['refresh_token'])
+        self.assertStatus(response, 201)
+        self.assert200(self.read(response.json['access_token']))
+        self.assertStatus(self.refresh(tokens['refresh_token']), 401)
+        self.assertStatus(self.refresh(response.json['refresh_token']), 201)
+
+    def test_refresh_replayed_on_another_worker(self):
+        refresh_token = self.tokens()['refresh_token']
+        self.assertStatus(self.refresh(refresh_token), 201)
+        # another worker, whose revocation list has not synced yet
+        revoked_tokens._revoked.clear()
+        self.assertStatus(self.refresh(refresh_token), 401)
+        self.assertEqual(RevokedToken.query.count(), 1)
+
+    def test_refresh_for_deleted_employee(self):
+        refresh_token = self.tokens()['refresh_token']
+        db.session.delete(Employee.query.get(self.employee_id))
+        db.session.commit()
+        self.assertStatus(self.refresh(refresh_token), 401)
+
+    def test_revoke(self):
+        tokens = self.tokens()
+        response = self.revoke(tokens['access_token'], tokens['refresh_token'])
+        self.assertEqual(response.json, {'revoked': 2})
+        self.assertStatus(self.read(tokens['access_token']), 401)
+        self.assertStatus(self.refresh(tokens['refresh_token']), 401)
+        # and after a sync from the table, as another worker sees them
+        revoked_tokens.clear()
+        self.assertStatus(self.read(tokens['access_token']), 401)
+
+    def test_revoking_someone_elses_refresh_token_is_forbidden(self):
+        self.add_employee('bob')
+        theirs = self.tokens()['refresh_token']
+        response = self.revoke(self.tokens('bob')['access_token'], theirs)
+        self.assertStatus(response, 403)
+        self.assertStatus(self.refresh(theirs), 201)
+
+
+if __name__ == '__main__':
+    unittest.main()
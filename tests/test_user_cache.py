@@ -0,0 +1,49 @@
+import unittest
+
+from flask import g
+
+from app import db, user_cache
+from app.models import Employee
+from tests.base import BaseTestCase
+
+
+class UserCacheTestCase(BaseTestCase):
+    """The logged in employee, loaded from user_cache while it is current"""
+
+    def setUp(self):
+        super().setUp()
+        self.employee_id = self.add_employee('ann')
+        self.login('ann')
+
+    def queries(self, url):
+        before = g.get('queries_run', 0)
+        response = self.client.get(url)
+        return g.get('queries_run', 0) - before, response
+
+    def test_warm_request_runs_no_query(self):
+        # the home page of a logged in employee reads nothing else
+        self.assert200(self.queries('/dashboard')[1])
+        hits = user_cache.hits
+        used, response = self.queries('/dashboard')
+        self.assert200(response)
+        self.assertEqual(used, 0)
+        self.assertEqual(user_cache.hits, hits + 1)
+
+    def test_change_drops_the_cached_row(self):
+        self.queries('/dashboard')
+        employee = Employee.query.get(self.employee_id)
+        employee.is_admin = True
+        db.session.commit()
+        used, response = self.queries('/admin/dashboard')
+        self.assert200(response)
+        self.assertGreater(used, 0)
+
+    def test_deleted_employee_is_logged_out(self):
+        self.queries('/dashboard')
+        db.session.delete(Employee.query.get(self.employee_id))
+        db.session.commit()
+        self.assertRedirects(self.client.get('/dashboard'), '/login?next=%2Fdashboard')
+
+
+if __name__ == '__main__':
+    unittest.main()
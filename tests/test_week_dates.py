@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+
+from flask_migrate import upgrade
+from flask_testing import TestCase
+from sqlalchemy import select, table, column
+from sqlalchemy.exc import IntegrityError
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models import Sheet, WeekSheet
+from app.util.bootstrap_util import INITIAL_REVISION, TYPED_DATES_REVISION
+from app.util.status_util import Status
+from app.util.week_util import week_calendar
+from tests.base import WEEK, BaseTestCase, migrated_database
+
+
+class WeekDatesMigrationTestCase(TestCase):
+    """The migration filling the date columns in from the period strings"""
+
+    def create_app(self):
+        self.database = tempfile.mktemp(suffix='.db', dir=os.path.dirname(migrated_database()))
+        TestingConfig.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + self.database
+        return create_app('testing')
+
+    def tearDown(self):
+        db.session.remove()
+        db.engine.dispose()
+        os.remove(self.database)
+
+    def test_dates_parsed_from_the_strings(self):
+        upgrade(revision=INITIAL_REVISION)
+        week = week_calendar(WEEK)
+        # the tables as the initial schema has them
+        weeksheet = table('weeksheet', column('id'), column('period'))
+        sheets = table('sheets', column('id'), column('weeksheet_id'), column('date'))
+        db.engine.execute(weeksheet.insert(), [{'id': 1, 'period': week.period},
+                                               {'id': 2, 'period': 'unreadable'}])
+        db.engine.execute(sheets.insert(), [{'id': 1, 'weeksheet_id': 1, 'date': week.dates[2]},
+                                            {'id': 2, 'weeksheet_id': 2, 'date': None}])
+
+        upgrade(revision=TYPED_DATES_REVISION)
+        self.assertEqual(db.engine.execute(select([WeekSheet.id, WeekSheet.week_start, WeekSheet.week_end])
+                                           .order_by(WeekSheet.id)).fetchall(),
+                         [(1, week.start, week.end), (2, None, None)])
+        self.assertEqual(db.engine.execute(select([Sheet.work_date]).order_by(Sheet.id)).fetchall(),
+                         [(WEEK + timedelta(days=2),), (None,)])
+
+
+class WeekDatesTestCase(BaseTestCase):
+    """Lookups by employee, week, status and day served by the indexes"""
+
+    def plan(self, query):
+        statement = query.statement.compile(dialect=db.engine.dialect)
+        cursor = db.session.connection().connection.cursor()
+        rows = cursor.execute('EXPLAIN QUERY PLAN ' + str(statement),
+                              [statement.params[name] for name in statement.positiontup]).fetchall()
+        return ' '.join(row[-1] for row in rows)
+
+    def test_one_timesheet_per_employee_and_week(self):
+        employee_id = self.add_employee('ann')
+        self.add_timesheet(employee_id)
+        with self.assertRaises(IntegrityError):
+            self.add_timesheet(employee_id)
+        db.session.rollback()
+        self.add_timesheet(employee_id, WEEK + timedelta(weeks=1))
+
+    def test_dates_are_dates(self):
+        timesheet = WeekSheet.query.get(self.add_timesheet(self.add_employee('ann')))
+        self.assertEqual((timesheet.week_start, timesheet.week_end), (WEEK, WEEK + timedelta(days=6)))
+        self.assertEqual([sheet.work_date for sheet in timesheet.sheets],
+                         [WEEK + timedelta(days=day) for day in range(5)])
+
+    def test_lookups_use_the_indexes(self):
+        self.assertIn('ix_weeksheet_employee_week',
+                      self.plan(WeekSheet.query.filter_by(employee_id=1, week_start=WEEK)))
+        self.assertIn('ix_weeksheet_pending',
+                      self.plan(WeekSheet.query.filter(WeekSheet.status == Status.SUBMITTED)
+                                .order_by(WeekSheet.week_start.desc(), WeekSheet.id.desc())))
+        self.assertIn('ix_sheets_status_work_date',
+                      self.plan(Sheet.query.filter(Sheet.status == Status.APPROVED,
+                                                   Sheet.work_date.between(WEEK, WEEK + timedelta(days=6)))))
+
+
+if __name__ == '__main__':
+    unittest.main()